@@ -12,9 +12,15 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 from pathlib import Path
 
+from celery.schedules import crontab
+from dotenv import load_dotenv
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# .env (qarang: .env-sample) o'zgaruvchilari muhitda bo'lmasa yuklanadi
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -38,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'shop',
 
     'drf_spectacular',
@@ -53,8 +60,13 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'shop.db_router.ReplicaRoutingMiddleware',
+    'shop.middleware.QueryCountMiddleware',
 ]
 
+# X-DB-Query-Count / X-DB-Time-Ms javob header'lari (faqat debug uchun); berilmasa DEBUG'ga ergashadi
+QUERY_COUNT_HEADERS = {"1": True, "0": False}.get(os.environ.get("QUERY_COUNT_HEADERS"))
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -79,16 +91,61 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": "tests",
-        "USER": "postgres",
-        "PASSWORD": "1",
-        "HOST": "127.0.0.1",
-        "PORT": "5432",
+# DB_ENGINE=sqlite - lokal ishga tushirish va testlar uchun PostgreSQL'siz rejim
+
+DB_ENGINE = os.environ.get("DB_ENGINE") or "postgresql"
+
+if DB_ENGINE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME") or BASE_DIR / "db.sqlite3",
+        }
     }
-}
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME") or "tests",
+            "USER": os.environ.get("DB_USER") or "postgres",
+            "PASSWORD": os.environ.get("DB_PASS") or "1",
+            "HOST": os.environ.get("DB_HOST") or "127.0.0.1",
+            "PORT": os.environ.get("DB_PORT") or "5432",
+        }
+    }
+
+# Ulanishlar: DB_POOL=1 - psycopg 3 connection pool (faqat PostgreSQL),
+# aks holda DB_CONN_MAX_AGE soniya davomida persistent ulanish + health check.
+if DB_ENGINE != "sqlite" and os.environ.get("DB_POOL") == "1":
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE") or 2),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE") or 10),
+            "timeout": int(os.environ.get("DB_POOL_TIMEOUT") or 10),
+        },
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE") or 0)
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = os.environ.get("DB_CONN_HEALTH_CHECKS", "1") == "1"
+
+# Read replica'lar: DB_REPLICAS=host1:5432,host2 (postgresql) yoki fayl yo'llari (sqlite).
+# Testlarda replica'lar default bazaning ko'zgusi (TEST MIRROR).
+REPLICA_DATABASES = []
+for number, replica in enumerate(filter(None, os.environ.get("DB_REPLICAS", "").split(",")), start=1):
+    alias = f"replica_{number}"
+    if DB_ENGINE == "sqlite":
+        location = {"NAME": replica.strip()}
+    else:
+        host, _, port = replica.strip().partition(":")
+        location = {"HOST": host, "PORT": port or DATABASES["default"]["PORT"]}
+    DATABASES[alias] = {**DATABASES["default"], **location, "TEST": {"MIRROR": "default"}}
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['shop.db_router.ReplicaRouter']
+
+# Yozishdan keyin shu muddat davomida klient o'qishlari ham primary'dan (read-your-writes)
+READ_YOUR_WRITES_SECONDS = int(os.environ.get("READ_YOUR_WRITES_SECONDS") or 5)
+
 AUTH_USER_MODEL = 'shop.User'
 
 
@@ -122,9 +179,132 @@ USE_I18N = True
 
 USE_TZ = True
 
-CELERY_BROKER_URL = 'redis://localhost:6379/0'  # Redis broker ishlatamiz
+# Cache
+# Catalog javoblari cache'lanadi (shop.cache). REDIS_URL berilsa Redis, aks holda CACHE_BACKEND.
+
+REDIS_URL = os.environ.get("REDIS_URL")
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+elif CACHE_BACKEND == "file":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("CACHE_LOCATION", str(BASE_DIR / ".cache")),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "shop",
+        }
+    }
+
+CATALOG_CACHE_TIMEOUT = int(os.environ.get("CATALOG_CACHE_TIMEOUT", 60 * 60))
+
+# Search
+# Full-text natija bo'lmasa, nom bo'yicha trigram (pg_trgm) qidiruv ishlatiladi
+
+SEARCH_TRIGRAM_FALLBACK = os.environ.get("SEARCH_TRIGRAM_FALLBACK", "1") == "1"
+SEARCH_TRIGRAM_THRESHOLD = float(os.environ.get("SEARCH_TRIGRAM_THRESHOLD", 0.3))
+
+# Catalog export (NDJSON) bitta DB so'rovida nechta mahsulot o'qiydi
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+
+# ?expand=comments bilan mahsulotda ko'rsatiladigan oxirgi kommentlar soni
+PRODUCT_EXPAND_COMMENTS = int(os.environ.get("PRODUCT_EXPAND_COMMENTS", 10))
+
+# Product image variantlari (shop.images): nom -> kenglik (px)
+PRODUCT_IMAGE_VARIANTS = {"thumb": 160, "small": 320, "medium": 640, "large": 1280}
+PRODUCT_IMAGE_FORMATS = ["webp", "jpeg"]
+PRODUCT_IMAGE_QUALITY = 80
+
+# Og'ir ishlar (shop.tasks) Celery worker'da bajariladi. Broker berilmasa, task'lar
+# so'rov ichida darhol (eager) ishlaydi - Redis'siz development va testlar uchun.
+CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL") or REDIS_URL or "memory://"
+CELERY_TASK_ALWAYS_EAGER = (
+    os.environ.get("CELERY_TASK_ALWAYS_EAGER") or ("1" if CELERY_BROKER_URL == "memory://" else "0")
+) == "1"
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
+CELERY_TIMEZONE = TIME_ZONE
+
+# Like/unlike'lar cache'da yig'iladi va shop.likes.flush() bazaga partiyalab yozadi (shop/likes.py)
+LIKE_BUFFER = os.environ.get("LIKE_BUFFER") == "1"
+# Buferning o'zi bazada (PendingLike); cache mutex va kutilayotgan delta uchun: alohida alias, noeviction Redis
+LIKE_BUFFER_CACHE = os.environ.get("LIKE_BUFFER_CACHE") or "likes"
+LIKE_BUFFER_REDIS_URL = os.environ.get("LIKE_BUFFER_REDIS_URL") or REDIS_URL
+# Redis'siz bitta web jarayon (runserver, testlar) uchun locmem o'rinbosar
+LIKE_BUFFER_LOCAL = os.environ.get("LIKE_BUFFER_LOCAL") == "1"
+if LIKE_BUFFER_REDIS_URL:
+    CACHES["likes"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": LIKE_BUFFER_REDIS_URL,
+        "KEY_PREFIX": "likes",
+    }
+elif LIKE_BUFFER_LOCAL:
+    CACHES["likes"] = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "likes",
+    }
+# Keshdagi kutilayotgan delta shu muddatdan keyin log'dan qayta hisoblanadi (poyga xatolari chegarasi)
+LIKE_BUFFER_PENDING_TIMEOUT = int(os.environ.get("LIKE_BUFFER_PENDING_TIMEOUT") or 60)
+LIKE_BUFFER_BATCH_SIZE = int(os.environ.get("LIKE_BUFFER_BATCH_SIZE") or 500)
+LIKE_BUFFER_FLUSH_INTERVAL = float(os.environ.get("LIKE_BUFFER_FLUSH_INTERVAL") or 2)
+LIKE_BUFFER_LOCK_TIMEOUT = 60
+
+# Checkout: zaxira (stock) shu muddatgacha band qilinadi, to'lanmasa expire_reservations qaytaradi
+ORDER_RESERVATION_SECONDS = int(os.environ.get("ORDER_RESERVATION_SECONDS") or 15 * 60)
+ORDER_MAX_QUANTITY = 100
+
+# celery -A config beat
+CELERY_BEAT_SCHEDULE = {
+    "expire-deals": {
+        "task": "shop.tasks.expire_deals",
+        "schedule": int(os.environ.get("EXPIRE_DEALS_INTERVAL") or 60),
+    },
+    "expire-reservations": {
+        "task": "shop.tasks.expire_reservations",
+        "schedule": 60,
+    },
+    "reconcile-counters": {
+        "task": "shop.tasks.reconcile_counters",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "generate-missing-image-variants": {
+        "task": "shop.tasks.generate_missing_image_variants",
+        "schedule": crontab(minute=15),
+    },
+    "rebuild-search-vectors": {
+        "task": "shop.tasks.rebuild_search_vectors",
+        "schedule": crontab(hour=3, minute=30),
+    },
+    "rebuild-facets": {
+        "task": "shop.tasks.rebuild_facets",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    "rebuild-category-tree": {
+        "task": "shop.tasks.rebuild_category_tree",
+        "schedule": crontab(hour=4, minute=30),
+    },
+}
+
+if LIKE_BUFFER:
+    CELERY_BEAT_SCHEDULE["flush-like-buffer"] = {
+        "task": "shop.tasks.flush_like_buffer",
+        "schedule": LIKE_BUFFER_FLUSH_INTERVAL,
+    }
 
 
 # Static files (CSS, JavaScript, Images)
@@ -145,7 +325,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'shop.pagination.SizedPageNumberPagination',
     'PAGE_SIZE': 10,  # Bir sahifada nechta element bo‘lishini belgilang
 
     # DRF Spectacular uchun default schema class
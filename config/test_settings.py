@@ -0,0 +1,10 @@
+"""
+Settings for the test suite: ``DJANGO_SETTINGS_MODULE=config.test_settings``.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, REPLICA_DATABASES
+
+# DB_REPLICAS bo'lmasa ham routing testlari haqiqiy (ko'zgu) alias bilan ishlaydi.
+# REPLICA_DATABASES'ga qo'shilmaydi - testlar uni override_settings bilan yoqadi
+if not REPLICA_DATABASES:
+    DATABASES["replica_1"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, Deal, Brand,Feature
+from .models import Category, Product, Deal, Brand,Feature, Order, OrderItem
 from django.contrib import admin
 from .models import Product, ProductImage, User
 
@@ -24,3 +24,19 @@ class DealAdmin(admin.ModelAdmin):
     list_display = ("id", "product", "discount", "is_active", "start_time", "end_time")
 
 
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    raw_id_fields = ("product",)
+    # Zaxira faqat shop.orders orqali o'zgaradi
+    readonly_fields = ("product", "quantity", "price")
+    can_delete = False
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "status", "total", "created_at", "reserved_until")
+    list_filter = ("status",)
+    search_fields = ("user__email",)
+    readonly_fields = ("user", "status", "total", "created_at", "reserved_until")
+    inlines = [OrderItemInline]
@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shop'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.models.signals import post_migrate
+
+        from . import signals  # noqa: F401
+        from .search import create_search_indexes
+
+        post_migrate.connect(create_search_indexes, sender=self)
+
+        if settings.LIKE_BUFFER:
+            # Noto'g'ri sozlangan bufer like'larni yo'qotmasligi uchun darhol to'xtaymiz
+            from .likes import get_cache
+
+            get_cache()
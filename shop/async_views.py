@@ -0,0 +1,120 @@
+"""
+Async versions of the hot read endpoints for ASGI deployments
+(``uvicorn config.asgi:application``).
+
+They return the same representations as their DRF counterparts in
+``shop.views`` but read through the async queryset API, so a worker is not
+tied up while PostgreSQL answers. DRF views are synchronous, hence these are
+plain Django async views that reuse the DRF serializers on fully prefetched
+objects (serialization itself does not touch the database).
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .db_router import reads_from_replica
+from .facets import afacet_counts, filter_deals, filter_products
+from .models import Comment, Deal, Product, primary_image_prefetch
+from .pagination import AsyncCommentPagination, AsyncPageNumberPagination, AsyncProductPagination
+from .serializers import CommentSerializer, DealSerializer, ProductListSerializer, ProductSerializer
+
+
+async def authenticate(request):
+    """
+    JWT authentication as in ``JWTAuthentication.authenticate()``; only the
+    user lookup runs in a thread.
+    """
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    if raw_token is None:
+        return AnonymousUser()
+    token = auth.get_validated_token(raw_token)
+    return await sync_to_async(auth.get_user)(token)
+
+
+def async_api_view(view):
+    """
+    Authenticate the request and render DRF ``APIException``s as JSON, the
+    way ``APIView`` would.
+    """
+    @require_GET
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            request.user = await authenticate(request)
+            response = await view(request, *args, **kwargs)
+        except APIException as exc:
+            response = JsonResponse(exc.detail, status=exc.status_code, safe=False)
+        patch_vary_headers(response, ["Authorization"])
+        return response
+    return wrapper
+
+
+# =====================
+# PRODUCT API
+# =====================
+
+@reads_from_replica
+@async_api_view
+async def product_list(request):
+    # Kategoriya filtri path'larni o'qiydi (bitta kichik query), shuning uchun thread'da
+    queryset = await sync_to_async(filter_products)(Product.objects.with_effective_price(), request.GET)
+    paginator = AsyncProductPagination(request)
+    products = await paginator.paginate_queryset(
+        queryset.with_is_liked(request.user).prefetch_related(primary_image_prefetch())
+    )
+    data = paginator.get_paginated_data(
+        ProductListSerializer(products, many=True, context={"request": request}).data
+    )
+    data["facets"] = await afacet_counts(queryset)
+    return JsonResponse(data)
+
+
+@reads_from_replica
+@async_api_view
+async def product_detail(request, pk):
+    queryset = ProductSerializer.optimize_queryset(Product.objects.all(), request)
+    try:
+        product = await queryset.aget(pk=pk)
+    except Product.DoesNotExist:
+        raise NotFound("No Product matches the given query.")
+    return JsonResponse(ProductSerializer(product, context={"request": request}).data)
+
+
+# =====================
+# DEAL API
+# =====================
+
+@reads_from_replica
+@async_api_view
+async def deal_list(request):
+    queryset = Deal.objects.active().select_related("product").prefetch_related(
+        primary_image_prefetch("product__images")
+    ).order_by("-id")
+    queryset = filter_deals(queryset, request.GET)
+
+    paginator = AsyncPageNumberPagination(request)
+    deals = await paginator.paginate_queryset(queryset)
+    return JsonResponse(paginator.get_paginated_data(
+        DealSerializer(deals, many=True, context={"request": request}).data
+    ))
+
+
+# =====================
+# COMMENT API
+# =====================
+
+@async_api_view
+async def comment_list(request, product_id):
+    paginator = AsyncCommentPagination(request)
+    comments = await paginator.paginate_queryset(Comment.objects.filter(product_id=product_id))
+    return JsonResponse(paginator.get_paginated_data(
+        CommentSerializer(comments, many=True, context={"request": request}).data
+    ))
@@ -0,0 +1,511 @@
+import asyncio
+import platform
+import random
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.utils import load_backend
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .middleware import QueryStats
+from .models import Comment, Deal, Like, Product, User, primary_image_prefetch
+from .renderers import ORJSONRenderer
+from .serializers import ProductListRows, ProductListSerializer
+
+BENCH_EMAIL_DOMAIN = "bench.local"
+BENCH_RUNNER = "bench_runner"  # seed_benchmark bu userga like/comment yozmaydi
+
+
+def test_hosts():
+    # Test client'lar "testserver" host'i bilan so'rov yuboradi
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"])
+
+
+def get_runner():
+    user, _ = User.objects.get_or_create(
+        username=BENCH_RUNNER, defaults={"email": f"runner@{BENCH_EMAIL_DOMAIN}"}
+    )
+    return user
+
+
+class BenchmarkContext:
+    """
+    State shared by the scenarios of one run: the client, the sample of
+    product ids and the comments created by ``comment_add`` (deleted again
+    by ``comment_delete``, so a run leaves the counters where it found them).
+    """
+
+    def __init__(self, user, seed=0, sample_size=500):
+        self.headers = {"authorization": f"Bearer {AccessToken.for_user(user)}"}
+        self.client = Client(headers=self.headers)
+        self.rng = random.Random(seed)
+        self.product_ids = list(Product.objects.order_by("?").values_list("pk", flat=True)[:sample_size])
+        self.user = user
+        self.comment_ids = []
+        if not self.product_ids:
+            raise ValueError("No products to benchmark, run seed_benchmark first")
+
+    def product_id(self, i):
+        return self.product_ids[i % len(self.product_ids)]
+
+
+def _get(name, *args, **params):
+    def build(ctx, i):
+        return "get", reverse(f"ecommerce:{name}", args=[arg(ctx, i) for arg in args]), params
+    return build
+
+
+def _random_product(ctx, i):
+    return ctx.rng.choice(ctx.product_ids)
+
+
+def _like_add(ctx, i):
+    return "post", reverse("ecommerce:add_like", args=[ctx.product_id(i)]), None
+
+
+def _like_delete(ctx, i):
+    return "delete", reverse("ecommerce:delete_like", args=[ctx.product_id(i)]), None
+
+
+def _comment_add(ctx, i):
+    return "post", reverse("ecommerce:comment-add", args=[ctx.product_id(i)]), {"text": f"Benchmark {i}"}
+
+
+def _comment_delete(ctx, i):
+    if i >= len(ctx.comment_ids):
+        return None
+    return "delete", reverse("ecommerce:comment-delete", args=[ctx.comment_ids[i]]), None
+
+
+# Tartib muhim: like_add/comment_add yozgan qatorlarni keyingi ssenariy o'chiradi
+SCENARIOS = {
+    "category_list": _get("category_list"),
+    "product_list": _get("product_list"),
+    "product_list_50": _get("product_list", page_size=50),
+    "product_list_filtered": _get("product_list", min_price=100, max_price=500),
+    "product_search": _get("product_search", q="phone"),
+    "product_detail": _get("product_detail", _random_product),
+    "deal_list": _get("deal_list"),
+    "comment_feed": _get("add-comment", _random_product),
+    "like_add": _like_add,
+    "like_delete": _like_delete,
+    "comment_add": _comment_add,
+    "comment_delete": _comment_delete,
+}
+
+
+def default_output(report, prefix=""):
+    """
+    Default result file of ``report``: ``benchmarks/<prefix><timestamp>.json``,
+    with a compact timestamp that is a valid file name on every platform.
+    """
+    stamp = datetime.fromisoformat(report["timestamp"]).strftime("%Y%m%dT%H%M%S")
+    return Path(settings.BASE_DIR, "benchmarks", f"{prefix}{stamp}.json")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def run_scenario(ctx, name, iterations, warmup=0):
+    build = SCENARIOS[name]
+    timings = []
+    queries = 0
+    errors = 0
+    started = time.perf_counter()
+    for i in range(warmup + iterations):
+        request = build(ctx, i)
+        if request is None:
+            break
+        method, url, data = request
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            t0 = time.perf_counter()
+            if method == "get":
+                response = ctx.client.get(url, data)
+            else:
+                response = getattr(ctx.client, method)(url, data, content_type="application/json")
+            elapsed = time.perf_counter() - t0
+        if name == "comment_add" and response.status_code == 201:
+            ctx.comment_ids.append(response.json()["id"])
+        if i < warmup:
+            started = time.perf_counter()
+            continue
+        if response.status_code >= 400:
+            errors += 1
+        timings.append(elapsed * 1000)
+        queries += stats.count
+    wall = time.perf_counter() - started
+
+    result = summarize(timings, errors, wall)
+    result["queries_per_request"] = round(queries / len(timings), 2) if timings else 0.0
+    return result
+
+
+def summarize(timings, errors, wall):
+    timings = sorted(timings)
+    count = len(timings)
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "mean_ms": round(sum(timings) / count, 3) if count else 0.0,
+        "max_ms": round(timings[-1], 3) if count else 0.0,
+        "throughput_rps": round(count / wall, 1) if wall else 0.0,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmarks(user, scenarios=None, iterations=100, warmup=10, seed=0):
+    """
+    Drive the API in-process with the Django test client (sequentially, no
+    network) and return a JSON-serializable report: per-scenario latency
+    percentiles, throughput and SQL queries per request, plus enough
+    metadata (revision, database, data volume) to compare runs over time.
+    """
+    ctx = BenchmarkContext(user, seed=seed)
+    with test_hosts():
+        results = {name: run_scenario(ctx, name, iterations, warmup) for name in scenarios or SCENARIOS}
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "iterations": iterations,
+        "warmup": warmup,
+        "data": {
+            "users": User.objects.count(),
+            "products": Product.objects.count(),
+            "deals": Deal.objects.count(),
+            "likes": Like.objects.count(),
+            "comments": Comment.objects.count(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, metric="p95_ms"):
+    """``{scenario: (baseline, current, change %)}`` for scenarios present in both reports."""
+    changes = {}
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        old, new = before[metric], result[metric]
+        changes[name] = (old, new, round((new - old) / old * 100, 1) if old else 0.0)
+    return changes
+
+
+# =====================
+# WSGI vs ASGI
+# =====================
+
+# Sync DRF endpoint va uning async (shop.async_views) nusxasi
+CONCURRENCY_SCENARIOS = {
+    "product_list": ("product_list", "async_product_list", False),
+    "product_detail": ("product_detail", "async_product_detail", True),
+    "deal_list": ("deal_list", "async_deal_list", False),
+    "comment_feed": ("add-comment", "async_comment_list", True),
+}
+
+
+@contextmanager
+def db_latency(milliseconds):
+    """
+    Add ``milliseconds`` to every query on the connections opened inside the
+    block, to emulate the network round trip to a remote PostgreSQL.
+    """
+    if not milliseconds:
+        yield
+        return
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(milliseconds / 1000)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+
+
+def _urls(ctx, name, per_product, count):
+    if per_product:
+        return [reverse(f"ecommerce:{name}", args=[ctx.product_id(i)]) for i in range(count)]
+    return [reverse(f"ecommerce:{name}")] * count
+
+
+def run_wsgi(urls, concurrency, headers):
+    """``concurrency`` threads, as in a threaded WSGI worker, each with its own DB connection."""
+    chunks = [urls[i::concurrency] for i in range(concurrency)]
+    timings, errors = [], []
+    lock = threading.Lock()
+
+    def worker(chunk):
+        client = Client(headers=headers)
+        try:
+            for url in chunk:
+                t0 = time.perf_counter()
+                status = client.get(url).status_code
+                elapsed = (time.perf_counter() - t0) * 1000
+                with lock:
+                    timings.append(elapsed)
+                    if status >= 400:
+                        errors.append(url)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(timings, len(errors), time.perf_counter() - started)
+
+
+async def _run_asgi(urls, concurrency, headers):
+    client = AsyncClient()
+    pending = iter(urls)
+    timings, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        for url in pending:
+            t0 = time.perf_counter()
+            # ASGIHandler kabi: har bir so'rovning sync qismi o'z thread'ida
+            async with ThreadSensitiveContext():
+                response = await client.get(url, headers=headers)
+            timings.append((time.perf_counter() - t0) * 1000)
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(timings, errors, time.perf_counter() - started)
+
+
+def run_asgi(urls, concurrency, headers):
+    """``concurrency`` in-flight requests on one event loop, as under an ASGI server."""
+    # Event loop alohida thread'da: asyncio.run() joriy thread'ning asgiref holatiga bog'lanmaydi
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, _run_asgi(urls, concurrency, headers)).result()
+
+
+def run_concurrency(user, scenarios=None, levels=(1, 8, 32), requests=200, latency_ms=0, seed=0):
+    """
+    Serve the same requests through the WSGI handler (sync DRF views, one
+    thread per concurrent request) and the ASGI handler (async views) at
+    each concurrency level.
+    """
+    ctx = BenchmarkContext(user, seed=seed)
+    results = {}
+    with test_hosts(), db_latency(latency_ms):
+        for name in scenarios or CONCURRENCY_SCENARIOS:
+            sync_name, async_name, per_product = CONCURRENCY_SCENARIOS[name]
+            results[name] = {
+                str(level): {
+                    "wsgi": run_wsgi(_urls(ctx, sync_name, per_product, requests), level, ctx.headers),
+                    "asgi": run_asgi(_urls(ctx, async_name, per_product, requests), level, ctx.headers),
+                }
+                for level in levels
+            }
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "database": connection.vendor,
+        "requests": requests,
+        "db_latency_ms": latency_ms,
+        "results": results,
+    }
+
+
+# =====================
+# CONNECTIONS
+# =====================
+
+CONNECTION_MODES = {
+    # Har so'rovda yangi ulanish (CONN_MAX_AGE=0, hozirgi default)
+    "new": {"CONN_MAX_AGE": 0},
+    "persistent": {"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True},
+    "pool": {"CONN_MAX_AGE": 0, "pool": {"min_size": 1, "max_size": 2}},
+}
+
+
+def _benchmark_connection(alias, mode):
+    base = connections.settings[alias]
+    overrides = dict(CONNECTION_MODES[mode])
+    options = {key: value for key, value in base["OPTIONS"].items() if key != "pool"}
+    if "pool" in overrides:
+        options["pool"] = overrides.pop("pool")
+    backend = load_backend(base["ENGINE"])
+    # Alohida alias: Django pool'larni alias bo'yicha saqlaydi
+    return backend.DatabaseWrapper({**base, **overrides, "OPTIONS": options}, alias=f"{alias}_{mode}_benchmark")
+
+
+def pooling_available(alias=DEFAULT_DB_ALIAS):
+    if connections[alias].vendor != "postgresql":
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return is_psycopg3
+
+
+def run_connection_mode(alias, mode, requests):
+    """
+    Replay the connection lifecycle of ``requests`` cheap requests (``SELECT 1``
+    between the ``close_old_connections()`` calls Django makes on request
+    start and finish) and time each one.
+    """
+    wrapper = _benchmark_connection(alias, mode)
+    opened = 0
+
+    def count(sender, connection, **kwargs):
+        nonlocal opened
+        opened += connection is wrapper
+
+    connection_created.connect(count, weak=False)
+    timings = []
+    started = time.perf_counter()
+    try:
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            wrapper.close_if_unusable_or_obsolete()
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            wrapper.close_if_unusable_or_obsolete()
+            timings.append((time.perf_counter() - t0) * 1000)
+        wall = time.perf_counter() - started
+    finally:
+        connection_created.disconnect(count)
+        wrapper.close()
+        if mode == "pool":
+            wrapper.close_pool()
+    result = summarize(timings, 0, wall)
+    result["connections_opened"] = opened
+    return result
+
+
+def run_connection_benchmark(alias=DEFAULT_DB_ALIAS, requests=200):
+    results = {}
+    for mode in CONNECTION_MODES:
+        if mode == "pool" and not pooling_available(alias):
+            results[mode] = {"skipped": "needs PostgreSQL with psycopg 3 and psycopg_pool"}
+            continue
+        results[mode] = run_connection_mode(alias, mode, requests)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "database": connections[alias].vendor,
+        "requests": requests,
+        "results": results,
+    }
+
+
+# =====================
+# SERIALIZATION
+# =====================
+
+def _drf_fetch(queryset, request):
+    return list(queryset.prefetch_related(primary_image_prefetch()))
+
+
+def _drf_render(products, request):
+    data = ProductListSerializer(products, many=True, context={"request": request}).data
+    return JSONRenderer().render(data)
+
+
+def _rows_fetch(queryset, request):
+    return list(ProductListRows().queryset(queryset))
+
+
+def _rows_render(rows, request):
+    return ORJSONRenderer().render(ProductListRows({"request": request}).to_representation(rows))
+
+
+SERIALIZERS = {
+    "drf": (_drf_fetch, _drf_render),
+    "rows": (_rows_fetch, _rows_render),
+}
+
+
+def run_serializer_benchmark(user, page_size=100, iterations=50):
+    """
+    Serialize one product list page with ``ProductListSerializer`` +
+    ``JSONRenderer`` and with ``ProductListRows`` + ``ORJSONRenderer``.
+
+    ``render`` times serialization and rendering of already fetched rows
+    (the image query of ``ProductListRows`` included), ``total`` adds the
+    product query.
+    """
+    request = RequestFactory().get("/")
+    request.user = user
+    queryset = Product.objects.with_is_liked(user).with_effective_price().order_by("-id")[:page_size]
+    results = {}
+    with test_hosts():
+        for name, (fetch, render) in SERIALIZERS.items():
+            rows = fetch(queryset, request)
+            if not rows:
+                raise ValueError("No products to benchmark, run seed_benchmark first")
+            body = render(rows, request)
+            render_timings, total_timings = [], []
+            for _ in range(iterations):
+                t0 = time.perf_counter()
+                render(rows, request)
+                render_timings.append((time.perf_counter() - t0) * 1000)
+                t0 = time.perf_counter()
+                render(fetch(queryset, request), request)
+                total_timings.append((time.perf_counter() - t0) * 1000)
+            results[name] = {"objects": len(rows), "bytes": len(body)}
+            for stage, timings in (("render", render_timings), ("total", total_timings)):
+                timings = sorted(timings)
+                mean = statistics.fmean(timings)
+                results[name][stage] = {
+                    "p50_ms": round(percentile(timings, 50), 3),
+                    "mean_ms": round(mean, 3),
+                    "objects_per_sec": round(len(rows) / mean * 1000, 1),
+                }
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "page_size": page_size,
+        "iterations": iterations,
+        "results": results,
+    }
@@ -0,0 +1,104 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+VERSION_KEY = "shop:version:{}"
+STATS_KEY = "shop:cache-stats:{}:{}"
+
+
+def _version_key(model):
+    return VERSION_KEY.format(model._meta.label_lower)
+
+
+def _initial_version():
+    # Versiya cache'dan o'chib ketsa ham eski kalitlar qayta ishlatilmasligi uchun
+    return int(time.time() * 1000)
+
+
+def get_versions(models):
+    """
+    Current version number of every model in ``models``, in the same order.
+    """
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(model):
+    """
+    Invalidate every cached response built from ``model``.
+    """
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), timeout=None)
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def record(view_name, outcome):
+    _incr(STATS_KEY.format(view_name, outcome))
+
+
+def get_stats():
+    """
+    Hit/miss counters of every view using ``CachedResponseMixin``.
+    """
+    names = sorted(CachedResponseMixin.registry)
+    keys = {STATS_KEY.format(name, outcome): (name, outcome) for name in names for outcome in ("hit", "miss")}
+    values = cache.get_many(keys)
+    stats = {name: {"hit": 0, "miss": 0} for name in names}
+    for key, (name, outcome) in keys.items():
+        stats[name][outcome] = values.get(key, 0)
+    return stats
+
+
+class CachedResponseMixin:
+    """
+    Cache successful GET responses of a DRF view.
+
+    The cache key contains the version of every model in ``cache_models``;
+    the versions are bumped from model signals (see ``shop.signals``), so a
+    write makes the old entries unreachable instead of deleting them.
+    """
+    cache_models = ()
+    cache_timeout = None
+    registry = set()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.cache_models:
+            CachedResponseMixin.registry.add(cls.__name__)
+
+    def get_cache_key(self, request):
+        versions = ".".join(str(version) for version in get_versions(self.cache_models))
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f"shop:response:{self.__class__.__name__}:{path}:{versions}"
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            record(self.__class__.__name__, "hit")
+            return Response(data)
+
+        record(self.__class__.__name__, "miss")
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            timeout = self.cache_timeout or settings.CATALOG_CACHE_TIMEOUT
+            cache.set(key, response.data, timeout=timeout)
+        return response
@@ -0,0 +1,157 @@
+"""
+Category tree maintenance.
+
+Paths are built from ids (``"/1/7/12/"``): a node's ancestors are read from
+its path without a query, and its subtree is every category whose path
+starts with it. ``product_count`` of a node covers its whole subtree and is
+adjusted incrementally from the product signals (``shop.signals``);
+``rebuild_tree()`` recomputes paths and counts after bulk writes that skip
+the signals (imports, seeding).
+"""
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Concat, Greatest, Substr
+
+from .cache import bump_version
+from .models import Category, Product
+
+
+def ancestor_ids(path):
+    """Ids on ``path`` from the root down to the node itself."""
+    return [int(pk) for pk in path.strip("/").split("/") if pk]
+
+
+def subtree_filter(category_ids, prefix="category__"):
+    """
+    ``Q`` matching the objects whose category (``prefix``) lies under any of
+    ``category_ids``, the categories themselves included.
+
+    The roots' paths are read first (one query), so the filter is a literal
+    ``path LIKE '/1/7/%'`` per root, served by ``category_path_idx``.
+    Unknown ids match nothing.
+    """
+    paths = sorted(Category.objects.filter(pk__in=category_ids).values_list("path", flat=True))
+    roots = []
+    for path in paths:
+        # Tanlangan ota-onaning ichidagi kategoriya alohida shart talab qilmaydi
+        if not any(path.startswith(root) for root in roots):
+            roots.append(path)
+    if not roots:
+        return Q(pk__in=[])
+    match = Q()
+    for root in roots:
+        match |= Q(**{f"{prefix}path__startswith": root})
+    return match
+
+
+def _add_counts(totals):
+    totals = {pk: delta for pk, delta in totals.items() if delta}
+    if not totals:
+        return
+    Category.objects.filter(pk__in=totals).update(product_count=Greatest(
+        F("product_count") + Case(*(When(pk=pk, then=Value(delta)) for pk, delta in totals.items()), default=0),
+        0,
+    ))
+    bump_version(Category)
+
+
+def adjust_product_counts(changes):
+    """
+    Apply ``{category_id: delta}`` product count changes to every ancestor
+    of the categories (one ``SELECT`` for the paths, one ``UPDATE``).
+    """
+    changes = {pk: delta for pk, delta in changes.items() if pk and delta}
+    if not changes:
+        return
+    totals = defaultdict(int)
+    for pk, path in Category.objects.filter(pk__in=changes).values_list("pk", "path"):
+        for ancestor in ancestor_ids(path):
+            totals[ancestor] += changes[pk]
+    _add_counts(totals)
+
+
+def place(category, previous=None):
+    """
+    Set the path and depth of a saved ``category`` under its parent. When it
+    moved (``previous`` holds its old ``parent_id``/``path``/``depth``), the
+    descendants' paths are rewritten and its products move to the new
+    ancestors' counts.
+    """
+    parent_path, depth = "/", 0
+    if category.parent_id:
+        parent_path, parent_depth = Category.objects.values_list("path", "depth").get(pk=category.parent_id)
+        if previous and previous["path"] and parent_path.startswith(previous["path"]):
+            raise ValidationError("A category cannot be moved under itself or its descendants.")
+        depth = parent_depth + 1
+    category.path = f"{parent_path}{category.pk}/"
+    category.depth = depth
+    Category.objects.filter(pk=category.pk).update(path=category.path, depth=category.depth)
+
+    if not previous or not previous["path"] or previous["path"] == category.path:
+        return
+    old_path = previous["path"]
+    Category.objects.filter(path__startswith=old_path).exclude(pk=category.pk).update(
+        path=Concat(Value(category.path), Substr("path", len(old_path) + 1)),
+        depth=F("depth") + (depth - previous["depth"]),
+    )
+    count = Category.objects.values_list("product_count", flat=True).get(pk=category.pk)
+    old, new = set(ancestor_ids(old_path)), set(ancestor_ids(category.path))
+    _add_counts({**{pk: -count for pk in old - new}, **{pk: count for pk in new - old}})
+
+
+def rebuild_tree(batch_size=1000):
+    """
+    Recompute ``path``, ``depth`` and ``product_count`` of every category
+    from ``parent`` and the products. Returns the number of changed rows.
+    """
+    nodes = {pk: (parent_id, path, depth, count) for pk, parent_id, path, depth, count in
+             Category.objects.values_list("pk", "parent_id", "path", "depth", "product_count")}
+    children = defaultdict(list)
+    for pk, (parent_id, *_) in nodes.items():
+        children[parent_id].append(pk)
+    direct = dict(
+        Product.objects.order_by().values("category_id").annotate(total=Count("pk")).values_list("category_id", "total")
+    )
+
+    paths, depths, order = {}, {}, []
+    stack = [(pk, "/", 0) for pk in children[None]]
+    while stack:
+        pk, parent_path, depth = stack.pop()
+        paths[pk], depths[pk] = f"{parent_path}{pk}/", depth
+        order.append(pk)
+        stack.extend((child, paths[pk], depth + 1) for child in children[pk])
+
+    counts = {pk: direct.get(pk, 0) for pk in order}
+    # Bargdan ildizga: har bir tugun sonini ota-onasiga qo'shamiz
+    for pk in reversed(order):
+        parent_id = nodes[pk][0]
+        if parent_id is not None:
+            counts[parent_id] += counts[pk]
+
+    changed = [
+        Category(pk=pk, path=paths[pk], depth=depths[pk], product_count=counts[pk])
+        for pk in order
+        if nodes[pk][1:] != (paths[pk], depths[pk], counts[pk])
+    ]
+    Category.objects.bulk_update(changed, ["path", "depth", "product_count"], batch_size=batch_size)
+    if changed:
+        bump_version(Category)
+    return len(changed)
+
+
+def build_tree(categories):
+    """
+    Attach every category of ``categories`` to its parent's
+    ``tree_children`` (in the given order) and return the roots.
+    """
+    categories = list(categories)
+    by_id = {category.pk: category for category in categories}
+    roots = []
+    for category in categories:
+        category.tree_children = []
+    for category in categories:
+        parent = by_id.get(category.parent_id)
+        (parent.tree_children if parent else roots).append(category)
+    return roots
@@ -0,0 +1,52 @@
+import hashlib
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_versions
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for DRF GET views.
+
+    The validators are computed from cheap lookups (model versions from
+    ``shop.cache``, ``updated_at``) before the view runs, so a matching
+    ``If-None-Match``/``If-Modified-Since`` is answered with ``304 Not
+    Modified`` without touching the serializer.
+    """
+    etag_models = ()
+
+    def get_etag_parts(self, request, *args, **kwargs):
+        """
+        Values the representation depends on. Responses vary by user
+        (``is_liked``), so the user id is always part of the tag.
+        """
+        return [
+            *get_versions(self.etag_models),
+            request.get_full_path(),
+            request.user.pk if request.user.is_authenticated else "",
+        ]
+
+    def get_last_modified(self, request, *args, **kwargs):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        parts = self.get_etag_parts(request, *args, **kwargs)
+        etag = None
+        if parts is not None:
+            etag = quote_etag(hashlib.md5(":".join(map(str, parts)).encode()).hexdigest())
+        last_modified = self.get_last_modified(request, *args, **kwargs)
+        last_modified = timegm(last_modified.utctimetuple()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code == 200:
+                if etag:
+                    response.headers["ETag"] = etag
+                if last_modified:
+                    response.headers["Last-Modified"] = http_date(last_modified)
+        patch_vary_headers(response, ["Authorization"])
+        return response
@@ -0,0 +1,72 @@
+"""
+Denormalized product counters (``likes_count``, ``comments_count``).
+
+The views and the like buffer adjust the counters incrementally;
+``reconcile_counters()`` (the ``reconcile_counters`` task and command)
+repairs any drift from the real row counts.
+"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .cache import bump_version
+from .models import Comment, Like, Product
+
+
+def _count_subquery(model, field="product"):
+    """Correlated ``COUNT(*)`` of ``model`` rows pointing at the outer product."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+COUNTERS = {
+    "likes_count": Like,
+    "comments_count": Comment,
+}
+
+
+def reconcile_counters(batch_size=1000, dry_run=False):
+    """
+    Repair drift between the stored product counters and the real row counts.
+
+    Only drifted products are loaded, and they are written back with
+    ``bulk_update`` in batches of ``batch_size``. Returns the number of
+    repaired products per counter.
+    """
+    repaired = {}
+    for counter, model in COUNTERS.items():
+        drifted = (
+            Product.objects.annotate(actual=_count_subquery(model))
+            .filter(~Q(**{counter: F("actual")}))
+            .values_list("pk", "actual")
+            .order_by("pk")
+        )
+        fixed = 0
+        batch = []
+        for pk, actual in drifted.iterator(chunk_size=batch_size):
+            batch.append(Product(pk=pk, **{counter: actual}))
+            if len(batch) >= batch_size:
+                fixed += _flush(batch, counter, dry_run)
+                batch = []
+        if batch:
+            fixed += _flush(batch, counter, dry_run)
+        if fixed and not dry_run:
+            bump_version(model)
+        repaired[counter] = fixed
+    return repaired
+
+
+def _flush(batch, counter, dry_run):
+    if not dry_run:
+        with transaction.atomic():
+            Product.objects.bulk_update(batch, [counter])
+    return len(batch)
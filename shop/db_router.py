@@ -0,0 +1,146 @@
+import hashlib
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Joriy so'rov o'qishlari uchun tanlangan replica (None - primary)
+_read_db = ContextVar("read_db", default=None)
+
+
+def reads_from_replica(view):
+    """
+    Mark a view (class or function) whose safe-method requests may be served
+    by a read replica.
+    """
+    view.replica_reads = True
+    return view
+
+
+def _is_replica_view(view_func):
+    return getattr(view_func, "replica_reads", False) or getattr(
+        getattr(view_func, "view_class", None), "replica_reads", False
+    )
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica chosen by ``ReplicaRoutingMiddleware`` for the
+    current request and everything else to ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_db.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replica'lar primary'ning nusxasi, shuning uchun bog'lanishlar ruxsat
+        aliases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route the reads of safe-method requests to ``@reads_from_replica`` views
+    to a random replica from ``REPLICA_DATABASES``.
+
+    Any unsafe request pins the client to the primary for
+    ``READ_YOUR_WRITES_SECONDS`` (read-your-writes), through a cookie for
+    browsers and a cache entry keyed on the ``Authorization`` header for
+    token clients.
+
+    Sync and async capable: under ASGI the async views are served without a
+    thread hop, and the pin is read and written with the async cache API.
+    """
+    cookie_name = "db_primary_until"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Handler process_view'ni async rejimda to'g'ridan-to'g'ri chaqiradi (sync_to_async'siz)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _read_db.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_db.reset(token)
+        if request.method not in SAFE_METHODS:
+            self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = _read_db.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_db.reset(token)
+        if request.method not in SAFE_METHODS:
+            key = self.pin(request, response, sync=False)
+            if key:
+                await cache.aset(key, 1, settings.READ_YOUR_WRITES_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in SAFE_METHODS and _is_replica_view(view_func) and not self.is_pinned(request):
+            _read_db.set(random.choice(settings.REPLICA_DATABASES))
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS or not _is_replica_view(view_func) or self.has_pin_cookie(request):
+            return
+        key = self.pin_key(request)
+        if not (key and await cache.aget(key)):
+            _read_db.set(random.choice(settings.REPLICA_DATABASES))
+
+    def pin_key(self, request):
+        authorization = request.headers.get("Authorization")
+        if authorization:
+            return "db-pin:" + hashlib.sha256(authorization.encode()).hexdigest()
+        return None
+
+    def has_pin_cookie(self, request):
+        try:
+            return float(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def is_pinned(self, request):
+        if self.has_pin_cookie(request):
+            return True
+        key = self.pin_key(request)
+        return bool(key and cache.get(key))
+
+    def pin(self, request, response, sync=True):
+        """
+        Set the pin cookie on ``response``; the token pin is written to the
+        cache here (``sync``) or returned for ``__acall__`` to write.
+        """
+        window = settings.READ_YOUR_WRITES_SECONDS
+        if window <= 0:
+            return None
+        response.set_cookie(
+            self.cookie_name, f"{time.time() + window:.3f}", max_age=window, httponly=True, samesite="Lax"
+        )
+        key = self.pin_key(request)
+        if key and sync:
+            cache.set(key, 1, window)
+        return key
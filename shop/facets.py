@@ -0,0 +1,140 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from rest_framework.exceptions import ValidationError
+
+from .categories import subtree_filter
+from .models import Product, ProductFacet
+
+ProductFeature = Product.features.through
+
+
+def _ids(params, name):
+    try:
+        return [int(value) for value in params.getlist(name) if value]
+    except ValueError:
+        raise ValidationError({name: "Must be an integer id."})
+
+
+def _price(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: "Must be a number."})
+
+
+def filter_products(queryset, params):
+    """
+    Apply the product list filters from the query string:
+
+    ``category`` and ``brand`` (ids, repeatable, OR-ed; a category matches
+    its whole subtree), ``feature``
+    (``name:value``, repeatable, AND-ed), ``min_price``/``max_price`` and
+    ``min_effective_price``/``max_effective_price`` (the latter need a
+    ``with_effective_price()`` queryset).
+
+    The category filter reads the selected categories' paths, so async
+    callers run this through ``sync_to_async``.
+    """
+    categories = _ids(params, "category")
+    if categories:
+        queryset = queryset.filter(subtree_filter(categories))
+
+    brands = _ids(params, "brand")
+    if brands:
+        queryset = queryset.filter(brand_id__in=brands)
+
+    for feature in params.getlist("feature"):
+        name, sep, value = feature.partition(":")
+        if not sep:
+            raise ValidationError({"feature": "Use the name:value format."})
+        queryset = queryset.filter(Exists(
+            ProductFeature.objects.filter(product=OuterRef("pk"), feature__name=name, feature__value=value)
+        ))
+
+    min_price = _price(params, "min_price")
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    max_price = _price(params, "max_price")
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+
+    min_effective_price = _price(params, "min_effective_price")
+    if min_effective_price is not None:
+        queryset = queryset.filter(effective_price__gte=min_effective_price)
+    max_effective_price = _price(params, "max_effective_price")
+    if max_effective_price is not None:
+        queryset = queryset.filter(effective_price__lte=max_effective_price)
+
+    return queryset
+
+
+def filter_deals(queryset, params):
+    """
+    Apply the deal list filters from the query string: ``min_discount`` and
+    ``max_discount`` (percent).
+    """
+    min_discount = _price(params, "min_discount")
+    if min_discount is not None:
+        queryset = queryset.filter(discount__gte=min_discount)
+    max_discount = _price(params, "max_discount")
+    if max_discount is not None:
+        queryset = queryset.filter(discount__lte=max_discount)
+    return queryset
+
+
+def _facet_rows(queryset):
+    return (
+        ProductFacet.objects.filter(product__in=queryset.order_by().values("pk"))
+        .values_list("facet", "value")
+        .annotate(count=Count("product"))
+        .order_by("facet", "-count", "value")
+    )
+
+
+def _group_facets(rows):
+    facets = {facet: [] for facet, _ in ProductFacet.FACET_CHOICES}
+    for facet, value, count in rows:
+        facets[facet].append({"id": value, "count": count})
+    return facets
+
+
+def facet_counts(queryset):
+    """
+    Number of products per category, brand and feature within ``queryset``,
+    computed with a single GROUP BY over ``ProductFacet``.
+    """
+    return _group_facets(_facet_rows(queryset))
+
+
+async def afacet_counts(queryset):
+    """Async version of ``facet_counts()``."""
+    return _group_facets([row async for row in _facet_rows(queryset)])
+
+
+def refresh_product_facets(product_ids):
+    """
+    Rebuild the ``ProductFacet`` rows of the given products.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    rows = []
+    for pk, category_id, brand_id in Product.objects.filter(pk__in=product_ids).values_list(
+        "pk", "category_id", "brand_id"
+    ):
+        rows.append(ProductFacet(product_id=pk, facet=ProductFacet.CATEGORY, value=category_id))
+        if brand_id:
+            rows.append(ProductFacet(product_id=pk, facet=ProductFacet.BRAND, value=brand_id))
+    for product_id, feature_id in ProductFeature.objects.filter(product_id__in=product_ids).values_list(
+        "product_id", "feature_id"
+    ):
+        rows.append(ProductFacet(product_id=product_id, facet=ProductFacet.FEATURE, value=feature_id))
+
+    with transaction.atomic():
+        ProductFacet.objects.filter(product_id__in=product_ids).delete()
+        ProductFacet.objects.bulk_create(rows, ignore_conflicts=True)
@@ -0,0 +1,104 @@
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils.timezone import now
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .cache import bump_version
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "webp": "WEBP",
+    "jpeg": "JPEG",
+}
+
+
+def render_variant(data, width, fmt, quality):
+    """
+    Resize the original image bytes to ``width`` (never upscaling) and encode
+    them as ``fmt``. Module-level so it can run in a worker process.
+    """
+    with Image.open(BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        if FORMATS[fmt] == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        output = BytesIO()
+        image.save(output, FORMATS[fmt], quality=quality, optimize=True)
+        return output.getvalue()
+
+
+def generate_variants(product_image, executor=None, bump=True):
+    """
+    Render every configured size/format of ``product_image`` and store the
+    resulting paths in ``ProductImage.variants`` as ``{size: {format: path}}``.
+
+    Variants are rendered in ``executor`` when one is given. Batch callers
+    pass ``bump=False`` and call ``bump_version(Product)`` once at the end.
+    Returns the new variants map, or ``None`` when the original cannot be read.
+    """
+    try:
+        with product_image.image.open("rb") as original:
+            data = original.read()
+    except (OSError, ValueError):
+        logger.warning("Product image %s: original file is missing", product_image.pk)
+        return None
+
+    jobs = [
+        (name, width, fmt)
+        for name, width in settings.PRODUCT_IMAGE_VARIANTS.items()
+        for fmt in settings.PRODUCT_IMAGE_FORMATS
+    ]
+    map_ = executor.map if executor else map
+    try:
+        rendered = list(map_(
+            render_variant,
+            [data] * len(jobs),
+            [width for _, width, _ in jobs],
+            [fmt for _, _, fmt in jobs],
+            [settings.PRODUCT_IMAGE_QUALITY] * len(jobs),
+        ))
+    except (UnidentifiedImageError, OSError):
+        logger.warning("Product image %s: original is not a readable image", product_image.pk)
+        return None
+
+    storage = product_image.image.storage
+    directory = posixpath.join(posixpath.dirname(product_image.image.name), "variants", str(product_image.pk))
+    variants = {}
+    for (name, _, fmt), content in zip(jobs, rendered):
+        path = posixpath.join(directory, f"{name}.{fmt}")
+        if storage.exists(path):
+            storage.delete(path)
+        variants.setdefault(name, {})[fmt] = storage.save(path, ContentFile(content))
+
+    # save() emas, update(): post_save signal qayta ishga tushmasin
+    type(product_image).objects.filter(pk=product_image.pk).update(variants=variants)
+    product_image.variants = variants
+    # update() signal'siz: srcset'lar ro'yxat (versiya) va detail (updated_at) ETag'larida yangilanadi
+    Product.objects.filter(pk=product_image.product_id).update(updated_at=now())
+    if bump:
+        bump_version(Product)
+    return variants
+
+
+def build_srcset(product_image, request=None):
+    """
+    ``{format: "url 160w, url 320w, ..."}`` map for a ``<picture>`` element.
+    """
+    if not product_image or not product_image.variants:
+        return None
+    storage = product_image.image.storage
+    srcset = {}
+    for name, width in settings.PRODUCT_IMAGE_VARIANTS.items():
+        for fmt, path in product_image.variants.get(name, {}).items():
+            url = storage.url(path)
+            if request:
+                url = request.build_absolute_uri(url)
+            srcset.setdefault(fmt, []).append(f"{url} {width}w")
+    return {fmt: ", ".join(entries) for fmt, entries in srcset.items()}
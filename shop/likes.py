@@ -0,0 +1,224 @@
+"""
+Write-coalescing buffer for likes (``LIKE_BUFFER=1``).
+
+``add_like``/``delete_like`` only append the intent to ``PendingLike`` (an
+insert, no lock on the hot product row) and answer with an optimistic
+counter; ``flush()`` (the ``flush_like_buffer`` task or command) later
+applies the last intent of every user to ``Like`` and
+``Product.likes_count`` in batched transactions and deletes the applied
+rows.
+
+The log is the source of truth, so nothing is lost when a process dies or
+a cache key disappears: a user's current state is their latest pending
+intent (or the stored ``Like``), and the optimistic counter is
+``likes_count`` plus the sum of the pending deltas. Only intents that
+change the state are logged, so per user the deltas alternate and their
+sum is the net change.
+
+The sum is kept running in the cache (``incr`` on record, decremented by
+``flush()``) so a burst on a hot product does not re-read its whole log on
+every request. It is seeded from the log on a miss and expires after
+``LIKE_BUFFER_PENDING_TIMEOUT``, which bounds any drift from races between
+seeding and concurrent writers.
+
+The ``LIKE_BUFFER_CACHE`` cache holds the running sums and a short
+per-user mutex that makes ``record()``'s check-then-append atomic (a
+double click is counted once). It must be a dedicated Redis alias shared by every process, on an
+instance with ``maxmemory-policy noeviction``. With ``LIKE_BUFFER_LOCAL``
+a per-process cache (locmem) is accepted as the stand-in for setups with a
+single web process (``runserver``, tests).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, Subquery, Sum, Value, When
+
+from .cache import bump_version
+from .models import Like, PendingLike, Product
+
+MUTEX_KEY = "like-buffer:mutex:{}:{}"
+PENDING_KEY = "like-buffer:pending:{}"
+
+# Jarayonlar orasida umumiy va kalitlarni o'zi o'chirmaydigan backend'lar
+SHARED_BACKENDS = (
+    "django.core.cache.backends.redis.RedisCache",
+    "django_redis.cache.RedisCache",
+)
+
+
+def get_cache():
+    """
+    The ``LIKE_BUFFER_CACHE`` cache; raises ``ImproperlyConfigured`` unless
+    it is a dedicated alias on a shared backend (any backend with
+    ``LIKE_BUFFER_LOCAL``).
+    """
+    alias = settings.LIKE_BUFFER_CACHE
+    config = settings.CACHES.get(alias)
+    if config is None:
+        raise ImproperlyConfigured(
+            f"LIKE_BUFFER_CACHE={alias!r} is not in CACHES; set LIKE_BUFFER_REDIS_URL or REDIS_URL."
+        )
+    if alias == "default":
+        raise ImproperlyConfigured(
+            "LIKE_BUFFER_CACHE must not be the default cache: catalog responses would evict the buffer's keys."
+        )
+    if config["BACKEND"] not in SHARED_BACKENDS and not settings.LIKE_BUFFER_LOCAL:
+        raise ImproperlyConfigured(
+            f"LIKE_BUFFER_CACHE={alias!r} uses {config['BACKEND']}, which is not shared between processes; "
+            "use Redis, or set LIKE_BUFFER_LOCAL=1 for a single-process setup."
+        )
+    return caches[alias]
+
+
+def _read(product_id, user_id):
+    """
+    ``(likes_count, latest, stored)`` of ``product_id`` in one query:
+    ``user_id``'s latest pending delta and whether their ``Like`` is stored.
+    ``None`` if the product does not exist.
+    """
+    latest = PendingLike.objects.filter(product=OuterRef("pk"), user_id=user_id).order_by("-pk").values("delta")[:1]
+    return Product.objects.filter(pk=product_id).annotate(
+        latest=Subquery(latest),
+        stored=Exists(Like.objects.filter(product=OuterRef("pk"), user_id=user_id)),
+    ).values_list("likes_count", "latest", "stored").first()
+
+
+def _pending(cache, product_id):
+    """
+    Sum of the pending deltas of ``product_id`` from the cache; summed from
+    the log (and cached) only when the key is missing.
+    """
+    key = PENDING_KEY.format(product_id)
+    pending = cache.get(key)
+    if pending is None:
+        pending = PendingLike.objects.filter(product_id=product_id).aggregate(total=Sum("delta"))["total"] or 0
+        cache.add(key, pending, settings.LIKE_BUFFER_PENDING_TIMEOUT)
+    return pending
+
+
+def _add_pending(cache, deltas):
+    """Add ``{product_id: delta}`` to the cached pending sums that exist."""
+    for product_id, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(PENDING_KEY.format(product_id), delta)
+        except ValueError:
+            # Kalit yo'q (muddati o'tgan): keyingi o'qish log'dan qayta hisoblaydi
+            pass
+
+
+def optimistic_count(product_id, cache=None):
+    """``likes_count`` of ``product_id`` with the pending intents applied."""
+    likes_count = Product.objects.filter(pk=product_id).values_list("likes_count", flat=True).first()
+    if likes_count is None:
+        return None
+    return max(likes_count + _pending(cache or get_cache(), product_id), 0)
+
+
+def record(product_id, user_id, liked):
+    """
+    Buffer a like (``liked=True``) or unlike of ``product_id`` by ``user_id``.
+
+    Returns ``(changed, likes_count)``: ``changed`` is ``False`` when the
+    user already is in that state (or the same request of theirs is running
+    right now), ``likes_count`` the optimistic counter. ``likes_count`` is
+    ``None`` if the product does not exist.
+    """
+    cache = get_cache()
+    mutex = MUTEX_KEY.format(product_id, user_id)
+    if not cache.add(mutex, 1, settings.LIKE_BUFFER_LOCK_TIMEOUT):
+        # Ikki marta bosish: parallel so'rov hali ishlayapti
+        return False, optimistic_count(product_id, cache)
+    try:
+        row = _read(product_id, user_id)
+        if row is None:
+            return False, None
+        likes_count, latest, stored = row
+        # Log yozilishidan oldin: seed qilingan yig'indi bu yozuvni ikki marta sanamaydi
+        pending = _pending(cache, product_id)
+        current = latest > 0 if latest is not None else stored
+        if current == liked:
+            return False, max(likes_count + pending, 0)
+        delta = 1 if liked else -1
+        PendingLike.objects.create(product_id=product_id, user_id=user_id, delta=delta)
+        _add_pending(cache, {product_id: delta})
+        return True, max(likes_count + pending + delta, 0)
+    finally:
+        cache.delete(mutex)
+
+
+def _apply(entries):
+    """
+    Apply the last intent of every ``(product, user)`` pair of ``entries``
+    (``(product, user, delta)`` in log order). Runs inside ``flush()``'s
+    transaction.
+    """
+    intents = {}
+    for product_id, user_id, delta in entries:
+        intents[product_id, user_id] = delta > 0
+
+    pairs = Q()
+    for product_id, user_id in intents:
+        pairs |= Q(product_id=product_id, user_id=user_id)
+    existing = set(Like.objects.filter(pairs).values_list("product_id", "user_id"))
+    to_create = [
+        Like(product_id=product_id, user_id=user_id)
+        for (product_id, user_id), liked in intents.items()
+        if liked and (product_id, user_id) not in existing
+    ]
+    to_delete = [pair for pair, liked in intents.items() if not liked and pair in existing]
+
+    # unique_together: parallel yozilgan like'lar bilan to'qnashuv e'tiborsiz qoldiriladi
+    Like.objects.bulk_create(to_create, ignore_conflicts=True)
+    if to_delete:
+        removed = Q()
+        for product_id, user_id in to_delete:
+            removed |= Q(product_id=product_id, user_id=user_id)
+        Like.objects.filter(removed).delete()
+
+    changes = {}
+    for like in to_create:
+        changes[like.product_id] = changes.get(like.product_id, 0) + 1
+    for product_id, _ in to_delete:
+        changes[product_id] = changes.get(product_id, 0) - 1
+    changes = {product_id: change for product_id, change in changes.items() if change}
+    if changes:
+        Product.objects.filter(pk__in=changes).update(
+            likes_count=F("likes_count") + Case(
+                *(When(pk=product_id, then=Value(change)) for product_id, change in changes.items()),
+                default=Value(0),
+            ),
+        )
+        # Counter updated_at'ga tegmaydi; mahsulot ETag'lari Like versiyasidan yangilanadi
+        bump_version(Like)
+
+
+def flush(batch_size=None):
+    """
+    Apply the buffered intents, ``batch_size`` log rows per transaction.
+    Returns the number of processed rows. The rows of a batch are locked,
+    so parallel flushes never apply the same intent twice.
+    """
+    batch_size = batch_size or settings.LIKE_BUFFER_BATCH_SIZE
+    cache = get_cache()
+    applied = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                PendingLike.objects.select_for_update().order_by("pk")
+                .values_list("pk", "product_id", "user_id", "delta")[:batch_size]
+            )
+            if not rows:
+                return applied
+            _apply([row[1:] for row in rows])
+            PendingLike.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        # Commit'dan keyin: qo'llangan deltalar kutilayotgan yig'indidan chiqadi
+        removed = {}
+        for _, product_id, _, delta in rows:
+            removed[product_id] = removed.get(product_id, 0) - delta
+        _add_pending(cache, removed)
+        applied += len(rows)
+        if len(rows) < batch_size:
+            return applied
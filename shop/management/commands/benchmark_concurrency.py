@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.benchmark import CONCURRENCY_SCENARIOS, default_output, get_runner, run_concurrency
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync DRF endpoints behind the WSGI handler with their async versions behind the "
+        "ASGI handler at several concurrency levels. Run seed_benchmark first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenario", action="append", choices=list(CONCURRENCY_SCENARIOS))
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+        parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and level.")
+        parser.add_argument(
+            "--db-latency", type=float, default=0,
+            help="Milliseconds added to every query, to emulate a remote database.",
+        )
+        parser.add_argument("--output", help="Result file (default benchmarks/concurrency-<timestamp>.json).")
+
+    def handle(self, *args, **options):
+        try:
+            report = run_concurrency(
+                get_runner(), scenarios=options["scenario"], levels=options["concurrency"],
+                requests=options["requests"], latency_ms=options["db_latency"],
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(f"{'scenario':<18}{'conc':>6}{'server':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}")
+        for name, levels in report["results"].items():
+            for level, servers in levels.items():
+                for server, result in servers.items():
+                    self.stdout.write(
+                        f"{name:<18}{level:>6}{server:>8}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                        f"{result['p99_ms']:>9.2f}{result['throughput_rps']:>9.1f}"
+                    )
+
+        output = Path(options["output"] or default_output(report, "concurrency-"))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results saved to {output}"))
@@ -0,0 +1,40 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from shop.benchmark import default_output, run_connection_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request connection overhead with a new connection per request, persistent "
+        "connections (CONN_MAX_AGE + health checks) and the psycopg 3 connection pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--output", help="Result file (default benchmarks/connections-<timestamp>.json).")
+
+    def handle(self, *args, **options):
+        if options["database"] not in settings.DATABASES:
+            raise CommandError(f"Unknown database {options['database']!r}")
+        report = run_connection_benchmark(options["database"], options["requests"])
+
+        self.stdout.write(f"{'mode':<12}{'p50':>9}{'p95':>9}{'mean':>9}{'req/s':>10}{'connects':>10}")
+        for mode, result in report["results"].items():
+            if "skipped" in result:
+                self.stdout.write(f"{mode:<12}skipped: {result['skipped']}")
+                continue
+            self.stdout.write(
+                f"{mode:<12}{result['p50_ms']:>9.3f}{result['p95_ms']:>9.3f}{result['mean_ms']:>9.3f}"
+                f"{result['throughput_rps']:>10.1f}{result['connections_opened']:>10}"
+            )
+
+        output = Path(options["output"] or default_output(report, "connections-"))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results saved to {output}"))
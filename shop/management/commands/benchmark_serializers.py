@@ -0,0 +1,38 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.benchmark import default_output, get_runner, run_serializer_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ProductListSerializer + JSONRenderer with the values() rows + orjson path used by the "
+        "product list endpoints. Run seed_benchmark first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--output", help="Result file (default benchmarks/serializers-<timestamp>.json).")
+
+    def handle(self, *args, **options):
+        try:
+            report = run_serializer_benchmark(get_runner(), options["page_size"], options["iterations"])
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(f"{'path':<8}{'stage':<8}{'p50':>9}{'mean':>9}{'objects/s':>12}{'bytes':>9}")
+        for name, result in report["results"].items():
+            for stage in ("render", "total"):
+                timing = result[stage]
+                self.stdout.write(
+                    f"{name:<8}{stage:<8}{timing['p50_ms']:>9.3f}{timing['mean_ms']:>9.3f}"
+                    f"{timing['objects_per_sec']:>12.1f}{result['bytes']:>9}"
+                )
+
+        output = Path(options["output"] or default_output(report, "serializers-"))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results saved to {output}"))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.models import Deal
+
+
+class Command(BaseCommand):
+    help = (
+        "Deactivate deals whose end_time has passed and refresh the ETags when a scheduled deal starts. "
+        "Run it from cron/a scheduler, or with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--loop", type=int, default=0, metavar="SECONDS",
+            help="Keep running and sweep every SECONDS seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            expired = Deal.objects.expire(batch_size=options["batch_size"])
+            Deal.objects.announce_started()
+            self.stdout.write(self.style.SUCCESS(f"{expired} deal(s) deactivated"))
+            if not options["loop"]:
+                return
+            time.sleep(options["loop"])
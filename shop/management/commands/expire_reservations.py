@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.orders import expire_reservations
+
+
+class Command(BaseCommand):
+    help = "Release the stock of unpaid orders whose reservation ran out. Run it from a scheduler, or with --loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--loop", type=int, default=0, metavar="SECONDS",
+            help="Keep running and sweep every SECONDS seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_reservations(batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{expired} order(s) expired"))
+            if not options["loop"]:
+                return
+            time.sleep(options["loop"])
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.likes import flush
+
+
+class Command(BaseCommand):
+    help = "Apply the likes/unlikes buffered with LIKE_BUFFER=1 to the database. Run it from a scheduler, or with --loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Log entries per transaction (default LIKE_BUFFER_BATCH_SIZE).")
+        parser.add_argument(
+            "--loop", type=float, default=0, metavar="SECONDS",
+            help="Keep running and flush every SECONDS seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            applied = flush(batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{applied} buffered like change(s) applied"))
+            if not options["loop"]:
+                return
+            time.sleep(options["loop"])
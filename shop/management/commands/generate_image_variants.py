@@ -0,0 +1,36 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from shop.cache import bump_version
+from shop.images import generate_variants
+from shop.models import Product, ProductImage
+
+
+class Command(BaseCommand):
+    help = "Backfill resized WebP/JPEG variants of existing product images."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Worker processes; 0 renders inline.")
+        parser.add_argument("--force", action="store_true", help="Regenerate images that already have variants.")
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.order_by("pk")
+        if not options["force"]:
+            images = images.filter(variants={})
+
+        done = failed = 0
+        executor = ProcessPoolExecutor(max_workers=options["workers"]) if options["workers"] else None
+        try:
+            for image in images.iterator(chunk_size=500):
+                if generate_variants(image, executor=executor, bump=False) is None:
+                    failed += 1
+                else:
+                    done += 1
+        finally:
+            if executor:
+                executor.shutdown()
+            # Har rasm uchun emas, butun backfill uchun bitta invalidatsiya
+            if done:
+                bump_version(Product)
+        self.stdout.write(self.style.SUCCESS(f"{done} image(s) processed, {failed} failed"))
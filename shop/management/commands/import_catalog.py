@@ -0,0 +1,228 @@
+import csv
+import io
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shop.cache import bump_version
+from shop.categories import rebuild_tree
+from shop.facets import refresh_product_facets
+from shop.models import Brand, Category, Feature, Product
+from shop.search import update_search_vector
+
+ProductFeature = Product.features.through
+
+PRODUCT_UPDATE_FIELDS = ["name", "description", "price", "stock", "category", "brand", "updated_at"]
+
+
+def read_rows(stream, fmt):
+    """
+    Lazily yield rows from a CSV (dicts) or JSON Lines (raw lines) stream.
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def parse_features(value):
+    """
+    Accept ``"Color:Red|Size:M"``, ``["Color:Red"]``, ``{"Color": "Red"}``
+    or ``[{"name": "Color", "value": "Red"}]``.
+    """
+    if not value:
+        return []
+    if isinstance(value, dict):
+        return [(str(name), str(val)) for name, val in value.items()]
+    if isinstance(value, str):
+        value = value.split("|")
+    features = []
+    for item in value:
+        if isinstance(item, dict):
+            features.append((item["name"], str(item["value"])))
+        else:
+            name, sep, val = item.partition(":")
+            if not sep:
+                raise ValueError(f"feature {item!r} is not in name:value format")
+            features.append((name.strip(), val.strip()))
+    return features
+
+
+def clean_row(row):
+    if isinstance(row, str):
+        row = json.loads(row)
+    sku = (row.get("sku") or "").strip()
+    slug = (row.get("category_slug") or "").strip()
+    if not sku or not slug:
+        raise ValueError("sku and category_slug are required")
+    try:
+        price = Decimal(str(row.get("price") or "0"))
+        stock = int(row.get("stock") or 0)
+    except (InvalidOperation, ValueError):
+        raise ValueError("price/stock are not numbers")
+    return {
+        "sku": sku,
+        "name": row.get("name") or sku,
+        "description": row.get("description") or "",
+        "price": price,
+        "stock": max(stock, 0),
+        "category_slug": slug,
+        # Faqat yangi kategoriya nomi uchun; mavjud kategoriyalar qayta nomlanmaydi
+        "category_name": (row.get("category_name") or "").strip() or slug,
+        "brand": (row.get("brand") or "").strip(),
+        "features": parse_features(row.get("features")),
+    }
+
+
+class CatalogImporter:
+    """
+    Upserts cleaned rows batch by batch.
+
+    Foreign keys are resolved through in-memory dictionaries that only grow
+    with the number of distinct categories, brands and features, so memory
+    stays bounded however many product rows the feed has. Categories are
+    only created: the ones already in the database keep their name.
+    """
+
+    def __init__(self):
+        # Mavjud kategoriyalar oldindan: feed ularning nomini o'zgartirmaydi
+        self.categories = dict(Category.objects.values_list("slug", "pk"))  # slug -> id
+        self.brands = {}  # (name, category_id) -> id
+        self.features = {}  # (name, value) -> id
+
+    def import_batch(self, rows):
+        # Bir partiyada bir xil SKU bo'lsa, oxirgisi olinadi
+        rows = list({row["sku"]: row for row in rows}.values())
+        with transaction.atomic():
+            self._upsert_categories(rows)
+            self._upsert_brands(rows)
+            self._upsert_features(rows)
+            product_ids = self._upsert_products(rows)
+            self._replace_features(rows, product_ids)
+        refresh_product_facets(product_ids.values())
+        update_search_vector(Product.objects.filter(pk__in=product_ids.values()))
+        return len(rows)
+
+    def _upsert_categories(self, rows):
+        missing = {row["category_slug"]: row["category_name"] for row in rows
+                   if row["category_slug"] not in self.categories}
+        if not missing:
+            return
+        Category.objects.bulk_create(
+            [Category(slug=slug, name=name) for slug, name in missing.items()], ignore_conflicts=True,
+        )
+        self.categories.update(Category.objects.filter(slug__in=missing).values_list("slug", "pk"))
+
+    def _upsert_brands(self, rows):
+        missing = {(row["brand"], self.categories[row["category_slug"]]) for row in rows if row["brand"]}
+        missing -= self.brands.keys()
+        if not missing:
+            return
+        Brand.objects.bulk_create(
+            [Brand(name=name, category_id=category_id) for name, category_id in missing],
+            ignore_conflicts=True,
+        )
+        names = {name for name, _ in missing}
+        for pk, name, category_id in Brand.objects.filter(name__in=names).values_list("pk", "name", "category_id"):
+            self.brands[(name, category_id)] = pk
+
+    def _upsert_features(self, rows):
+        missing = {feature for row in rows for feature in row["features"]} - self.features.keys()
+        if not missing:
+            return
+        Feature.objects.bulk_create(
+            [Feature(name=name, value=value) for name, value in missing], ignore_conflicts=True,
+        )
+        names = {name for name, _ in missing}
+        for pk, name, value in Feature.objects.filter(name__in=names).values_list("pk", "name", "value"):
+            self.features[(name, value)] = pk
+
+    def _upsert_products(self, rows):
+        products = []
+        for row in rows:
+            category_id = self.categories[row["category_slug"]]
+            products.append(Product(
+                sku=row["sku"], name=row["name"], description=row["description"],
+                price=row["price"], stock=row["stock"], category_id=category_id,
+                brand_id=self.brands.get((row["brand"], category_id)),
+            ))
+        Product.objects.bulk_create(
+            products, update_conflicts=True, unique_fields=["sku"], update_fields=PRODUCT_UPDATE_FIELDS,
+        )
+        return dict(Product.objects.filter(sku__in=[row["sku"] for row in rows]).values_list("sku", "pk"))
+
+    def _replace_features(self, rows, product_ids):
+        ProductFeature.objects.filter(product_id__in=product_ids.values()).delete()
+        ProductFeature.objects.bulk_create(
+            [
+                ProductFeature(product_id=product_ids[row["sku"]], feature_id=self.features[feature])
+                for row in rows
+                for feature in set(row["features"])
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a CSV or JSON Lines supplier feed and upsert categories, brands, features and products "
+        "(keyed by sku) in batches. Columns: sku, name, description, price, stock, category_slug, "
+        "category_name, brand, features."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Feed file, or - for stdin.")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        if path == "-":
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+        else:
+            try:
+                stream = open(path, encoding="utf-8", newline="")
+            except OSError as exc:
+                raise CommandError(exc)
+
+        importer = CatalogImporter()
+        imported = 0
+        started = time.monotonic()
+        with stream:
+            rows = self._clean(read_rows(stream, fmt))
+            while True:
+                batch = list(islice(rows, options["batch_size"]))
+                if not batch:
+                    break
+                imported += importer.import_batch(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"{imported} rows imported, {imported / elapsed if elapsed else 0:.0f} rows/sec")
+
+        # bulk_create signal yubormaydi, shuning uchun kategoriya daraxti va cache versiyalarini o'zimiz yangilaymiz
+        rebuild_tree(batch_size=options["batch_size"])
+        for model in (Category, Brand, Feature, Product):
+            bump_version(model)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {imported} rows imported, {self.skipped} skipped in {elapsed:.1f}s "
+            f"({imported / elapsed if elapsed else 0:.0f} rows/sec)"
+        ))
+
+    def _clean(self, rows):
+        self.skipped = 0
+        for number, row in enumerate(rows, start=1):
+            try:
+                yield clean_row(row)
+            except (ValueError, KeyError, TypeError, AttributeError) as exc:
+                self.skipped += 1
+                self.stderr.write(f"Row {number} skipped: {exc}")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from shop.categories import rebuild_tree
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the materialized path, depth and subtree product count of every category. "
+        "Run it after bulk writes that bypass the model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        changed = rebuild_tree(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{changed} category(ies) updated"))
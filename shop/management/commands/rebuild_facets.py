@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from shop.facets import refresh_product_facets
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ProductFacet summary table used for facet counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        rebuilt = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                Product.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            refresh_product_facets(pks)
+            rebuilt += len(pks)
+            last_pk = pks[-1]
+        self.stdout.write(self.style.SUCCESS(f"Facets rebuilt for {rebuilt} product(s)"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from shop.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized product counters (likes, comments) that drifted from the real row counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Only report drifted products.")
+
+    def handle(self, *args, **options):
+        repaired = reconcile_counters(batch_size=options["batch_size"], dry_run=options["dry_run"])
+        verb = "would be repaired" if options["dry_run"] else "repaired"
+        for counter, fixed in repaired.items():
+            self.stdout.write(self.style.SUCCESS(f"{counter}: {fixed} product(s) {verb}"))
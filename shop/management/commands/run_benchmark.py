@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.benchmark import SCENARIOS, compare, default_output, get_runner, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API endpoints in-process and save p50/p95/p99 latency, throughput and "
+        "queries per request as JSON. Run seed_benchmark first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Repeatable; default all.")
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Result file (default benchmarks/<timestamp>.json).")
+        parser.add_argument("--compare", metavar="BASELINE", help="Earlier result file to compare p95 against.")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            try:
+                baseline = json.loads(Path(options["compare"]).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read baseline: {exc}")
+
+        try:
+            report = run_benchmarks(
+                get_runner(), scenarios=options["scenario"], iterations=options["iterations"],
+                warmup=options["warmup"], seed=options["seed"],
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(f"{'scenario':<24}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}{'queries':>9}{'errors':>8}")
+        for name, result in report["results"].items():
+            self.stdout.write(
+                f"{name:<24}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                f"{result['throughput_rps']:>9.1f}{result['queries_per_request']:>9.1f}{result['errors']:>8}"
+            )
+
+        if baseline:
+            self.stdout.write("\np95 vs baseline:")
+            for name, (old, new, change) in compare(report, baseline).items():
+                style = self.style.ERROR if change > 10 else self.style.SUCCESS
+                self.stdout.write(style(f"{name:<24}{old:>9.2f} -> {new:>9.2f} ms ({change:+.1f}%)"))
+
+        output = Path(options["output"] or default_output(report))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results saved to {output}"))
@@ -0,0 +1,219 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from shop.benchmark import BENCH_EMAIL_DOMAIN, BENCH_RUNNER
+from shop.cache import bump_version
+from shop.categories import rebuild_tree
+from shop.counters import reconcile_counters
+from shop.facets import refresh_product_facets
+from shop.models import Brand, Category, Comment, Deal, Feature, Like, Product, ProductImage, User
+from shop.search import update_search_vector
+
+ProductFeature = Product.features.through
+
+NOUNS = ["phone", "laptop", "tablet", "watch", "camera", "speaker", "monitor", "headphones", "router", "keyboard"]
+ADJECTIVES = ["smart", "pro", "mini", "ultra", "wireless", "compact", "gaming", "classic"]
+FEATURE_VALUES = {
+    "Color": ["Black", "White", "Red", "Blue", "Green", "Silver"],
+    "Size": ["XS", "S", "M", "L", "XL"],
+    "Memory": ["64GB", "128GB", "256GB", "512GB", "1TB"],
+    "Material": ["Plastic", "Aluminium", "Steel", "Glass"],
+}
+SKU_PREFIX = "bench-"
+
+
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Seeder:
+    """
+    Bulk-inserts a synthetic catalog. Everything it creates is tagged
+    (``bench-`` slugs/SKUs, ``@bench.local`` emails) so ``--reset`` can
+    remove it again without touching real data.
+    """
+
+    def __init__(self, rng, batch_size, log):
+        self.rng = rng
+        self.batch_size = batch_size
+        self.log = log
+
+    def reset(self):
+        Category.objects.filter(slug__startswith=SKU_PREFIX).delete()
+        User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+
+    def users(self, count):
+        password = make_password("benchmark")  # Hash bir marta hisoblanadi
+        offset = User.objects.filter(username__startswith="bench_user").count()
+        users = [
+            User(email=f"user{i}@{BENCH_EMAIL_DOMAIN}", username=f"bench_user{i}", password=password)
+            for i in range(offset, offset + count)
+        ]
+        for batch in batched(users, self.batch_size):
+            User.objects.bulk_create(batch)
+        return list(
+            User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}")
+            .exclude(username=BENCH_RUNNER)
+            .values_list("pk", flat=True)
+        )
+
+    def categories(self, count, brands_per_category):
+        offset = Category.objects.filter(slug__startswith=SKU_PREFIX).count()
+        Category.objects.bulk_create(
+            [Category(name=f"Category {i}", slug=f"{SKU_PREFIX}category-{i}") for i in range(offset, offset + count)]
+        )
+        categories = list(Category.objects.filter(slug__startswith=SKU_PREFIX).values_list("pk", flat=True))
+        Brand.objects.bulk_create(
+            [
+                Brand(name=f"Brand {category_id}-{i}", category_id=category_id)
+                for category_id in categories
+                for i in range(brands_per_category)
+            ],
+            ignore_conflicts=True,
+        )
+        brands = {}
+        for pk, category_id in Brand.objects.filter(category_id__in=categories).values_list("pk", "category_id"):
+            brands.setdefault(category_id, []).append(pk)
+        return categories, brands
+
+    def features(self):
+        Feature.objects.bulk_create(
+            [Feature(name=name, value=value) for name, values in FEATURE_VALUES.items() for value in values],
+            ignore_conflicts=True,
+        )
+        features = {}
+        for pk, name in Feature.objects.filter(name__in=FEATURE_VALUES).values_list("pk", "name"):
+            features.setdefault(name, []).append(pk)
+        return features
+
+    def products(self, count, categories, brands, features, images_per_product):
+        rng = self.rng
+        offset = Product.objects.filter(sku__startswith=SKU_PREFIX).count()
+        created = []
+        for start in range(offset, offset + count, self.batch_size):
+            stop = min(start + self.batch_size, offset + count)
+            products = []
+            for i in range(start, stop):
+                category_id = rng.choice(categories)
+                name = f"{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS)} {i}"
+                products.append(Product(
+                    sku=f"{SKU_PREFIX}{i}", name=name, description=f"Synthetic {name} for benchmarks.",
+                    price=Decimal(rng.randint(500, 200000)) / 100, stock=rng.randint(0, 500),
+                    category_id=category_id, brand_id=rng.choice(brands.get(category_id) or [None]),
+                ))
+            with transaction.atomic():
+                Product.objects.bulk_create(products)
+                ids = list(
+                    Product.objects.filter(sku__in=[p.sku for p in products]).values_list("pk", flat=True)
+                )
+                ProductFeature.objects.bulk_create([
+                    ProductFeature(product_id=product_id, feature_id=rng.choice(values))
+                    for product_id in ids
+                    for values in rng.sample(list(features.values()), k=rng.randint(1, len(features)))
+                ])
+                ProductImage.objects.bulk_create([
+                    ProductImage(product_id=product_id, image=f"product_images/bench-{product_id}-{j}.jpg")
+                    for product_id in ids
+                    for j in range(images_per_product)
+                ])
+            created.extend(ids)
+            self.log(f"{len(created)} products")
+        return created
+
+    def deals(self, count, product_ids):
+        current = now()
+        deals = []
+        for product_id in self.rng.sample(product_ids, k=min(count, len(product_ids))):
+            # Taxminan har beshinchi aksiya tugagan bo'ladi
+            ends = current + timedelta(days=self.rng.randint(-7, 30))
+            deals.append(Deal(
+                product_id=product_id, name=f"Sale {product_id}", discount=self.rng.choice([5, 10, 15, 20, 30, 50]),
+                start_time=current - timedelta(days=7), end_time=ends, is_active=True,
+            ))
+        for batch in batched(deals, self.batch_size):
+            Deal.objects.bulk_create(batch)
+        return len(deals)
+
+    def likes(self, count, product_ids, user_ids):
+        count = min(count, len(product_ids) * len(user_ids))
+        pairs = set()
+        while len(pairs) < count:
+            pairs.add((self.rng.choice(product_ids), self.rng.choice(user_ids)))
+        for batch in batched(list(pairs), self.batch_size):
+            Like.objects.bulk_create(
+                [Like(product_id=product_id, user_id=user_id) for product_id, user_id in batch],
+                ignore_conflicts=True,
+            )
+        return count
+
+    def comments(self, count, product_ids, user_ids):
+        rng = self.rng
+        for start in range(0, count, self.batch_size):
+            Comment.objects.bulk_create([
+                Comment(product_id=rng.choice(product_ids), user_id=rng.choice(user_ids), text=f"Comment {i}")
+                for i in range(start, min(start + self.batch_size, count))
+            ])
+        return count
+
+    def finish(self, product_ids):
+        # bulk_create signal yubormaydi: counter, facet, qidiruv va cache'ni qo'lda yangilaymiz
+        reconcile_counters(batch_size=self.batch_size)
+        rebuild_tree(batch_size=self.batch_size)
+        for batch in batched(product_ids, self.batch_size):
+            refresh_product_facets(batch)
+            update_search_vector(Product.objects.filter(pk__in=batch))
+        for model in (Category, Brand, Feature, Product):
+            bump_version(model)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic catalog (users, categories, brands, features, products, images, deals, "
+        "likes, comments) with bulk inserts for benchmarking. Seeded data is tagged and removable with --reset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--brands-per-category", type=int, default=5)
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument("--images-per-product", type=int, default=3)
+        parser.add_argument("--deals", type=int, default=1000)
+        parser.add_argument("--likes", type=int, default=50000)
+        parser.add_argument("--comments", type=int, default=50000)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=42, help="Random seed, for reproducible data sets.")
+        parser.add_argument("--reset", action="store_true", help="Delete previously seeded data first.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        seeder = Seeder(random.Random(options["seed"]), options["batch_size"], self.stdout.write)
+        if options["reset"]:
+            seeder.reset()
+
+        user_ids = seeder.users(options["users"])
+        categories, brands = seeder.categories(options["categories"], options["brands_per_category"])
+        features = seeder.features()
+        product_ids = seeder.products(
+            options["products"], categories, brands, features, options["images_per_product"]
+        )
+        if not product_ids:
+            self.stdout.write(self.style.WARNING("No products seeded"))
+            return
+        deals = seeder.deals(options["deals"], product_ids)
+        likes = seeder.likes(options["likes"], product_ids, user_ids) if user_ids else 0
+        comments = seeder.comments(options["comments"], product_ids, user_ids) if user_ids else 0
+        seeder.finish(product_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(user_ids)} users, {len(categories)} categories, {len(product_ids)} products, "
+            f"{deals} deals, {likes} likes, {comments} comments in {time.monotonic() - started:.1f}s"
+        ))
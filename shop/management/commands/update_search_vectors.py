@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from shop.models import Product
+from shop.search import is_postgres, update_search_vector
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored full-text search vector of every product (PostgreSQL only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if not is_postgres():
+            self.stdout.write(self.style.WARNING("Full-text search needs PostgreSQL, nothing to do."))
+            return
+
+        batch_size = options["batch_size"]
+        updated = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                Product.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            updated += update_search_vector(Product.objects.filter(pk__in=pks))
+            last_pk = pks[-1]
+        self.stdout.write(self.style.SUCCESS(f"{updated} product(s) updated"))
@@ -1,5 +1,18 @@
+from decimal import Decimal
+
+from django.apps import apps
 from django.contrib.auth.base_user import BaseUserManager
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import BooleanField, DecimalField, Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Round
+from django.utils.timezone import now
+
+from .cache import bump_version
+
+# DealQuerySet.announce_started() oxirgi marta tekshirgan vaqt
+DEALS_CHECKED_KEY = "shop:deals:started-checked"
 
 
 class UserManager(BaseUserManager):
@@ -50,4 +63,103 @@ class UserManager(BaseUserManager):
         if not extra_fields.get('is_staff'):
             raise ValueError('Superuser must have is_staff=True.')  # Extra validation
 
-        return self._create_user(email, username, password, **extra_fields)
\ No newline at end of file
+        return self._create_user(email, username, password, **extra_fields)
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_is_liked(self, user):
+        """
+        Annotate ``is_liked`` for ``user`` with a correlated ``EXISTS``, so a
+        whole page is resolved inside the main query.
+        """
+        if not user or not user.is_authenticated:
+            return self.annotate(is_liked=Value(False, output_field=BooleanField()))
+        like_model = apps.get_model("shop", "Like")
+        return self.annotate(is_liked=Exists(like_model.objects.filter(product=OuterRef("pk"), user=user)))
+
+
+    def with_effective_price(self, at=None):
+        """
+        Annotate ``active_discount`` (percent of the best deal running at
+        ``at``, ``None`` without one) and ``effective_price`` (``price``
+        minus that discount, rounded to cents).
+
+        The best deal is a correlated ``ORDER BY discount DESC LIMIT 1``
+        subquery served by the ``(product, is_active, end_time)`` deal index,
+        so both values can be filtered and ordered on in SQL.
+        """
+        deal_model = apps.get_model("shop", "Deal")
+        best = deal_model.objects.active(at).filter(product=OuterRef("pk")).order_by("-discount").values("discount")[:1]
+        # Deal.discount float; narx bilan hisoblash uchun numeric'ga o'tkazamiz
+        discount = Cast(F("active_discount"), DecimalField(max_digits=5, decimal_places=2))
+        return self.annotate(active_discount=Subquery(best)).annotate(
+            effective_price=Round(
+                F("price") * (Value(100) - Coalesce(discount, Value(Decimal(0)))) / Value(100),
+                2,
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+        )
+
+
+class ProductManager(models.Manager.from_queryset(ProductQuerySet)):
+    def get_queryset(self):
+        # search_vector faqat SQL ichida kerak, uni har bir SELECT'da tashimaymiz
+        return super().get_queryset().defer("search_vector")
+
+
+class DealQuerySet(models.QuerySet):
+    def active(self, at=None):
+        """
+        Deals that are running at ``at`` (defaults to now).
+
+        The check is done on time, so a scheduled deal is hidden until its
+        ``start_time`` and a deal whose ``end_time`` has passed is hidden even
+        before the expiry sweeper has flipped ``is_active``.
+        """
+        at = at or now()
+        return self.filter(Q(end_time__gt=at) | Q(end_time__isnull=True), is_active=True, start_time__lte=at)
+
+    def expired(self, at=None):
+        """
+        Deals still flagged active although their ``end_time`` has passed.
+        """
+        return self.filter(is_active=True, end_time__lt=at or now())
+
+    def expire(self, at=None, batch_size=1000):
+        """
+        Deactivate expired deals in primary-key batches, so one sweep never
+        holds row locks on the whole table. Returns the number of updated rows.
+        """
+        at = at or now()
+        total = 0
+        while True:
+            pks = list(self.expired(at).values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                return total
+            total += self.filter(pk__in=pks).update(is_active=False)
+            # update() signal yubormaydi: effective_price'li javoblar ETag'ini yangilaymiz
+            bump_version(self.model)
+
+    def announce_started(self, at=None):
+        """
+        Bump the ``Deal`` version when a scheduled deal has started since the
+        previous call (or when that is unknown), so the ETags of responses
+        carrying effective prices change. Nothing is written when a deal
+        starts, so the sweeper calls this next to ``expire()``. Returns
+        whether the version was bumped.
+        """
+        at = at or now()
+        since = cache.get(DEALS_CHECKED_KEY)
+        cache.set(DEALS_CHECKED_KEY, at, None)
+        if since is not None and not self.active(at).filter(start_time__gt=since).exists():
+            return False
+        bump_version(self.model)
+        return True
+
+
+class OrderQuerySet(models.QuerySet):
+    def expired(self, at=None):
+        """
+        Reserved orders whose stock reservation ran out unpaid.
+        """
+        return self.filter(status=self.model.RESERVED, reserved_until__lt=at or now())
@@ -0,0 +1,81 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+class QueryStats:
+    """
+    ``execute_wrapper`` callable counting queries and the time spent in them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class QueryCountMiddleware:
+    """
+    Report the number of SQL queries and the database time of every request
+    in the ``X-DB-Query-Count`` and ``X-DB-Time-Ms`` response headers.
+
+    Enabled by ``QUERY_COUNT_HEADERS`` (follows ``DEBUG`` when unset).
+    Streaming responses get no headers: their body, and the queries run
+    while producing it, comes after the headers are sent.
+
+    Sync and async capable, so the async views run under ASGI without a
+    thread hop per request. Async requests still enter and leave the
+    thread the async ORM runs its queries in, to wrap its connections;
+    that only happens with the headers on.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        enabled = settings.QUERY_COUNT_HEADERS
+        if not (settings.DEBUG if enabled is None else enabled):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def wrap_connections(self, stack, stats):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+
+    def add_headers(self, response, stats):
+        if not response.streaming:
+            response["X-DB-Query-Count"] = str(stats.count)
+            response["X-DB-Time-Ms"] = f"{stats.duration * 1000:.1f}"
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats()
+        with ExitStack() as stack:
+            self.wrap_connections(stack, stats)
+            response = self.get_response(request)
+        return self.add_headers(response, stats)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        # Connection'lar thread'ga bog'liq: async ORM'ning (thread-sensitive) thread'ida o'raymiz
+        with ExitStack() as stack:
+            await sync_to_async(self.wrap_connections)(stack, stats)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        return self.add_headers(response, stats)
@@ -1,9 +1,11 @@
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from datetime import timedelta
-from django.db import models
-from .managers import UserManager
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from .managers import UserManager, ProductManager, DealQuerySet, OrderQuerySet
 from django.utils.timezone import now
 
 
@@ -34,12 +36,52 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 
 class Category(models.Model):
+    """
+    A node of the category tree. ``path`` is materialized as the ids from
+    the root down to the node (``"/1/7/12/"``), so a subtree is one prefix
+    scan; ``product_count`` counts the products of the whole subtree.
+    Both are maintained by ``shop.categories``.
+    """
     name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True)
+    parent = models.ForeignKey("self", on_delete=models.CASCADE, null=True, blank=True, related_name="children")
+    path = models.CharField(max_length=255, default="", editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        verbose_name_plural = "categories"
+        indexes = [
+            # path LIKE '/1/7/%' (subtree) PostgreSQL'da ham index'dan o'qilishi uchun pattern_ops
+            models.Index(fields=["path"], name="category_path_idx", opclasses=["varchar_pattern_ops"]),
+        ]
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        super().clean()
+        if self.pk and self.parent_id and Category.objects.filter(
+            pk=self.parent_id, path__contains=f"/{self.pk}/"
+        ).exists():
+            raise ValidationError({"parent": "A category cannot be moved under itself or its descendants."})
+
+    def save(self, *args, **kwargs):
+        from .categories import place
+
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = Category.objects.filter(pk=self.pk).values(
+                    "parent_id", "path", "depth", "product_count"
+                ).first()
+            if previous:
+                # Instance eskirgan bo'lishi mumkin (ota-ona ko'chgan): daraxt ustunlarini bazadagisi bilan yozamiz
+                self.path, self.depth, self.product_count = previous["path"], previous["depth"], previous["product_count"]
+            super().save(*args, **kwargs)
+            if previous is None or previous["parent_id"] != self.parent_id or not self.path:
+                place(self, previous)
+
 
 
 
@@ -47,6 +89,11 @@ class Feature(models.Model):
     name = models.CharField(max_length=255)
     value = models.CharField(max_length=255)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["name", "value"], name="unique_feature_name_value"),
+        ]
+
     def __str__(self):
         return f"{self.name}: {self.value}"
 
@@ -56,6 +103,11 @@ class Brand(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='brands')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["name", "category"], name="unique_brand_per_category"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -63,6 +115,7 @@ class Brand(models.Model):
 class Product(models.Model):
     id = models.AutoField(primary_key=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)  # Supplier feed kaliti
     name = models.CharField(max_length=255)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -72,15 +125,52 @@ class Product(models.Model):
     brand = models.ForeignKey(Brand, on_delete=models.CASCADE, null=True, blank=True)
     features = models.ManyToManyField(Feature, related_name="products")
     likes_count = models.PositiveIntegerField(default=0)  # Like'lar soni
+    comments_count = models.PositiveIntegerField(default=0)  # Kommentlar soni
     likes = models.ManyToManyField(User, related_name="liked_products", blank=True)
+    # shop.search.update_search_vector to'ldiradi, GIN index post_migrate'da yaratiladi
+    search_vector = SearchVectorField(null=True, editable=False)
 
+    objects = ProductManager()
 
+    class Meta:
+        indexes = [
+            # export_products ?updated_since= uchun
+            models.Index(fields=["updated_at", "id"], name="product_updated_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
-    def likes_count(self):
-        return self.product_likes.count()
+    @property
+    def primary_image(self):
+        # primary_image_prefetch() bilan olingan bo'lsa, qo'shimcha query yo'q
+        if hasattr(self, "primary_images"):
+            return self.primary_images[0] if self.primary_images else None
+        return self.images.order_by("id").first()
+
+
+class ProductFacet(models.Model):
+    """
+    Denormalized (product, facet, value) rows used to count facets in one
+    GROUP BY. Kept in sync by shop.facets.refresh_product_facets.
+    """
+    CATEGORY = 'category'
+    BRAND = 'brand'
+    FEATURE = 'feature'
+    FACET_CHOICES = [
+        (CATEGORY, 'Category'),
+        (BRAND, 'Brand'),
+        (FEATURE, 'Feature'),
+    ]
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="facets")
+    facet = models.CharField(max_length=16, choices=FACET_CHOICES)
+    value = models.PositiveBigIntegerField()  # Category/Brand/Feature id
+
+    class Meta:
+        unique_together = ('product', 'facet', 'value')
+        indexes = [
+            models.Index(fields=["facet", "value"], name="product_facet_value_idx"),
+        ]
 
 
 class ProductAttributeValue(models.Model):
@@ -96,6 +186,19 @@ class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="images")
     image = models.ImageField(upload_to="product_images/")
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # {"thumb": {"webp": path, "jpeg": path}, ...}, shop.images.generate_variants to'ldiradi
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+
+
+def primary_image_prefetch(lookup="images"):
+    """
+    Prefetch only the first image of every product in one query.
+
+    ``lookup`` is the path to the product images relation, e.g.
+    ``"product__images"`` when prefetching from deals. The image is stored
+    in ``primary_images`` and read through ``Product.primary_image``.
+    """
+    return models.Prefetch(lookup, queryset=ProductImage.objects.order_by("id")[:1], to_attr="primary_images")
 
 
 class Deal(models.Model):
@@ -106,9 +209,19 @@ class Deal(models.Model):
     end_time = models.DateTimeField(null=True, blank=True, default=None)  # 🔥 `default=None` qo‘shildi
     is_active = models.BooleanField(default=True)
 
+    objects = DealQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Aktiv deallarni o'qish va expire_deals sweeper uchun
+            models.Index(fields=["is_active", "end_time"], name="deal_active_end_idx"),
+            # Product.objects.with_effective_price() subquery'si uchun
+            models.Index(fields=["product", "is_active", "end_time"], name="deal_product_active_end_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         # Agar end_time o'tib ketgan bo'lsa, is_active ni o'chirish
-        if self.end_time < now():
+        if self.end_time and self.end_time < now():
             self.is_active = False
         super().save(*args, **kwargs)
 #   Comment
@@ -119,6 +232,12 @@ class Comment(models.Model):
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Mahsulot kommentlari feed'i (created_at, id) bo'yicha cursor bilan o'qiladi
+            models.Index(fields=["product", "created_at", "id"], name="comment_feed_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.product.name}"
 
@@ -131,3 +250,71 @@ class Like(models.Model):
     class Meta:
         unique_together = ('product', 'user')
 
+
+class PendingLike(models.Model):
+    """
+    A like (``delta=1``) or unlike (``delta=-1``) buffered with
+    ``LIKE_BUFFER`` on and not yet applied to ``Like``/``likes_count``.
+    ``shop.likes.flush()`` applies and deletes the rows in id order.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    delta = models.SmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Foydalanuvchining oxirgi niyati va mahsulotning kutilayotgan deltasi uchun
+            models.Index(fields=["product", "user"], name="pending_like_product_user_idx"),
+        ]
+
+
+# Order
+
+class Order(models.Model):
+    """
+    A checkout. The stock of its items is reserved (already subtracted from
+    ``Product.stock``) until the order is paid, or put back by
+    ``shop.orders.release()`` when it is cancelled or ``reserved_until``
+    passes.
+    """
+    RESERVED = 'reserved'
+    PAID = 'paid'
+    CANCELLED = 'cancelled'
+    EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (RESERVED, 'Reserved'),
+        (PAID, 'Paid'),
+        (CANCELLED, 'Cancelled'),
+        (EXPIRED, 'Expired'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=RESERVED)
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    reserved_until = models.DateTimeField()
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Muddati o'tgan rezervlarni expire_reservations sweeper'i qidiradi
+            models.Index(fields=["status", "reserved_until"], name="order_status_reserved_idx"),
+            models.Index(fields=["user", "-created_at"], name="order_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.pk} ({self.status})"
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name="order_items")
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)  # Checkout paytidagi narx
+
+    class Meta:
+        unique_together = ('order', 'product')
+
+    def __str__(self):
+        return f"{self.product.name} x {self.quantity}"
@@ -0,0 +1,111 @@
+"""
+Checkout: stock reservation without overselling.
+
+Stock is never read, changed in Python and written back. Every product is
+decremented with a conditional ``UPDATE ... SET stock = stock - n WHERE id
+= ... AND stock >= n``, so concurrent checkouts serialize on the row lock
+and the loser sees the already decremented value. The updates of one order
+run in one transaction in ascending product id order: two orders over the
+same products take their row locks in the same order and cannot deadlock.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils.timezone import now
+
+from .models import Order, OrderItem, Product
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id):
+        super().__init__(f"Not enough stock for product {product_id}")
+        self.product_id = product_id
+
+
+def _restock(quantities):
+    # Rezervatsiya bilan bir xil tartibda - deadlock bo'lmasligi uchun
+    for product_id, quantity in sorted(quantities.items()):
+        Product.objects.filter(pk=product_id).update(stock=F("stock") + quantity, updated_at=now())
+
+
+def place_order(user, items):
+    """
+    Reserve ``items`` (``{product_id: quantity}``) for ``user`` and create a
+    ``RESERVED`` order holding them for ``ORDER_RESERVATION_SECONDS``.
+
+    Raises ``Product.DoesNotExist`` or ``OutOfStock``; nothing is reserved
+    then.
+    """
+    quantities = {product_id: quantity for product_id, quantity in items.items() if quantity > 0}
+    prices = dict(Product.objects.filter(pk__in=quantities).values_list("pk", "price"))
+    missing = set(quantities) - set(prices)
+    if missing:
+        raise Product.DoesNotExist(f"Product {min(missing)} does not exist")
+
+    with transaction.atomic():
+        for product_id, quantity in sorted(quantities.items()):
+            reserved = Product.objects.filter(pk=product_id, stock__gte=quantity).update(
+                stock=F("stock") - quantity, updated_at=now()
+            )
+            if not reserved:
+                # atomic() oldingi mahsulotlarning rezervini ham bekor qiladi
+                raise OutOfStock(product_id)
+        order = Order.objects.create(
+            user=user,
+            total=sum(prices[product_id] * quantity for product_id, quantity in quantities.items()),
+            reserved_until=now() + timedelta(seconds=settings.ORDER_RESERVATION_SECONDS),
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=product_id, quantity=quantity, price=prices[product_id])
+            for product_id, quantity in sorted(quantities.items())
+        ])
+    return order
+
+
+def pay(order):
+    """
+    Mark a reserved order paid; the reserved stock becomes sold. Returns
+    ``False`` when the order is no longer reserved (cancelled, expired or
+    already paid).
+    """
+    return bool(
+        Order.objects.filter(pk=order.pk, status=Order.RESERVED, reserved_until__gt=now()).update(status=Order.PAID)
+    )
+
+
+def release(order_ids, status):
+    """
+    Move the still reserved orders among ``order_ids`` to ``status``
+    (``CANCELLED`` or ``EXPIRED``) and put their stock back. Returns the
+    number of released orders.
+    """
+    with transaction.atomic():
+        # Status o'zgarishi bilan qulf: pay() yoki boshqa sweeper bilan poyga bo'lmaydi
+        claimed = list(
+            Order.objects.select_for_update().filter(pk__in=order_ids, status=Order.RESERVED)
+            .order_by("pk").values_list("pk", flat=True)
+        )
+        if not claimed:
+            return 0
+        Order.objects.filter(pk__in=claimed).update(status=status)
+        _restock(dict(
+            OrderItem.objects.filter(order_id__in=claimed).order_by().values("product_id")
+            .annotate(total=Sum("quantity")).values_list("product_id", "total")
+        ))
+    return len(claimed)
+
+
+def expire_reservations(at=None, batch_size=1000):
+    """
+    Release the orders whose reservation ran out, in primary-key batches.
+    Returns the number of expired orders.
+    """
+    at = at or now()
+    total = 0
+    while True:
+        pks = list(Order.objects.expired(at).order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return total
+        total += release(pks, Order.EXPIRED)
@@ -0,0 +1,195 @@
+import binascii
+import json
+from base64 import b64decode, b64encode
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class ProductCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the product id.
+
+    Every page is fetched with ``WHERE id < <cursor> ORDER BY id DESC LIMIT n``,
+    so deep pages cost the same as the first one and no ``COUNT(*)`` is issued.
+    """
+    ordering = '-id'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        # ?ordering=effective_price: teng qiymatlar id bo'yicha barqaror tartibda
+        if 'id' not in {field.lstrip('-') for field in ordering}:
+            ordering = (*ordering, '-id')
+        return ordering
+
+
+class SearchCursorPagination(ProductCursorPagination):
+    """
+    Cursor pagination over the search ``rank_id`` annotation: the rank with
+    the id as tiebreaker, so products with the same rank are ordered by id
+    and the cursor never falls back to an offset.
+    """
+    ordering = ('-rank_id',)
+
+
+class SizedPageNumberPagination(PageNumberPagination):
+    """
+    Default pagination of the non-cursor lists: ``?page_size=`` is honoured
+    as in the cursor paginations, up to ``max_page_size``.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CommentCursorPagination(CursorPagination):
+    """
+    Newest-first comment feed keyed on ``created_at`` (ties broken by id),
+    served from the ``(product, created_at, id)`` index.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class AsyncKeysetPagination:
+    """
+    Forward-only keyset pagination for the async views in ``shop.async_views``.
+
+    The cursor holds the ordering values of the last row of the page, and the
+    next page is read with ``aiterator()`` as ``WHERE (a, b) < cursor LIMIT n``.
+    Only ``next`` links are produced.
+    """
+    ordering = ('-id',)
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+
+    def __init__(self, request):
+        self.request = request
+        self.next_cursor = None
+
+    def get_page_size(self):
+        try:
+            size = int(self.request.GET[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def decode_cursor(self):
+        encoded = self.request.GET.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(b64decode(encoded.encode(), altchars=b'-_'))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound('Invalid cursor')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        return values
+
+    def encode_cursor(self, row):
+        values = [getattr(row, field.lstrip('-')) for field in self.ordering]
+        # DjangoJSONEncoder datetime'ni millisekundgacha qisqartiradi: keyingi sahifada qatorlar yo'qoladi
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+        return b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode(), altchars=b'-_').decode()
+
+    def keyset_filter(self, values):
+        # (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y)
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    async def paginate_queryset(self, queryset):
+        size = self.get_page_size()
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor()
+        if cursor is not None:
+            queryset = queryset.filter(self.keyset_filter(cursor))
+        rows = [row async for row in queryset[:size + 1].aiterator(chunk_size=size + 1)]
+        if len(rows) > size:
+            rows = rows[:size]
+            self.next_cursor = self.encode_cursor(rows[-1])
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_data(self, data):
+        return {'next': self.get_next_link(), 'previous': None, 'results': data}
+
+
+class AsyncProductPagination(AsyncKeysetPagination):
+    ordering = ('-id',)
+
+
+class AsyncCommentPagination(AsyncKeysetPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 20
+
+
+class AsyncPageNumberPagination:
+    """
+    ``SizedPageNumberPagination`` equivalent for the async views:
+    ``acount()`` plus one ``aiterator()`` over the page slice.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_query_param = 'page'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def __init__(self, request):
+        self.request = request
+
+    def get_page_size(self):
+        try:
+            size = int(self.request.GET[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    async def paginate_queryset(self, queryset):
+        self.page_size = self.get_page_size()
+        try:
+            self.page = int(self.request.GET.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound('Invalid page.')
+        self.count = await queryset.acount()
+        last_page = max((self.count + self.page_size - 1) // self.page_size, 1)
+        if not 1 <= self.page <= last_page:
+            raise NotFound('Invalid page.')
+        offset = (self.page - 1) * self.page_size
+        page = queryset[offset:offset + self.page_size]
+        return [row async for row in page.aiterator(chunk_size=self.page_size)]
+
+    def get_paginated_data(self, data):
+        url = self.request.build_absolute_uri()
+        has_next = self.page * self.page_size < self.count
+        if self.page == 1:
+            previous = None
+        elif self.page == 2:
+            previous = remove_query_param(url, self.page_query_param)
+        else:
+            previous = replace_query_param(url, self.page_query_param, self.page - 1)
+        return {
+            'count': self.count,
+            'next': replace_query_param(url, self.page_query_param, self.page + 1) if has_next else None,
+            'previous': previous,
+            'results': data,
+        }
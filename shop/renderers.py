@@ -0,0 +1,35 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+# datetime va boshqa maxsus turlar DRF encoder'iga beriladi, shunda chiqish baytma-bayt bir xil
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` on top of orjson.
+
+    The output is byte-for-byte the same as DRF's compact, non-ASCII-escaping
+    rendering: types orjson does not handle the same way (datetimes, Decimal,
+    lazy strings, ...) go through DRF's ``JSONEncoder.default``. Only floats
+    beyond 1e16 or below 1e-4 differ (``1e16`` instead of ``1e+16``), which
+    no field of the API produces. Indented output, as asked for by the
+    browsable API, falls back to ``JSONRenderer``.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        if self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            rendered = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # Masalan, str bo'lmagan dict kalitlari
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer kabi: JavaScript'da qator ajratuvchilar escape qilinadi
+        return rendered.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connections
+from django.db.models import BigIntegerField, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast
+
+from .models import Product
+
+# SearchRank float qiymatini butun songa o'tkazamiz, shunda cursor pagination aniq ishlaydi
+RANK_SCALE = 1_000_000
+# DRF cursor'i faqat birinchi ordering maydonini saqlaydi: teng rank'larda offset o'sib boradi.
+# rank_id = rank * 2^32 + id noyob, shuning uchun pozitsiya offset'siz aniq
+RANK_ID_SHIFT = 2 ** 32
+
+SEARCH_VECTOR = (
+    SearchVector("name", weight="A")
+    + SearchVector("brand__name", weight="B")
+    + SearchVector("category__name", weight="B")
+    + SearchVector("description", weight="C")
+)
+
+
+def is_postgres(using="default"):
+    return connections[using].vendor == "postgresql"
+
+
+def update_search_vector(queryset=None):
+    """
+    Recompute ``Product.search_vector`` for ``queryset`` (all products by default)
+    with one ``UPDATE``. Does nothing on databases without full-text search.
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    if not is_postgres(queryset.db):
+        return 0
+    vector = Product.objects.filter(pk=OuterRef("pk")).annotate(vector=SEARCH_VECTOR).values("vector")[:1]
+    return queryset.update(search_vector=Subquery(vector))
+
+
+def with_rank_id(queryset):
+    """
+    Annotate ``rank_id``, the ``rank`` annotation with the product id as a
+    tiebreaker in one unique integer, for ``SearchCursorPagination``.
+    """
+    return queryset.annotate(rank_id=ExpressionWrapper(
+        F("rank") * Value(RANK_ID_SHIFT) + F("id"), output_field=BigIntegerField()
+    ))
+
+
+def search_products(queryset, text):
+    """
+    Filter ``queryset`` by ``text`` and annotate an integer ``rank`` and the
+    ``rank_id`` cursor key (see ``with_rank_id()``).
+
+    On PostgreSQL this uses the stored search vector and ``SearchRank``; when
+    nothing matches, it falls back to trigram similarity on the name so typos
+    still find something. Other databases get a plain ``icontains`` filter.
+    """
+    if not is_postgres(queryset.db):
+        return with_rank_id(queryset.filter(
+            Q(name__icontains=text) | Q(description__icontains=text)
+            | Q(brand__name__icontains=text) | Q(category__name__icontains=text)
+        ).annotate(rank=Value(0)))
+
+    query = SearchQuery(text, search_type="websearch")
+    results = queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F("search_vector"), query) * RANK_SCALE, IntegerField())
+    )
+    if settings.SEARCH_TRIGRAM_FALLBACK and not results.exists():
+        results = queryset.annotate(
+            rank=Cast(TrigramSimilarity("name", text) * RANK_SCALE, IntegerField())
+        ).filter(rank__gte=settings.SEARCH_TRIGRAM_THRESHOLD * RANK_SCALE)
+    return with_rank_id(results)
+
+
+def create_search_indexes(sender, using="default", **kwargs):
+    """
+    ``post_migrate`` handler creating the PostgreSQL-only search indexes.
+
+    They are not declared in ``Product.Meta`` because GIN indexes cannot be
+    created on the SQLite databases used for local runs and tests.
+    """
+    if not is_postgres(using):
+        return
+    table = Product._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS shop_product_search_gin ON {table} USING gin (search_vector)"
+        )
+        if settings.SEARCH_TRIGRAM_FALLBACK:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS shop_product_name_trgm ON {table} USING gin (name gin_trgm_ops)"
+            )
@@ -1,13 +1,17 @@
-from collections import OrderedDict
+from django.conf import settings
+from django.db.models import Min, Prefetch
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
+from drf_spectacular.utils import extend_schema_field
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import get_user_model
 from datetime import timedelta
+from .images import build_srcset
 from .models import (
     Category, Product, Deal, Brand, Feature,
-    ProductImage,  Like, Comment
+    ProductImage,  Like, Comment, Order, OrderItem
 )
+from .orders import OutOfStock, place_order
 
 
 User = get_user_model()
@@ -45,15 +49,29 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class CategoryTreeSerializer(CategorySerializer):
+    """
+    A category with its descendants nested under ``children``; expects the
+    nodes to be linked by ``categories.build_tree()``.
+    """
+    children = serializers.SerializerMethodField()
+
+    @extend_schema_field(serializers.ListField(child=serializers.DictField()))
+    def get_children(self, obj):
+        return CategoryTreeSerializer(obj.tree_children, many=True, context=self.context).data
 
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'image_url', 'product']
+        fields = ['id', 'image', 'image_url', 'srcset', 'product']
+
+    def get_srcset(self, obj):
+        return build_srcset(obj, self.context.get("request"))
 
     def get_image_url(self, obj):
         request = self.context.get("request")
@@ -78,29 +96,221 @@ class LikeSerializer(serializers.ModelSerializer):
 
 
 class ProductSerializer(serializers.ModelSerializer):
+    """
+    Product detail with sparse fieldsets.
+
+    ``?fields=id,name,images`` limits the output to the listed fields and
+    ``?expand=category,brand,comments`` nests the related objects instead of
+    their ids (``comments`` holds the latest ``PRODUCT_EXPAND_COMMENTS``).
+    ``optimize_queryset()`` applies the same selection to the queryset, so
+    relations that are not rendered are never fetched.
+    """
     images = ProductImageSerializer(many=True, read_only=True)
     features = FeatureSerializer(many=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
     created_at = serializers.DateTimeField(format='%Y-%m-%d %H:%M:%S', read_only=True)
     updated_at = serializers.DateTimeField(format='%Y-%m-%d %H:%M:%S', read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)  # Mahsulotga yozilgan sharhlar
+    is_liked = serializers.SerializerMethodField()
+    active_discount = serializers.FloatField(read_only=True)
+    effective_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    EXPANDABLE = ("brand", "category", "comments")
+
     class Meta:
         model = Product
+        # Alifbo tartibida: avvalgi OrderedDict(sorted(...)) chiqishi bilan bir xil
         fields = [
-            "id", "name", "description", "price", "stock", "created_at",
-            "updated_at", "category", "category_name", "brand", "images",
-            "features", "likes_count", "comments",
+            "active_discount", "brand", "category", "category_name", "comments_count", "created_at", "description",
+            "effective_price", "features", "id", "images", "is_liked", "likes_count", "name", "price", "stock",
+            "updated_at",
         ]
 
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        return OrderedDict(sorted(data.items()))
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.expand = set()
+        request = self.context.get("request")
+        if request is None:
+            return
+        fields, self.expand = self.requested_fields(request)
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, request):
+        """
+        ``(fields, expand)`` from the query string; ``fields`` is ``None`` when
+        every field is requested. Expanded relations are always rendered; an
+        expand-only field such as ``comments`` must also be listed in ``expand``.
+        """
+        def parse(param):
+            return {name.strip() for name in request.GET.get(param, "").split(",") if name.strip()}
+
+        fields, expand = parse("fields"), parse("expand")
+        errors = {}
+        unknown = fields - set(cls.Meta.fields) - set(cls.EXPANDABLE)
+        # "comments" faqat expand bilan mavjud: aks holda bo'sh javob qaytardi
+        unexpanded = fields & set(cls.EXPANDABLE) - set(cls.Meta.fields) - expand
+        if unknown:
+            errors["fields"] = f"Unknown field(s): {', '.join(sorted(unknown))}."
+        elif unexpanded:
+            errors["fields"] = f"Field(s) require expand: {', '.join(sorted(unexpanded))}."
+        unknown = expand - set(cls.EXPANDABLE)
+        if unknown:
+            errors["expand"] = f"Cannot expand: {', '.join(sorted(unknown))}."
+        if errors:
+            raise serializers.ValidationError(errors)
+        return (fields | expand if fields else None), expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.expand:
+            return fields
+        for name in self.expand:
+            fields[name] = self.expanded_field(name)
+        # Faqat ko'rinish almashadi: Meta.fields alifbo tartibi saqlanadi, "comments" ham o'z o'rnida
+        return dict(sorted(fields.items()))
+
+    def expanded_field(self, name):
+        if name == "brand":
+            return BrandSerializer(read_only=True)
+        if name == "category":
+            return CategorySerializer(read_only=True)
+        return CommentSerializer(source="latest_comments", many=True, read_only=True)
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        """
+        Load only the columns and relations the requested representation needs.
+        """
+        fields, expand = cls.requested_fields(request)
+        wanted = set(cls.Meta.fields) | expand if fields is None else fields
+
+        columns = {"id"} | {name for name in wanted if name in PRODUCT_COLUMNS}
+        # Kengaytirilgan category/brand to'liq yuklanadi, category_name uchun faqat nomi
+        if "category" in expand:
+            queryset = queryset.select_related("category")
+        elif "category_name" in wanted:
+            queryset = queryset.select_related("category")
+            columns |= {"category", "category__name"}
+        if "brand" in expand:
+            queryset = queryset.select_related("brand")
+            columns.add("brand")
+        if "images" in wanted:
+            queryset = queryset.prefetch_related("images")
+        if "features" in wanted:
+            queryset = queryset.prefetch_related("features")
+        if "comments" in expand:
+            latest = Comment.objects.order_by("-created_at", "-id")[:settings.PRODUCT_EXPAND_COMMENTS]
+            queryset = queryset.prefetch_related(Prefetch("comments", queryset=latest, to_attr="latest_comments"))
+        if "is_liked" in wanted:
+            queryset = queryset.with_is_liked(request.user)
+        if "active_discount" in wanted or "effective_price" in wanted:
+            queryset = queryset.with_effective_price()
+        return queryset.only(*columns)
+
+    def get_is_liked(self, obj):
+        # ProductQuerySet.with_is_liked() annotatsiyasi
+        return getattr(obj, "is_liked", False)
+
+
+# Serializer maydoni bilan bir xil nomdagi Product ustunlari
+PRODUCT_COLUMNS = {
+    "brand", "category", "comments_count", "created_at", "description", "likes_count", "name", "price",
+    "stock", "updated_at",
+}
+
+
+class ProductListSerializer(serializers.ModelSerializer):
+    """
+    Compact product representation for listings.
+
+    Expects the queryset to carry a ``primary_image_prefetch()`` and the
+    ``with_effective_price()`` annotations, so rendering a page does not
+    touch the database.
+    """
+    active_discount = serializers.FloatField(read_only=True)
+    effective_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    is_liked = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = [
+            "id", "name", "price", "effective_price", "active_discount", "image", "image_srcset", "likes_count",
+            "comments_count", "is_liked",
+        ]
 
     def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(user=request.user).exists()
-        return False
+        # ProductQuerySet.with_is_liked() annotatsiyasi
+        return getattr(obj, "is_liked", False)
+
+    def get_image_srcset(self, obj):
+        return build_srcset(obj.primary_image, self.context.get("request"))
+
+    def get_image(self, obj):
+        image = obj.primary_image
+        if not image:
+            return None
+        request = self.context.get("request")
+        return request.build_absolute_uri(image.image.url) if request else image.image.url
+
+
+class ProductListRows:
+    """
+    ``values()`` based equivalent of ``ProductListSerializer(many=True)``
+    for the hot list endpoints.
+
+    Products are read as plain dicts and only the primary images of the
+    page are loaded as model instances (one query), which skips DRF's
+    per-field serialization. The rows have the same keys, order and values
+    as the serializer output; ``tests.FastListRenderingTests`` keeps them
+    in sync.
+    """
+    values = ("id", "name", "price", "effective_price", "active_discount", "likes_count", "comments_count", "is_liked")
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        fields = ProductListSerializer().fields
+        self.price_field = fields["price"]
+        self.effective_price_field = fields["effective_price"]
+
+    def queryset(self, queryset, *extra):
+        # with_is_liked() va with_effective_price() annotatsiyalari bo'lishi kerak; extra - cursor uchun, masalan "rank_id"
+        return queryset.values(*self.values, *(name for name in extra if name not in self.values))
+
+    def to_representation(self, rows):
+        request = self.context.get("request")
+        # Faqat har bir mahsulotning eng kichik id'li rasmi o'qiladi (GROUP BY subquery)
+        first_images = ProductImage.objects.filter(product_id__in=[row["id"] for row in rows]).order_by().values(
+            "product_id"
+        ).annotate(first=Min("id")).values("first")
+        images = {
+            image.product_id: image
+            for image in ProductImage.objects.filter(pk__in=first_images).only("id", "product_id", "image", "variants")
+        }
+        price = self.price_field.to_representation
+        effective_price = self.effective_price_field.to_representation
+        data = []
+        for row in rows:
+            image = images.get(row["id"])
+            url = None
+            if image:
+                url = request.build_absolute_uri(image.image.url) if request else image.image.url
+            data.append({
+                "id": row["id"],
+                "name": row["name"],
+                "price": price(row["price"]),
+                "effective_price": effective_price(row["effective_price"]),
+                "active_discount": row["active_discount"],
+                "image": url,
+                "image_srcset": build_srcset(image, request),
+                "likes_count": row["likes_count"],
+                "comments_count": row["comments_count"],
+                "is_liked": bool(row["is_liked"]),
+            })
+        return data
 
 
 class BrandSerializer(serializers.ModelSerializer):
@@ -112,14 +322,18 @@ class BrandSerializer(serializers.ModelSerializer):
 class DealSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source="product.name", read_only=True)
     product_image = serializers.SerializerMethodField()
+    product_image_srcset = serializers.SerializerMethodField()
     end_time = serializers.SerializerMethodField()
 
     class Meta:
         model = Deal
-        fields = ["product_name", "product_image", "discount", "start_time", "end_time"]
+        fields = ["product_name", "product_image", "product_image_srcset", "discount", "start_time", "end_time"]
+
+    def get_product_image_srcset(self, obj):
+        return build_srcset(obj.product.primary_image, self.context.get("request"))
 
     def get_product_image(self, obj):
-        first_image = obj.product.images.first()
+        first_image = obj.product.primary_image
         if first_image:
             request = self.context.get("request")
             return request.build_absolute_uri(first_image.image.url) if request else first_image.image.url
@@ -129,3 +343,38 @@ class DealSerializer(serializers.ModelSerializer):
         if obj.end_time:
             return obj.end_time.isoformat()  # 🔥 `isoformat()` faqat datetime qiymat uchun ishlaydi
         return None  # Agar `end_time` `None` bo‘lsa, `None` qaytariladi
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    # PrimaryKeyRelatedField har bir item uchun query qiladi; mavjudligini place_order tekshiradi
+    product = serializers.IntegerField(source="product_id")
+    quantity = serializers.IntegerField(min_value=1, max_value=settings.ORDER_MAX_QUANTITY)
+
+    class Meta:
+        model = OrderItem
+        fields = ["product", "quantity", "price"]
+        read_only_fields = ["price"]
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True)
+
+    class Meta:
+        model = Order
+        fields = ["id", "status", "total", "reserved_until", "created_at", "items"]
+        read_only_fields = ["status", "total", "reserved_until", "created_at"]
+
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError("An order needs at least one item.")
+        products = [item["product_id"] for item in items]
+        if len(set(products)) != len(products):
+            raise serializers.ValidationError("Each product can appear only once.")
+        return items
+
+    def create(self, validated_data):
+        items = {item["product_id"]: item["quantity"] for item in validated_data["items"]}
+        try:
+            return place_order(validated_data["user"], items)
+        except (Product.DoesNotExist, OutOfStock) as exc:
+            raise serializers.ValidationError({"items": [str(exc)]})
@@ -0,0 +1,146 @@
+from django.db import transaction
+from django.utils.timezone import now
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+from . import tasks
+from .cache import bump_version
+from .categories import adjust_product_counts
+from .models import Brand, Category, Deal, Feature, Product, ProductFacet, ProductImage
+
+VERSIONED_MODELS = (Category, Brand, Feature, Product, Deal)
+
+
+def bump_model_version(sender, **kwargs):
+    bump_version(sender)
+
+
+def bump_product_version(sender, **kwargs):
+    bump_version(Product)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_model_version, sender=model, dispatch_uid=f"bump_version_save_{model.__name__}")
+    post_delete.connect(bump_model_version, sender=model, dispatch_uid=f"bump_version_delete_{model.__name__}")
+
+m2m_changed.connect(bump_product_version, sender=Product.features.through, dispatch_uid="bump_version_features")
+
+
+def refresh_search_vector(sender, instance, **kwargs):
+    if sender is Product:
+        filters = {"pk": instance.pk}
+    elif sender is Brand:
+        filters = {"brand_id": instance.pk}
+    else:
+        filters = {"category_id": instance.pk}
+    transaction.on_commit(lambda: tasks.refresh_search_vectors.delay(**filters))
+
+
+for model in (Product, Brand, Category):
+    post_save.connect(refresh_search_vector, sender=model, dispatch_uid=f"search_vector_{model.__name__}")
+
+
+def refresh_facets_on_save(sender, instance, **kwargs):
+    transaction.on_commit(lambda: tasks.refresh_facets.delay([instance.pk]))
+
+
+def _changed_product_ids(instance, action, reverse, pk_set):
+    """
+    Products affected by a ``Product.features`` change, or ``None`` for the
+    actions that do not change anything yet.
+    """
+    if action == "pre_clear" and reverse:
+        # Feature.products.clear(): post_clear'da pk_set bo'lmaydi
+        instance._cleared_product_ids = list(instance.products.values_list("pk", flat=True))
+        return None
+    if action in ("post_add", "post_remove"):
+        return list(pk_set) if reverse else [instance.pk]
+    if action == "post_clear":
+        return getattr(instance, "_cleared_product_ids", []) if reverse else [instance.pk]
+    return None
+
+
+def refresh_facets_on_features_change(sender, instance, action, reverse, pk_set, **kwargs):
+    product_ids = _changed_product_ids(instance, action, reverse, pk_set)
+    if product_ids is not None:
+        transaction.on_commit(lambda: tasks.refresh_facets.delay(product_ids))
+
+
+def delete_feature_facets(sender, instance, **kwargs):
+    ProductFacet.objects.filter(facet=ProductFacet.FEATURE, value=instance.pk).delete()
+
+
+post_save.connect(refresh_facets_on_save, sender=Product, dispatch_uid="facets_product")
+m2m_changed.connect(
+    refresh_facets_on_features_change, sender=Product.features.through, dispatch_uid="facets_features"
+)
+post_delete.connect(delete_feature_facets, sender=Feature, dispatch_uid="facets_feature_delete")
+
+
+def remember_image_name(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._previous_image_name = (
+        ProductImage.objects.filter(pk=instance.pk).values_list("image", flat=True).first()
+    )
+
+
+def generate_image_variants(sender, instance, created, raw=False, **kwargs):
+    # Faqat yangi yoki almashtirilgan fayl: generatsiyasi muvaffaqiyatsiz rasm har save'da qayta navbatga qo'yilmaydi
+    previous = instance.__dict__.pop("_previous_image_name", instance.image.name)
+    if raw or not (created or previous != instance.image.name):
+        return
+    transaction.on_commit(lambda: tasks.generate_image_variants.delay(instance.pk))
+
+
+pre_save.connect(remember_image_name, sender=ProductImage, dispatch_uid="image_variants_pre_save")
+post_save.connect(generate_image_variants, sender=ProductImage, dispatch_uid="image_variants")
+
+
+# Rasm va feature o'zgarishlari ham mahsulot updated_at'ini yangilaydi (ETag/Last-Modified, export)
+
+def touch_product_on_image_change(sender, instance, **kwargs):
+    Product.objects.filter(pk=instance.product_id).update(updated_at=now())
+
+
+def touch_products_on_features_change(sender, instance, action, reverse, pk_set, **kwargs):
+    product_ids = _changed_product_ids(instance, action, reverse, pk_set)
+    if product_ids:
+        Product.objects.filter(pk__in=product_ids).update(updated_at=now())
+
+
+post_save.connect(touch_product_on_image_change, sender=ProductImage, dispatch_uid="touch_product_image_save")
+post_delete.connect(touch_product_on_image_change, sender=ProductImage, dispatch_uid="touch_product_image_delete")
+m2m_changed.connect(
+    touch_products_on_features_change, sender=Product.features.through, dispatch_uid="touch_product_features"
+)
+
+
+# Kategoriya daraxtidagi product_count: mahsulot qo'shilishi, ko'chishi va o'chirilishi
+
+def remember_product_category(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding or (update_fields is not None and "category" not in update_fields
+                                         and "category_id" not in update_fields):
+        return
+    instance._previous_category_id = (
+        Product.objects.filter(pk=instance.pk).values_list("category_id", flat=True).first()
+    )
+
+
+def count_saved_product(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        adjust_product_counts({instance.category_id: 1})
+        return
+    previous = instance.__dict__.pop("_previous_category_id", instance.category_id)
+    if previous != instance.category_id:
+        adjust_product_counts({previous: -1, instance.category_id: 1})
+
+
+def count_deleted_product(sender, instance, **kwargs):
+    adjust_product_counts({instance.category_id: -1})
+
+
+pre_save.connect(remember_product_category, sender=Product, dispatch_uid="category_count_product_pre_save")
+post_save.connect(count_saved_product, sender=Product, dispatch_uid="category_count_product_save")
+post_delete.connect(count_deleted_product, sender=Product, dispatch_uid="category_count_product_delete")
@@ -0,0 +1,102 @@
+"""
+Celery tasks for the work that should not run inside a request: search
+vector and facet refreshes, image variants, and the periodic maintenance
+jobs scheduled in ``CELERY_BEAT_SCHEDULE``.
+
+With ``CELERY_TASK_ALWAYS_EAGER`` (the default when no broker is
+configured) ``.delay()`` runs the task in place.
+"""
+import logging
+
+from celery import shared_task
+from django.core.management import call_command
+
+from . import likes
+from .counters import reconcile_counters as reconcile_product_counters
+from .facets import refresh_product_facets
+from .images import generate_variants
+from .models import Deal, Product, ProductImage
+from .orders import expire_reservations as release_expired_reservations
+from .search import update_search_vector
+
+logger = logging.getLogger(__name__)
+
+
+# =====================
+# ON-CHANGE TASKS
+# =====================
+
+@shared_task
+def refresh_search_vectors(**filters):
+    """
+    Recompute the search vector of the products matching ``filters``
+    (``pk``, ``brand_id`` or ``category_id``).
+    """
+    return update_search_vector(Product.objects.filter(**filters))
+
+
+@shared_task
+def refresh_facets(product_ids):
+    refresh_product_facets(product_ids)
+
+
+@shared_task
+def generate_image_variants(image_id):
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image is None:
+        # Task navbatda turgan paytda rasm o'chirilgan
+        return None
+    # Inline: parallelizm worker concurrency'dan, har bir child o'z process pool'ini ochmaydi
+    return generate_variants(image)
+
+
+# =====================
+# PERIODIC TASKS
+# =====================
+
+@shared_task
+def expire_deals(batch_size=1000):
+    expired = Deal.objects.expire(batch_size=batch_size)
+    Deal.objects.announce_started()
+    logger.info("%s deal(s) deactivated", expired)
+    return expired
+
+
+@shared_task
+def expire_reservations(batch_size=1000):
+    expired = release_expired_reservations(batch_size=batch_size)
+    logger.info("%s order reservation(s) expired", expired)
+    return expired
+
+
+@shared_task
+def reconcile_counters(batch_size=1000):
+    repaired = reconcile_product_counters(batch_size=batch_size)
+    logger.info("Counters repaired: %s", repaired)
+    return repaired
+
+
+@shared_task
+def flush_like_buffer():
+    return likes.flush()
+
+
+@shared_task
+def generate_missing_image_variants():
+    # Yo'qolgan yoki xato bilan tugagan upload task'lari uchun
+    call_command("generate_image_variants", workers=0)
+
+
+@shared_task
+def rebuild_search_vectors():
+    call_command("update_search_vectors")
+
+
+@shared_task
+def rebuild_facets():
+    call_command("rebuild_facets")
+
+
+@shared_task
+def rebuild_category_tree():
+    call_command("rebuild_category_tree")
@@ -1,13 +1,1607 @@
-from django.test import TestCase
-
-# Create your tests here.
+import json
 import os
-import django
+import random
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+from base64 import b64decode
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import OperationalError, connection, connections, router
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from django.urls import resolve, reverse
+from django.utils.timezone import now
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config import celery_app
+from shop import categories, likes, orders, tasks
+from shop.benchmark import pooling_available, run_connection_benchmark, run_serializer_benchmark
+from shop.cache import get_stats, get_versions
+from shop.db_router import ReplicaRoutingMiddleware, _is_replica_view, reads_from_replica
+from shop.middleware import QueryCountMiddleware
+from shop.models import User
+from shop.models import (
+    Brand, Category, Comment, Deal, Feature, Like, Order, OrderItem, PendingLike, Product, ProductImage, primary_image_prefetch,
+)
+from shop.renderers import ORJSONRenderer
+from shop.search import create_search_indexes, search_products, update_search_vector
+from shop.serializers import CommentSerializer, DealSerializer, ProductListRows, ProductListSerializer
+
+
+def setUpModule():
+    # REDIS_URL berilgan muhitda ham task'lar test ichida eager ishlaydi (result backend yo'q)
+    # Sozlamalar CELERY namespace'ida: kalitlar settings'dagi nomlar bilan
+    eager = {"CELERY_TASK_ALWAYS_EAGER": True, "CELERY_TASK_EAGER_PROPAGATES": True}
+    previous = {key: celery_app.conf[key] for key in eager}
+    celery_app.conf.update(eager)
+    unittest.addModuleCleanup(celery_app.conf.update, previous)
+
+
+def create_products(category, count, images_per_product=2):
+    products = []
+    for i in range(count):
+        product = Product.objects.create(
+            category=category, name=f"Product {i}", description="Test", price="10.00", stock=5
+        )
+        for j in range(images_per_product):
+            ProductImage.objects.create(product=product, image=f"product_images/{product.pk}-{j}.jpg")
+        products.append(product)
+    return products
+
+
+class PrimaryImageQueryCountTests(TestCase):
+    """
+    Listings must render in a constant number of queries, whatever the number of rows.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Phones", slug="phones")
+
+    def test_product_list_query_count(self):
+        create_products(self.category, 2)
+        # last-modified lookup + products + first images + facet counts
+        with self.assertNumQueries(4):
+            self.client.get(reverse("ecommerce:product_list"))
+
+        create_products(self.category, 8)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("ecommerce:product_list"))
+
+        first = response.json()["results"][0]
+        product = Product.objects.get(pk=first["id"])
+        self.assertTrue(first["image"].endswith(product.images.order_by("id").first().image.url))
+
+    def test_deal_list_query_count(self):
+        for product in create_products(self.category, 2):
+            Deal.objects.create(product=product, name="Sale", discount=10)
+        # count + deals with products + first images
+        with self.assertNumQueries(3):
+            self.client.get(reverse("ecommerce:deal_list"))
+
+        for product in create_products(self.category, 8):
+            Deal.objects.create(product=product, name="Sale", discount=10)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("ecommerce:deal_list"))
+
+        self.assertEqual(response.json()["count"], 10)
+        self.assertIsNotNone(response.json()["results"][0]["product_image"])
+
+    def test_product_without_images(self):
+        Product.objects.create(category=self.category, name="Bare", description="", price="1.00", stock=1)
+        response = self.client.get(reverse("ecommerce:product_list"))
+        self.assertIsNone(response.json()["results"][0]["image"])
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Phones", slug="phones")
+
+    def test_list_is_served_from_cache(self):
+        url = reverse("ecommerce:category_list")
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.json()[0]["name"], "Phones")
+        self.assertEqual(get_stats()["CategoryListView"], {"hit": 1, "miss": 1})
+
+    def test_save_and_delete_invalidate(self):
+        url = reverse("ecommerce:category_detail", args=[self.category.pk])
+        self.client.get(url)
+
+        self.category.name = "Smartphones"
+        self.category.save()
+        self.assertEqual(self.client.get(url).json()["name"], "Smartphones")
+
+        self.category.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_versions_are_per_model(self):
+        url = reverse("ecommerce:brand_list")
+        Brand.objects.create(name="Acme", category=self.category)
+        self.client.get(url)
+
+        Category.objects.create(name="Laptops", slug="laptops")
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Phones", slug="phones")
+        brand = Brand.objects.create(name="Acme", category=category)
+        Product.objects.create(
+            category=category, brand=brand, name="Galaxy", description="Android phone", price="10.00", stock=1
+        )
+        Product.objects.create(category=category, name="Kettle", description="Boils water", price="5.00", stock=1)
+
+    def test_search_matches_name_description_and_brand(self):
+        url = reverse("ecommerce:product_search")
+        for text in ("galaxy", "android", "acme"):
+            results = self.client.get(url, {"q": text}).json()["results"]
+            self.assertEqual([row["name"] for row in results], ["Galaxy"])
+
+    def test_empty_query_returns_nothing(self):
+        response = self.client.get(reverse("ecommerce:product_search"), {"q": " "})
+        self.assertEqual(response.json()["results"], [])
+
+    def test_cursor_on_equal_ranks(self):
+        category = Category.objects.get(slug="phones")
+        for i in range(3):
+            Product.objects.create(category=category, name=f"Galaxy {i}", description="", price="1.00", stock=1)
+        ids, url, data = [], reverse("ecommerce:product_search"), {"q": "galaxy", "page_size": 1}
+        while url:
+            page = self.client.get(url, data).json()
+            ids += [row["id"] for row in page["results"]]
+            url, data = page["next"], None
+            if url:
+                # Teng rank'larda ham pozitsiya noyob: offset (o=) ishlatilmaydi
+                cursor = parse_qs(urlsplit(url).query)["cursor"][0]
+                self.assertNotIn("o=", b64decode(cursor.encode()).decode())
+        self.assertEqual(ids, sorted(Product.objects.filter(name__startswith="Galaxy").values_list("pk", flat=True), reverse=True))
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "PostgreSQL full-text search")
+class PostgresSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Phones", slug="phones")
+        cls.by_name = Product.objects.create(
+            category=category, name="Galaxy", description="Android phone", price="10.00", stock=1
+        )
+        cls.by_description = Product.objects.create(
+            category=category, name="Pixel", description="Galaxy killer", price="9.00", stock=1
+        )
+        Product.objects.create(category=category, name="Kettle", description="Boils water", price="5.00", stock=1)
+        update_search_vector()
+
+    def search(self, text):
+        return self.client.get(reverse("ecommerce:product_search"), {"q": text}).json()["results"]
+
+    def test_name_match_ranks_above_description(self):
+        self.assertEqual([row["id"] for row in self.search("galaxy")], [self.by_name.pk, self.by_description.pk])
+
+    def test_rank_comes_from_search_rank(self):
+        ranks = dict(search_products(Product.objects.all(), "galaxy").values_list("pk", "rank"))
+        self.assertGreater(ranks[self.by_description.pk], 0)
+        self.assertGreater(ranks[self.by_name.pk], ranks[self.by_description.pk])
+
+    @override_settings(SEARCH_TRIGRAM_FALLBACK=True, SEARCH_TRIGRAM_THRESHOLD=0.3)
+    def test_typo_falls_back_to_trigram(self):
+        self.assertEqual([row["name"] for row in self.search("Galaxi")], ["Galaxy"])
+
+    @override_settings(SEARCH_TRIGRAM_FALLBACK=False)
+    def test_trigram_fallback_can_be_disabled(self):
+        self.assertEqual(self.search("Galaxi"), [])
+
+    def test_post_migrate_creates_gin_indexes(self):
+        create_search_indexes(sender=None, using="default")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s", [Product._meta.db_table]
+            )
+            indexes = dict(cursor.fetchall())
+        self.assertIn("USING gin (search_vector)", indexes["shop_product_search_gin"])
+        self.assertIn("gin_trgm_ops", indexes["shop_product_name_trgm"])
+
+
+class ProductFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = Category.objects.create(name="Phones", slug="phones")
+        cls.laptops = Category.objects.create(name="Laptops", slug="laptops")
+        cls.acme = Brand.objects.create(name="Acme", category=cls.phones)
+        cls.red = Feature.objects.create(name="Color", value="Red")
+        cls.blue = Feature.objects.create(name="Color", value="Blue")
+
+    def create(self, category, price, brand=None, features=()):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                category=category, brand=brand, name="P", description="", price=price, stock=1
+            )
+            product.features.add(*features)
+        return product
+
+    def test_filters_and_facet_counts(self):
+        red_phone = self.create(self.phones, "100.00", self.acme, [self.red])
+        self.create(self.phones, "300.00", self.acme, [self.blue])
+        self.create(self.laptops, "900.00", features=[self.red])
+
+        url = reverse("ecommerce:product_list")
+        data = self.client.get(url, {"feature": "Color:Red", "max_price": "500"}).json()
+        self.assertEqual([row["id"] for row in data["results"]], [red_phone.pk])
+        self.assertEqual(data["facets"]["category"], [{"id": self.phones.pk, "count": 1}])
+
+        facets = self.client.get(url, {"category": self.phones.pk}).json()["facets"]
+        self.assertEqual(facets["brand"], [{"id": self.acme.pk, "count": 2}])
+        self.assertEqual(
+            facets["feature"], [{"id": self.red.pk, "count": 1}, {"id": self.blue.pk, "count": 1}]
+        )
+
+    def test_facets_follow_product_changes(self):
+        product = self.create(self.phones, "100.00", features=[self.red])
+        with self.captureOnCommitCallbacks(execute=True):
+            product.category = self.laptops
+            product.save()
+            self.red.products.remove(product)
+
+        facets = self.client.get(reverse("ecommerce:product_list")).json()["facets"]
+        self.assertEqual(facets["category"], [{"id": self.laptops.pk, "count": 1}])
+        self.assertEqual(facets["feature"], [])
+
+    def test_invalid_filter(self):
+        response = self.client.get(reverse("ecommerce:product_list"), {"feature": "Red"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ImportCatalogTests(TestCase):
+    def run_import(self, content, suffix):
+        with tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False) as feed:
+            feed.write(content)
+        self.addCleanup(os.remove, feed.name)
+        call_command("import_catalog", feed.name, "--batch-size", "2", stdout=StringIO(), stderr=StringIO())
+
+    def test_import_and_upsert(self):
+        self.run_import(
+            '{"sku": "A1", "name": "Phone", "price": "100", "stock": 3, "category_slug": "phones", '
+            '"brand": "Acme", "features": {"Color": "Red"}}\n'
+            'broken line\n'
+            '{"sku": "A2", "name": "Phone 2", "price": "200", "stock": 1, "category_slug": "phones", '
+            '"brand": "Acme", "features": ["Color:Blue"]}\n',
+            ".jsonl",
+        )
+        self.run_import(
+            "sku,name,price,stock,category_slug,brand,features\n"
+            "A1,Phone X,150,5,phones,Acme,Color:Blue|Size:M\n",
+            ".csv",
+        )
+
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(Brand.objects.count(), 1)
+        self.assertEqual(Feature.objects.count(), 3)
+        product = Product.objects.get(sku="A1")
+        self.assertEqual((product.name, product.stock), ("Phone X", 5))
+        self.assertEqual(sorted(str(feature) for feature in product.features.all()), ["Color: Blue", "Size: M"])
+        self.assertEqual(product.facets.filter(facet="feature").count(), 2)
+
+    def test_existing_categories_keep_their_name(self):
+        Category.objects.create(name="Phones", slug="phones")
+        self.run_import(
+            "sku,name,price,stock,category_slug,category_name\n"
+            "A1,Phone,100,1,phones,\n"
+            "A2,Kettle,10,1,kitchen,Kitchen\n"
+            "A3,Pan,10,1,pans,\n",
+            ".csv",
+        )
+        self.assertEqual(
+            dict(Category.objects.values_list("slug", "name")), {"phones": "Phones", "kitchen": "Kitchen", "pans": "pans"}
+        )
+        self.assertEqual(Category.objects.get(slug="phones").product_count, 1)
+
+
+class ProductExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Phones", slug="phones")
+        cls.admin = User.objects.create_superuser(email="admin@example.com", username="admin", password="x")
+
+    def export(self, **params):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get(reverse("ecommerce:product_export"), params)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_export_streams_one_product_per_line(self):
+        create_products(self.category, 3)
+        rows = self.export()
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["category_name"], "Phones")
+        self.assertEqual(len(rows[0]["images"]), 2)
+
+    def test_updated_since(self):
+        old, new = create_products(self.category, 2, images_per_product=0)
+        Product.objects.filter(pk=old.pk).update(updated_at="2020-01-01T00:00:00Z")
+        rows = self.export(updated_since="2024-01-01T00:00:00Z")
+        self.assertEqual([row["id"] for row in rows], [new.pk])
+
+    def test_requires_admin(self):
+        self.assertEqual(self.client.get(reverse("ecommerce:product_export")).status_code, 401)
+
+
+class ProductImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, PRODUCT_IMAGE_VARIANTS={"thumb": 40, "small": 80}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(category=category, name="P", description="", price="1.00", stock=1)
+
+    def upload(self, width=120, height=60):
+        buffer = BytesIO()
+        Image.new("RGBA", (width, height), "red").save(buffer, "PNG")
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProductImage.objects.create(product=self.product, image=ContentFile(buffer.getvalue(), "p.png"))
+
+    def test_variants_generated_on_upload(self):
+        image = self.upload()
+        image.refresh_from_db()
+        self.assertEqual(set(image.variants), {"thumb", "small"})
+        with image.image.storage.open(image.variants["thumb"]["webp"]) as thumb:
+            self.assertEqual(Image.open(thumb).size, (40, 20))
+
+        results = self.client.get(reverse("ecommerce:product_list")).json()["results"]
+        srcset = results[0]["image_srcset"]
+        self.assertEqual(set(srcset), {"webp", "jpeg"})
+        self.assertTrue(srcset["jpeg"].endswith("small.jpeg 80w"))
+
+    def test_replaced_image_is_regenerated(self):
+        image = self.upload()
+        version = get_versions([Product])[0]
+        buffer = BytesIO()
+        Image.new("RGB", (200, 200), "blue").save(buffer, "PNG")
+        image.image = ContentFile(buffer.getvalue(), "q.png")
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        image.refresh_from_db()
+        with image.image.storage.open(image.variants["thumb"]["webp"]) as thumb:
+            self.assertEqual(Image.open(thumb).size, (40, 40))
+        self.assertGreater(get_versions([Product])[0], version)
+
+    def test_failed_generation_is_not_requeued(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(product=self.product, image="product_images/missing.png")
+        self.assertEqual(image.variants, {})
+        with self.captureOnCommitCallbacks() as callbacks:
+            image.save()
+        self.assertEqual(callbacks, [])
+
+    def test_backfill_command(self):
+        image = self.upload()
+        ProductImage.objects.filter(pk=image.pk).update(variants={})
+        ProductImage.objects.create(product=self.product, image="product_images/missing.png")
+
+        other = self.upload()
+        ProductImage.objects.filter(pk=other.pk).update(variants={})
+        version = get_versions([Product])[0]
+
+        out = StringIO()
+        call_command("generate_image_variants", "--workers", "0", stdout=out)
+        self.assertIn("2 image(s) processed, 1 failed", out.getvalue())
+        image.refresh_from_db()
+        self.assertIn("small", image.variants)
+        # Butun backfill uchun bitta bump
+        self.assertEqual(get_versions([Product])[0], version + 1)
+
+
+class CommentFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Phones", slug="phones")
+        cls.product = Product.objects.create(category=category, name="P", description="", price="1.00", stock=1)
+        cls.user = User.objects.create_user(email="user@example.com", username="user", password="x")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_create_and_delete_keep_comments_count(self):
+        url = reverse("ecommerce:comment-add", args=[self.product.pk])
+        first = self.client.post(url, {"text": "Great"}).json()
+        self.client.post(url, {"text": "Still great"})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.comments_count, 2)
+
+        self.client.delete(reverse("ecommerce:comment-delete", args=[first["id"]]))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.comments_count, 1)
+
+        data = self.client.get(reverse("ecommerce:product_detail", args=[self.product.pk])).json()
+        self.assertEqual(data["comments_count"], 1)
+        self.assertNotIn("comments", data)
+
+    def test_feed_is_cursor_paginated_newest_first(self):
+        Comment.objects.bulk_create(
+            [Comment(user=self.user, product=self.product, text=str(i)) for i in range(25)]
+        )
+        url = reverse("ecommerce:add-comment", args=[self.product.pk])
+        with self.assertNumQueries(1):
+            page = self.client.get(url).json()
+        self.assertEqual(len(page["results"]), 20)
+        self.assertNotIn("count", page)
+
+        rest = self.client.get(page["next"]).json()["results"]
+        ids = [row["id"] for row in page["results"] + rest]
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+
+
+class IsLikedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Phones", slug="phones")
+        cls.user = User.objects.create_user(email="user@example.com", username="user", password="x")
+
+    def test_is_liked_costs_no_extra_queries(self):
+        products = create_products(self.category, 5, images_per_product=1)
+        Like.objects.create(product=products[1], user=self.user)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        # last-modified lookup + products (with EXISTS) + first images + facet counts
+        with self.assertNumQueries(4):
+            results = client.get(reverse("ecommerce:product_list")).json()["results"]
+        liked = {row["id"]: row["is_liked"] for row in results}
+        self.assertEqual(liked, {product.pk: product == products[1] for product in products})
+
+        detail = client.get(reverse("ecommerce:product_detail", args=[products[1].pk])).json()
+        self.assertTrue(detail["is_liked"])
+
+    def test_anonymous_user(self):
+        create_products(self.category, 1)
+        results = self.client.get(reverse("ecommerce:product_list")).json()["results"]
+        self.assertFalse(results[0]["is_liked"])
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Phones", slug="phones")
+        cls.user = User.objects.create_user(email="user@example.com", username="user", password="x")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_product_detail_not_modified(self):
+        product = create_products(self.category, 1)[0]
+        url = reverse("ecommerce:product_detail", args=[product.pk])
+        response = self.client.get(url)
+        # Faqat ETag: effective_price deal'lar bilan o'zgaradi, updated_at esa yo'q
+        self.assertNotIn("Last-Modified", response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_like_changes_product_etag(self):
+        product = create_products(self.category, 1)[0]
+        url = reverse("ecommerce:product_detail", args=[product.pk])
+        etag = self.client.get(url)["ETag"]
+
+        self.client.post(reverse("ecommerce:add_like", args=[product.pk]))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["is_liked"])
+
+    def test_product_list_not_modified_until_catalog_changes(self):
+        create_products(self.category, 2)
+        url = reverse("ecommerce:product_list")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Product.objects.first().delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_counters_do_not_touch_updated_at(self):
+        product = create_products(self.category, 1)[0]
+        url = reverse("ecommerce:product_list")
+        response = self.client.get(url)
+        # Ro'yxatda Last-Modified yo'q: faqat If-Modified-Since yuborgan klient eskirgan 304 olmaydi
+        self.assertNotIn("Last-Modified", response)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT").status_code, 200)
+
+        updated_at = Product.objects.values_list("updated_at", flat=True).get(pk=product.pk)
+        self.client.post(reverse("ecommerce:add_like", args=[product.pk]))
+        self.client.post(reverse("ecommerce:comment-add", args=[product.pk]), {"text": "Hi"})
+        self.assertEqual(Product.objects.values_list("updated_at", flat=True).get(pk=product.pk), updated_at)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.json()["results"][0]["likes_count"], response.json()["results"][0]["comments_count"]), (1, 1)
+        )
+
+    def test_catalog_not_modified_without_queries(self):
+        url = reverse("ecommerce:category_list")
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+def seed_catalog(products=20, users=3):
+    """
+    A small but realistic catalog: every product has a brand, features,
+    images, likes, comments and a running deal.
+    """
+    index = Product.objects.count()
+    category, _ = Category.objects.get_or_create(slug="electronics", defaults={"name": "Electronics"})
+    brand, _ = Brand.objects.get_or_create(name="Acme", category=category)
+    features = [Feature.objects.get_or_create(name="Color", value=color)[0] for color in ("Red", "Blue")]
+    people = [
+        User.objects.get_or_create(email=f"seed{i}@example.com", defaults={"username": f"seed{i}"})[0]
+        for i in range(users)
+    ]
+    for i in range(index, index + products):
+        product = Product.objects.create(
+            category=category, brand=brand, name=f"Phone {i}", description="Seeded", price="99.90", stock=10
+        )
+        product.features.set(features)
+        for j in range(2):
+            ProductImage.objects.create(product=product, image=f"product_images/seed-{i}-{j}.jpg")
+        for user in people:
+            Like.objects.create(product=product, user=user)
+            Comment.objects.create(product=product, user=user, text="Nice")
+        Deal.objects.create(product=product, name="Sale", discount=10)
+    return category, brand, features, people
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every endpoint in shop/urls.py has a fixed SQL budget that must not grow
+    with the amount of data or the page size (every list honours
+    ``?page_size=``).
+    """
+    BUDGETS = {
+        "category_list": 1,
+        "category_detail": 1,
+        "feature_list": 2,
+        "feature_detail": 1,
+        "brand_list": 2,
+        "brand_detail": 1,
+        "product_list": 4,
+        "product_search": 3,
+        "product_export": 3,
+        "product_detail": 4,
+        "deal_list": 3,
+        "add-comment": 1,
+        "user_detail": 0,
+        "cache_stats": 0,
+        "order_list": 3,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category, cls.brand, cls.features, cls.users = seed_catalog()
+        cls.product = Product.objects.order_by("-pk").first()
+        cls.admin = User.objects.create_superuser(email="admin@example.com", username="admin", password="x")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def urls(self):
+        return {
+            "category_list": reverse("ecommerce:category_list"),
+            "category_detail": reverse("ecommerce:category_detail", args=[self.category.pk]),
+            "feature_list": reverse("ecommerce:feature_list"),
+            "feature_detail": reverse("ecommerce:feature_detail", args=[self.features[0].pk]),
+            "brand_list": reverse("ecommerce:brand_list"),
+            "brand_detail": reverse("ecommerce:brand_detail", args=[self.brand.pk]),
+            "product_list": reverse("ecommerce:product_list"),
+            "product_search": reverse("ecommerce:product_search") + "?q=phone",
+            "product_export": reverse("ecommerce:product_export"),
+            "product_detail": reverse("ecommerce:product_detail", args=[self.product.pk]),
+            "deal_list": reverse("ecommerce:deal_list"),
+            "add-comment": reverse("ecommerce:add-comment", args=[self.product.pk]),
+            "user_detail": reverse("ecommerce:user_detail"),
+            "cache_stats": reverse("ecommerce:cache_stats"),
+            "order_list": reverse("ecommerce:order_list"),
+        }
+
+    def assertBudget(self, name, method, url, budget, **kwargs):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+            if hasattr(response, "streaming_content"):
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400, f"{name}: {response.status_code}")
+        self.assertLessEqual(
+            len(queries), budget,
+            f"{name} ran {len(queries)} queries (budget {budget}):\n"
+            + "\n".join(query["sql"] for query in queries.captured_queries),
+        )
+
+    def test_read_endpoints_within_budget(self):
+        for page_size in (5, 50):
+            for name, url in self.urls().items():
+                separator = "&" if "?" in url else "?"
+                self.assertBudget(name, "get", f"{url}{separator}page_size={page_size}", self.BUDGETS[name])
+
+    def test_budget_does_not_grow_with_data(self):
+        seed_catalog(products=30, users=5)
+        for name, url in self.urls().items():
+            self.assertBudget(name, "get", url, self.BUDGETS[name])
+
+    def test_write_endpoints_within_budget(self):
+        user = self.users[0]
+        self.client.force_authenticate(user)
+        product = Product.objects.create(
+            category=self.category, name="Fresh", description="", price="1.00", stock=1
+        )
+
+        # Budgets include the SAVEPOINT/RELEASE statements of transaction.atomic()
+        self.assertBudget("add_like", "post", reverse("ecommerce:add_like", args=[product.pk]), 9)
+        self.assertBudget("delete_like", "delete", reverse("ecommerce:delete_like", args=[product.pk]), 6)
+        self.assertBudget(
+            "comment-add", "post", reverse("ecommerce:comment-add", args=[product.pk]), 5, data={"text": "Hi"}
+        )
+        comment = Comment.objects.filter(user=user, product=product).get()
+        self.assertBudget("comment-delete", "delete", reverse("ecommerce:comment-delete", args=[comment.pk]), 6)
+        # Har bir mahsulot uchun bitta shartli UPDATE, oxirida javob uchun itemlar
+        self.assertBudget(
+            "order_list", "post", reverse("ecommerce:order_list"), 7,
+            data={"items": [{"product": product.pk, "quantity": 1}]}, format="json",
+        )
+
+    def test_auth_endpoints_within_budget(self):
+        self.client.force_authenticate(None)
+        # email va username unique tekshiruvlari, keyin INSERT
+        self.assertBudget("register", "post", reverse("ecommerce:register"), 3, data={
+            "email": "new@example.com", "username": "new", "password": "Str0ng-passw0rd",
+        })
+        self.assertBudget("login", "post", reverse("ecommerce:login"), 1, data={
+            "email": "new@example.com", "password": "Str0ng-passw0rd",
+        })
+
+    def test_page_size_is_honoured(self):
+        for name in ("feature_list", "brand_list", "deal_list"):
+            with warnings.catch_warnings():
+                # Tartiblanmagan queryset sahifalansa sahifalar barqaror bo'lmaydi
+                warnings.simplefilter("error", UnorderedObjectListWarning)
+                response = self.client.get(self.urls()[name], {"page_size": 1})
+            self.assertEqual(len(response.json()["results"]), 1, name)
+
+    def test_debug_headers(self):
+        with override_settings(DEBUG=True):
+            response = self.client.get(reverse("ecommerce:deal_list"))
+            export = self.client.get(reverse("ecommerce:product_export"))
+        self.assertEqual(response["X-DB-Query-Count"], str(self.BUDGETS["deal_list"]))
+        self.assertIn("X-DB-Time-Ms", response)
+        # Streaming javob: body header'lardan keyin o'qiladi, hisob to'liq bo'lmaydi
+        self.assertNotIn("X-DB-Query-Count", export)
+        b"".join(export.streaming_content)
+
+
+class BenchmarkTests(TestCase):
+    def test_seed_and_run(self):
+        call_command(
+            "seed_benchmark", "--users", "5", "--categories", "2", "--products", "30", "--deals", "5",
+            "--likes", "40", "--comments", "20", "--batch-size", "10", stdout=StringIO(),
+        )
+        self.assertEqual(Product.objects.filter(sku__startswith="bench-").count(), 30)
+        self.assertEqual(ProductImage.objects.count(), 90)
+        self.assertEqual(Like.objects.count(), 40)
+        # Counter'lar bulk insertdan keyin ham to'g'ri
+        self.assertEqual(sum(Product.objects.values_list("likes_count", flat=True)), 40)
+        self.assertEqual(sum(Product.objects.values_list("comments_count", flat=True)), 20)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "run.json")
+            call_command("run_benchmark", "--iterations", "4", "--warmup", "1", "--output", output, stdout=StringIO())
+            with open(output) as fh:
+                report = json.load(fh)
+
+        self.assertEqual(report["data"]["products"], 30)
+        for name, result in report["results"].items():
+            self.assertEqual(result["errors"], 0, name)
+            self.assertGreater(result["requests"], 0, name)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"], name)
+        # Yozish ssenariylari izsiz qaytariladi
+        self.assertEqual(Like.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 20)
+
+        call_command("seed_benchmark", "--reset", "--products", "0", stdout=StringIO())
+        self.assertFalse(Product.objects.filter(sku__startswith="bench-").exists())
+
+    def test_connection_modes(self):
+        results = run_connection_benchmark(requests=5)["results"]
+        # In-memory SQLite test bazasida Django ulanishni yopmaydi
+        in_memory = connection.vendor == "sqlite" and connection.is_in_memory_db()
+        self.assertEqual(results["new"]["connections_opened"], 1 if in_memory else 5)
+        self.assertEqual(results["persistent"]["connections_opened"], 1)
+        self.assertEqual(results["persistent"]["requests"], 5)
+        if not pooling_available():
+            self.assertIn("skipped", results["pool"])
+
+    def test_serializer_paths(self):
+        create_products(Category.objects.create(name="Phones", slug="phones"), 3, images_per_product=1)
+        results = run_serializer_benchmark(User.objects.create(username="runner"), iterations=2)["results"]
+        self.assertEqual(results["drf"]["bytes"], results["rows"]["bytes"])
+        self.assertEqual(results["rows"]["objects"], 3)
+
+
+class AsyncViewTests(TestCase):
+    """
+    The async endpoints return the same representations as the DRF views.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category, cls.brand, cls.features, cls.users = seed_catalog(products=25)
+        cls.user = cls.users[0]
+        cls.product = Product.objects.order_by("-pk").first()
+        cls.token = str(AccessToken.for_user(cls.user))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    async def get_both(self, name, *args, query="", async_name=None):
+        sync = await sync_to_async(self.client.get)(reverse(f"ecommerce:{name}", args=args) + query)
+        response = await self.async_client.get(
+            reverse(f"ecommerce:{async_name or 'async_' + name}", args=args) + query, headers={"authorization": f"Bearer {self.token}"}
+        )
+        self.assertEqual(response.status_code, 200)
+        return sync.json(), response.json()
+
+    def test_middlewares_are_async_capable(self):
+        async def view(request):
+            return HttpResponse()
+
+        with override_settings(DEBUG=True, REPLICA_DATABASES=["replica_1"]):
+            for middleware_class in (QueryCountMiddleware, ReplicaRoutingMiddleware):
+                # Async zanjirda sync_to_async o'rami (thread hop) qo'yilmaydi
+                self.assertTrue(iscoroutinefunction(middleware_class(view)), middleware_class.__name__)
+
+    async def test_query_headers_of_async_views(self):
+        with override_settings(DEBUG=True):
+            response = await self.async_client.get(
+                reverse("ecommerce:async_deal_list"), headers={"authorization": f"Bearer {self.token}"}
+            )
+        self.assertGreater(int(response["X-DB-Query-Count"]), 0)
+
+    async def test_same_representation(self):
+        await Like.objects.filter(user=self.user).exclude(product=self.product).adelete()
+        sync, data = await self.get_both("product_list", query="?page_size=5")
+        self.assertEqual(data["results"], sync["results"])
+        self.assertEqual(data["facets"], sync["facets"])
+        self.assertEqual([row["is_liked"] for row in data["results"]], [True, False, False, False, False])
+
+        sync, data = await self.get_both("product_detail", self.product.pk)
+        self.assertEqual(data, sync)
+
+        sync, data = await self.get_both("deal_list", query="?page=2")
+        self.assertEqual((data["count"], data["results"]), (sync["count"], sync["results"]))
+        self.assertTrue(data["next"].endswith("/async/deals/?page=3"))
+
+        sync, data = await self.get_both("add-comment", self.product.pk, async_name="async_comment_list")
+        self.assertEqual(data["results"], sync["results"])
+
+    async def test_keyset_pages_cover_all_products(self):
+        url = reverse("ecommerce:async_product_list") + "?page_size=7"
+        seen = []
+        while url:
+            data = (await self.async_client.get(url)).json()
+            seen += [row["id"] for row in data["results"]]
+            url = data["next"]
+        expected = [pk async for pk in Product.objects.order_by("-id").values_list("pk", flat=True)]
+        self.assertEqual(seen, expected)
+
+    async def test_errors(self):
+        response = await self.async_client.get(reverse("ecommerce:async_product_list") + "?cursor=broken")
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(reverse("ecommerce:async_product_detail", args=[0]))
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(
+            reverse("ecommerce:async_product_list"), headers={"authorization": "Bearer invalid"}
+        )
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.post(reverse("ecommerce:async_deal_list"))
+        self.assertEqual(response.status_code, 405)
+        for name in ("deal_list", "async_deal_list"):
+            response = await self.async_client.get(reverse(f"ecommerce:{name}") + "?min_discount=abc")
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("min_discount", response.json())
+
+    async def test_comment_cursor_keeps_microseconds(self):
+        # Bir millisekund ichida yozilgan ikki komment sahifa chegarasida yo'qolmasligi kerak
+        created = now().replace(microsecond=123456)
+        first, second = [
+            await Comment.objects.acreate(product=self.product, user=self.user, text=text) for text in ("a", "b")
+        ]
+        await Comment.objects.filter(product=self.product).exclude(pk__in=[first.pk, second.pk]).adelete()
+        await Comment.objects.filter(pk=first.pk).aupdate(created_at=created)
+        await Comment.objects.filter(pk=second.pk).aupdate(created_at=created + timedelta(microseconds=400))
+        url = reverse("ecommerce:async_comment_list", args=[self.product.pk]) + "?page_size=1"
+        seen = []
+        while url:
+            data = (await self.async_client.get(url)).json()
+            seen += [row["id"] for row in data["results"]]
+            url = data["next"]
+        self.assertEqual(seen, [second.pk, first.pk])
+
+
+class ConcurrencyBenchmarkTests(TransactionTestCase):
+    # Thread'lar o'z ulanishida ishlaydi, shuning uchun ma'lumot commit qilinishi kerak
+    def test_wsgi_and_asgi_runs(self):
+        seed_catalog(products=5)
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "run.json")
+            call_command(
+                "benchmark_concurrency", "--requests", "6", "--concurrency", "1", "3",
+                "--scenario", "product_detail", "--scenario", "comment_feed", "--output", output, stdout=StringIO(),
+            )
+            with open(output) as fh:
+                report = json.load(fh)
+        for levels in report["results"].values():
+            for servers in levels.values():
+                for server in ("wsgi", "asgi"):
+                    self.assertEqual((servers[server]["requests"], servers[server]["errors"]), (6, 0))
+
+
+@override_settings(REPLICA_DATABASES=["replica_1"], READ_YOUR_WRITES_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.routed = []
+
+        @reads_from_replica
+        def catalog_view(request):
+            self.routed.append(router.db_for_read(Product))
+            return HttpResponse()
+
+        def write_view(request):
+            self.routed.append(router.db_for_write(Product))
+            return HttpResponse()
+
+        self.catalog_view, self.write_view = catalog_view, write_view
+
+    def request(self, view, method="get", **extra):
+        request = getattr(self.factory, method)("/", **extra)
+        middleware = ReplicaRoutingMiddleware(view)
+
+        def get_response(request):
+            return middleware.process_view(request, view, (), {}) or view(request)
+
+        middleware.get_response = get_response
+        response = middleware(request)
+        return self.routed[-1], response
+
+    def test_safe_requests_to_catalog_views_use_replica(self):
+        self.assertEqual(self.request(self.catalog_view)[0], "replica_1")
+        self.assertEqual(self.request(self.catalog_view, "head")[0], "replica_1")
+        self.assertEqual(self.request(self.write_view)[0], "default")
+        # So'rovdan keyin routing tiklanadi
+        self.assertEqual(router.db_for_read(Product), "default")
+
+    def test_read_your_writes_with_cookie(self):
+        db, response = self.request(self.write_view, "post")
+        self.assertEqual(db, "default")
+        cookie = response.cookies[ReplicaRoutingMiddleware.cookie_name]
+        self.assertEqual(cookie["max-age"], 5)
+
+        self.factory.cookies[cookie.key] = cookie.value
+        self.assertEqual(self.request(self.catalog_view)[0], "default")
+
+        self.factory.cookies[cookie.key] = str(time.time() - 1)
+        self.assertEqual(self.request(self.catalog_view)[0], "replica_1")
+
+    def test_read_your_writes_with_token(self):
+        self.request(self.write_view, "delete", HTTP_AUTHORIZATION="Bearer a")
+        self.assertEqual(self.request(self.catalog_view, HTTP_AUTHORIZATION="Bearer a")[0], "default")
+        self.assertEqual(self.request(self.catalog_view, HTTP_AUTHORIZATION="Bearer b")[0], "replica_1")
+
+    @override_settings(READ_YOUR_WRITES_SECONDS=0)
+    def test_pinning_disabled(self):
+        self.request(self.write_view, "post", HTTP_AUTHORIZATION="Bearer a")
+        self.assertEqual(self.request(self.catalog_view, HTTP_AUTHORIZATION="Bearer a")[0], "replica_1")
+
+    def test_catalog_views_are_marked(self):
+        with_pk = {"add-comment", "feature_detail", "brand_detail"}
+        marked = {
+            name for name in ("product_list", "product_search", "deal_list", "category_list", "brand_list",
+                              "brand_detail", "feature_list", "feature_detail", "async_product_list",
+                              "async_deal_list", "add-comment", "cache_stats")
+            if _is_replica_view(resolve(reverse(f"ecommerce:{name}", args=[1] if name in with_pk else [])).func)
+        }
+        self.assertEqual(
+            marked,
+            {"product_list", "product_search", "deal_list", "category_list", "brand_list", "brand_detail",
+             "feature_list", "feature_detail", "async_product_list", "async_deal_list"},
+        )
+
+
+HAS_TEST_REPLICA = "replica_1" in settings.DATABASES
+
+
+@unittest.skipUnless(HAS_TEST_REPLICA, "needs the replica_1 alias of config.test_settings")
+@override_settings(REPLICA_DATABASES=["replica_1"], READ_YOUR_WRITES_SECONDS=5)
+class ReplicaAliasTests(TransactionTestCase):
+    """
+    Routing through the full middleware stack against ``replica_1``, a test
+    mirror of ``default`` (see ``config.test_settings``). The replica is a
+    separate connection, so the data must be committed.
+    """
+    # Test runner alias'larni oldindan yig'adi: skip qilingan klass ham yo'q alias'ni so'ramasligi kerak
+    databases = {"default", "replica_1"} if HAS_TEST_REPLICA else {"default"}
+
+    def setUp(self):
+        cache.clear()
+        Category.objects.create(name="Phones", slug="phones")
+
+    def queries_per_alias(self, method, url, **kwargs):
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections["replica_1"]) as replica:
+            response = getattr(self.client, method)(url, **kwargs)
+        return response, len(primary), len(replica)
+
+    def test_reads_hit_the_replica_until_a_write(self):
+        url = reverse("ecommerce:category_list")
+        response, primary, replica = self.queries_per_alias("get", url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((primary, replica), (0, 1))
+
+        # Har qanday yozish so'rovi (hatto rad etilgani ham) klientni primary'ga bog'laydi
+        self.client.post(reverse("ecommerce:login"), {"email": "x@example.com", "password": "x"})
+        self.assertIn(ReplicaRoutingMiddleware.cookie_name, self.client.cookies)
+        cache.clear()
+        response, primary, replica = self.queries_per_alias("get", url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((primary, replica), (1, 0))
+
+    def test_async_reads_hit_the_replica_until_a_write(self):
+        # Async ORM so'rovlari shu (thread-sensitive) thread'ning connection'larida bajariladi
+        url = reverse("ecommerce:async_deal_list")
+        user = User.objects.create_user(email="user@example.com", username="user", password="x")
+        token = {"authorization": f"Bearer {AccessToken.for_user(user)}"}
+        with CaptureQueriesContext(connections["replica_1"]) as replica:
+            response = async_to_sync(self.async_client.get)(url, headers=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(replica), 0)
+
+        # Pin token bo'yicha async cache API orqali yoziladi
+        async_to_sync(self.async_client.post)(reverse("ecommerce:login"), headers=token)
+        with CaptureQueriesContext(connections["replica_1"]) as replica:
+            response = async_to_sync(self.async_client.get)(url, headers=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(replica), 0)
+
+
+class ProductFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category, cls.brand, cls.features, cls.users = seed_catalog(products=1, users=3)
+        cls.product = Product.objects.get()
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("ecommerce:product_detail", args=[self.product.pk])
+
+    def test_full_representation_has_fixed_order(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(list(data), sorted(data))
+        self.assertEqual(len(data["images"]), 2)
+        self.assertEqual(data["brand"], self.brand.pk)
+
+    def test_sparse_fields_skip_relations(self):
+        # last-modified lookup + product, rasm/feature prefetch'larisiz
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(self.url, {"fields": "id,name,price"}).json()
+        self.assertEqual(list(data), ["id", "name", "price"])
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("description", queries[-1]["sql"])
+
+        data = self.client.get(self.url, {"fields": "name,category_name,features"}).json()
+        self.assertEqual(data, {"category_name": "Electronics", "features": data["features"], "name": "Phone 0"})
+        self.assertEqual(len(data["features"]), 2)
+
+    @override_settings(PRODUCT_EXPAND_COMMENTS=2)
+    def test_expand(self):
+        data = self.client.get(self.url, {"fields": "id", "expand": "category,brand,comments"}).json()
+        self.assertEqual(list(data), ["brand", "category", "comments", "id"])
+        self.assertEqual(data["brand"], {"name": "Acme"})
+        self.assertEqual(data["category"]["slug"], "electronics")
+        newest = Comment.objects.order_by("-created_at", "-id").values_list("pk", flat=True)[:2]
+        self.assertEqual([comment["id"] for comment in data["comments"]], list(newest))
+
+        data = self.client.get(self.url, {"expand": "brand,comments"}).json()
+        self.assertEqual(list(data), sorted(data))
+
+    def test_expanded_brand_rename_changes_etag(self):
+        etag = self.client.get(self.url, {"expand": "brand"})["ETag"]
+        self.brand.name = "Acme Pro"
+        self.brand.save()
+        response = self.client.get(self.url, {"expand": "brand"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["brand"], {"name": "Acme Pro"})
+
+    def test_invalid_parameters(self):
+        response = self.client.get(self.url, {"fields": "id,secret", "expand": "images"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {"fields", "expand"})
+
+    def test_expand_only_field_requires_expand(self):
+        response = self.client.get(self.url, {"fields": "comments"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {"fields"})
+
+        response = self.client.get(self.url, {"fields": "comments", "expand": "comments"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {"comments"})
+
+
+class FastListRenderingTests(TestCase):
+    """
+    ``ProductListRows`` + ``ORJSONRenderer`` must produce the same bytes as
+    ``ProductListSerializer`` + DRF's ``JSONRenderer``.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Phones", slug="phones")
+        cls.user = User.objects.create_user(email="user@example.com", username="user", password="x")
+        products = create_products(category, 4)
+        Product.objects.filter(pk=products[0].pk).update(name="Telefon\u2028«oʻzbek» \U0001F4F1", price="1234.50")
+        ProductImage.objects.filter(product=products[1]).update(
+            variants={"thumb": {"webp": "product_images/variants/t.webp", "jpeg": "product_images/variants/t.jpg"}}
+        )
+        Product.objects.create(category=category, name="Bare", description="", price="0.99", stock=1)
+        Like.objects.create(product=products[2], user=cls.user)
+        Deal.objects.create(product=products[0], name="Sale", discount=12.5)
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get("/")
+
+    def serializer_bytes(self, data):
+        return JSONRenderer().render(data)
+
+    def test_rows_match_serializer(self):
+        products = Product.objects.with_is_liked(self.user).with_effective_price().prefetch_related(
+            primary_image_prefetch()
+        ).order_by("-id")
+        context = {"request": self.request}
+        expected = self.serializer_bytes(ProductListSerializer(products, many=True, context=context).data)
+
+        rows = ProductListRows(context)
+        data = rows.to_representation(list(rows.queryset(products.prefetch_related(None))))
+        self.assertEqual(ORJSONRenderer().render(data), expected)
+        self.assertIn(b"\\u2028", expected)
+
+    def test_rows_load_only_primary_images(self):
+        rows = ProductListRows({"request": self.request})
+        page = list(rows.queryset(Product.objects.with_is_liked(self.user).with_effective_price().order_by("-id")))
+        with CaptureQueriesContext(connection) as queries:
+            rows.to_representation(page)
+        # Sahifadagi barcha rasmlar emas, faqat har bir mahsulotning birinchisi
+        self.assertEqual(len(queries), 1)
+        self.assertIn("MIN(", queries[0]["sql"].upper())
+
+    def test_list_endpoints_match_serializer(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse("ecommerce:product_list"))
+        products = Product.objects.with_is_liked(self.user).with_effective_price().prefetch_related(
+            primary_image_prefetch()
+        ).order_by("-id")
+        request = response.wsgi_request
+        expected = ProductListSerializer(products, many=True, context={"request": request}).data
+        self.assertEqual(response.json()["results"], json.loads(self.serializer_bytes(expected)))
+
+        results = client.get(reverse("ecommerce:product_search"), {"q": "Product"}).json()["results"]
+        self.assertEqual([row["id"] for row in results], [row["id"] for row in expected if row["name"].startswith("Product")])
+        self.assertTrue(any(row["is_liked"] for row in results))
+
+    def test_renderer_matches_json_renderer(self):
+        product = Product.objects.first()
+        Comment.objects.create(product=product, user=self.user, text="Zo'r\u2029\"narx\" </script>")
+        Deal.objects.create(product=product, name="Sale", discount=12.5)
+        for data in (
+            CommentSerializer(Comment.objects.all(), many=True).data,
+            DealSerializer(Deal.objects.all(), many=True, context={"request": self.request}).data,
+            {"empty": [], "none": None, "nested": {"n": 1}},
+        ):
+            self.assertEqual(ORJSONRenderer().render(data), self.serializer_bytes(data))
+
+
+class CeleryTaskTests(TestCase):
+    """
+    Tasks run eagerly (forced in ``setUpModule``, whatever the broker).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Phones", slug="phones")
+
+    def test_beat_schedule_tasks_are_registered(self):
+        for name, entry in settings.CELERY_BEAT_SCHEDULE.items():
+            self.assertIn(entry["task"], celery_app.tasks, name)
+
+    def test_expire_deals(self):
+        product = create_products(self.category, 1, images_per_product=0)[0]
+        expired = Deal.objects.create(product=product, name="Old", discount=5, end_time=now() + timedelta(hours=1))
+        running = Deal.objects.create(product=product, name="New", discount=5, end_time=now() + timedelta(hours=1))
+        # Muddati saqlangandan keyin o'tgan deal
+        Deal.objects.filter(pk=expired.pk).update(end_time=now() - timedelta(hours=1))
+        self.assertEqual(tasks.expire_deals.delay().get(), 1)
+        expired.refresh_from_db()
+        running.refresh_from_db()
+        self.assertFalse(expired.is_active)
+        self.assertTrue(running.is_active)
+
+    def test_reconcile_counters(self):
+        product = create_products(self.category, 1, images_per_product=0)[0]
+        Product.objects.filter(pk=product.pk).update(likes_count=7)
+        self.assertEqual(tasks.reconcile_counters.delay().get()["likes_count"], 1)
+        product.refresh_from_db()
+        self.assertEqual(product.likes_count, 0)
+
+    def test_signals_enqueue_after_commit(self):
+        with patch.object(tasks.refresh_facets, "delay") as refresh_facets, \
+                patch.object(tasks.refresh_search_vectors, "delay") as refresh_search_vectors:
+            with self.captureOnCommitCallbacks() as callbacks:
+                product = Product.objects.create(category=self.category, name="X", description="", price="1.00", stock=1)
+            refresh_facets.assert_not_called()
+            for callback in callbacks:
+                callback()
+        refresh_facets.assert_called_once_with([product.pk])
+        refresh_search_vectors.assert_called_once_with(pk=product.pk)
+
+    def test_variants_of_deleted_image(self):
+        self.assertIsNone(tasks.generate_image_variants.delay(0).get())
+
+
+LOCMEM = "django.core.cache.backends.locmem.LocMemCache"
+LIKE_BUFFER_CACHES = {"default": {"BACKEND": LOCMEM, "LOCATION": "shop"}, "likes": {"BACKEND": LOCMEM, "LOCATION": "likes"}}
+
+
+# Testda Redis yo'q: bitta jarayon, alohida locmem alias - LIKE_BUFFER_LOCAL o'rinbosari
+@override_settings(LIKE_BUFFER=True, LIKE_BUFFER_CACHE="likes", LIKE_BUFFER_LOCAL=True, CACHES=LIKE_BUFFER_CACHES)
+class LikeBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_products(Category.objects.create(name="Phones", slug="phones"), 1, images_per_product=0)[0]
+        cls.users = [User.objects.create_user(email=f"u{i}@example.com", username=f"u{i}", password="x") for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        caches["likes"].clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def like(self, user, method="post"):
+        name = "ecommerce:add_like" if method == "post" else "ecommerce:delete_like"
+        return getattr(self.client_for(user), method)(reverse(name, args=[self.product.pk]))
+
+    def test_likes_are_applied_on_flush(self):
+        first = self.like(self.users[0])
+        self.assertEqual((first.status_code, first.json()["likes_count"]), (201, 1))
+        self.assertEqual(self.like(self.users[1]).json()["likes_count"], 2)
+        # Takroriy like - hech narsa o'zgarmaydi
+        self.assertEqual(self.like(self.users[0]).status_code, 400)
+        self.assertFalse(Like.objects.exists())
+
+        self.assertEqual(likes.flush(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.likes_count, 2)
+        self.assertEqual(Like.objects.count(), 2)
+        # Delta nolga qaytgan: optimistik son bazadagi bilan bir xil
+        self.assertEqual(self.like(self.users[0], "delete").json()["likes_count"], 1)
+        self.assertEqual(likes.flush(), 1)
+        self.assertEqual(likes.flush(), 0)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.likes_count, 1)
+
+    def test_last_intent_wins_per_user(self):
+        user = self.users[0]
+        for method in ("post", "delete", "post", "delete", "post"):
+            self.like(user, method)
+        # Bitta tranzaksiya: log + mavjud like'lar + INSERT + counter UPDATE + log DELETE (+ savepoint)
+        with self.assertNumQueries(7):
+            self.assertEqual(likes.flush(), 5)
+        self.assertEqual(Like.objects.filter(user=user).count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.likes_count, 1)
+
+    def test_unlike_of_stored_like(self):
+        Like.objects.create(product=self.product, user=self.users[0])
+        Product.objects.filter(pk=self.product.pk).update(likes_count=1)
+        self.assertEqual(self.like(self.users[1], "delete").status_code, 400)
+        self.assertEqual(self.like(self.users[0], "delete").json()["likes_count"], 0)
+        likes.flush()
+        self.assertFalse(Like.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.likes_count, 0)
+
+    def test_unknown_product(self):
+        response = self.client_for(self.users[0]).post(reverse("ecommerce:add_like", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_buffer_survives_cache_eviction(self):
+        self.like(self.users[0])
+        self.like(self.users[1])
+        caches["likes"].clear()
+        cache.clear()
+        # Holat va counter bazadagi log'dan o'qiladi
+        response = self.like(self.users[0])
+        self.assertEqual((response.status_code, response.json()["likes_count"]), (400, 2))
+        self.assertEqual(likes.flush(), 2)
+        self.assertEqual(Like.objects.count(), 2)
+        self.assertFalse(PendingLike.objects.exists())
+        self.assertEqual(self.like(self.users[0], "delete").json()["likes_count"], 1)
+
+    def test_record_does_not_sum_the_log(self):
+        self.like(self.users[0])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.like(self.users[1])
+        self.assertEqual(response.json()["likes_count"], 2)
+        # Kutilayotgan yig'indi keshda: issiq mahsulot log'i har so'rovda qayta o'qilmaydi
+        self.assertFalse(any("SUM(" in query["sql"].upper() for query in queries))
+
+    def test_double_click_is_counted_once(self):
+        user = self.users[0]
+        caches["likes"].add(likes.MUTEX_KEY.format(self.product.pk, user.pk), 1)
+        # Birinchi so'rov hali ishlayapti: ikkinchisi hech narsa yozmaydi
+        response = self.like(user)
+        self.assertEqual((response.status_code, response.json()["likes_count"]), (400, 0))
+        caches["likes"].clear()
+        self.assertEqual(self.like(user).json()["likes_count"], 1)
+        self.assertEqual(self.like(user).status_code, 400)
+        self.assertEqual(PendingLike.objects.count(), 1)
+
+    def test_requires_dedicated_shared_cache(self):
+        for options in ({"LIKE_BUFFER_CACHE": "default"}, {"LIKE_BUFFER_CACHE": "missing"}):
+            with self.subTest(**options), override_settings(**options):
+                with self.assertRaises(ImproperlyConfigured):
+                    likes.get_cache()
+        # Locmem faqat LIKE_BUFFER_LOCAL bilan
+        with override_settings(LIKE_BUFFER_LOCAL=False):
+            with self.assertRaises(ImproperlyConfigured):
+                likes.get_cache()
+        self.assertIs(likes.get_cache(), caches["likes"])
+
+
+class OrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Phones", slug="phones")
+        cls.phone, cls.case = create_products(category, 2, images_per_product=0)
+        Product.objects.filter(pk=cls.case.pk).update(price="2.50", stock=1)
+        cls.user = User.objects.create_user(email="buyer@example.com", username="buyer", password="x")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def order(self, *items):
+        return self.client.post(
+            reverse("ecommerce:order_list"),
+            {"items": [{"product": product.pk, "quantity": quantity} for product, quantity in items]},
+            format="json",
+        )
+
+    def stock(self, product):
+        return Product.objects.values_list("stock", flat=True).get(pk=product.pk)
+
+    def test_place_and_pay(self):
+        response = self.order((self.case, 1), (self.phone, 2))
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data["status"], data["total"]), (Order.RESERVED, "22.50"))
+        self.assertEqual([item["product"] for item in data["items"]], sorted([self.phone.pk, self.case.pk]))
+        self.assertEqual((self.stock(self.phone), self.stock(self.case)), (3, 0))
+
+        pay_url = reverse("ecommerce:order_pay", args=[data["id"]])
+        self.assertEqual(self.client.post(pay_url).json()["status"], Order.PAID)
+        self.assertEqual(self.client.post(pay_url).status_code, 409)
+        self.assertEqual(self.client.post(reverse("ecommerce:order_cancel", args=[data["id"]])).status_code, 409)
+        self.assertEqual(self.stock(self.phone), 3)
+
+    def test_out_of_stock_reserves_nothing(self):
+        response = self.order((self.phone, 1), (self.case, 2))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.case.pk), response.json()["items"][0])
+        self.assertEqual((self.stock(self.phone), self.stock(self.case)), (5, 1))
+        self.assertFalse(Order.objects.exists())
+
+    def test_invalid_items(self):
+        self.assertEqual(self.order().status_code, 400)
+        self.assertEqual(self.order((self.phone, 1), (self.phone, 1)).status_code, 400)
+        self.assertEqual(self.order((self.phone, 0)).status_code, 400)
+        response = self.client.post(
+            reverse("ecommerce:order_list"), {"items": [{"product": 0, "quantity": 1}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_cancel_releases_stock(self):
+        order_id = self.order((self.phone, 4)).json()["id"]
+        response = self.client.post(reverse("ecommerce:order_cancel", args=[order_id]))
+        self.assertEqual(response.json()["status"], Order.CANCELLED)
+        self.assertEqual(self.stock(self.phone), 5)
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(email="o@example.com", username="o", password="x"))
+        self.assertEqual(other.get(reverse("ecommerce:order_detail", args=[order_id])).status_code, 404)
+
+    def test_expired_reservations_are_released(self):
+        expired = self.order((self.phone, 2)).json()["id"]
+        running = self.order((self.phone, 1)).json()["id"]
+        Order.objects.filter(pk=expired).update(reserved_until=now() - timedelta(seconds=1))
+
+        call_command("expire_reservations", stdout=StringIO())
+        self.assertEqual(Order.objects.get(pk=expired).status, Order.EXPIRED)
+        self.assertEqual(Order.objects.get(pk=running).status, Order.RESERVED)
+        self.assertEqual(self.stock(self.phone), 4)
+        self.assertEqual(self.client.post(reverse("ecommerce:order_pay", args=[expired])).status_code, 409)
+        self.assertEqual(tasks.expire_reservations.delay().get(), 0)
+
+
+class OrderConcurrencyTests(TransactionTestCase):
+    """
+    Many parallel checkouts over the same products never sell more than the
+    stock, whatever order the items are listed in.
+    """
+
+    def test_no_overselling(self):
+        category = Category.objects.create(name="Phones", slug="phones")
+        products = create_products(category, 3, images_per_product=0)
+        Product.objects.update(stock=25)
+        users = [User.objects.create_user(email=f"b{i}@example.com", username=f"b{i}", password="x") for i in range(8)]
+        outcomes = []
+        lock = threading.Lock()
+
+        def buyer(user, seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(12):
+                    picked = rng.sample(products, rng.randint(1, 3))
+                    items = {product.pk: rng.randint(1, 3) for product in picked}
+                    while True:
+                        try:
+                            orders.place_order(user, items)
+                            outcome = "placed"
+                        except orders.OutOfStock:
+                            outcome = "rejected"
+                        except OperationalError:
+                            # SQLite test bazasi butun jadvalni qulflaydi - qayta urinamiz
+                            if connection.vendor != "sqlite":
+                                raise
+                            time.sleep(0.001)
+                            continue
+                        break
+                    with lock:
+                        outcomes.append(outcome)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer, args=(user, i)) for i, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(outcomes), 8 * 12)
+        self.assertIn("rejected", outcomes)
+        sold = dict(OrderItem.objects.values("product").annotate(total=Sum("quantity")).values_list("product", "total"))
+        for product in Product.objects.all():
+            self.assertGreaterEqual(product.stock, 0)
+            self.assertEqual(product.stock + sold.get(product.pk, 0), 25)
+        self.assertEqual(Order.objects.count(), outcomes.count("placed"))
+
+
+class EffectivePriceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Phones", slug="phones")
+        cls.discounted, cls.plain, cls.halved = create_products(category, 3, images_per_product=0)
+        for product, price in ((cls.discounted, "100.00"), (cls.plain, "80.00"), (cls.halved, "90.00")):
+            Product.objects.filter(pk=product.pk).update(price=price)
+        Deal.objects.create(product=cls.discounted, name="Small", discount=10)
+        Deal.objects.create(product=cls.discounted, name="Best", discount=25)
+        Deal.objects.create(product=cls.discounted, name="Off", discount=60, is_active=False)
+        ended = Deal.objects.create(product=cls.discounted, name="Ended", discount=50)
+        # Sweeper hali o'chirmagan, lekin muddati o'tgan deal hisobga olinmaydi
+        Deal.objects.filter(pk=ended.pk).update(end_time=now() - timedelta(minutes=1))
+        Deal.objects.create(product=cls.halved, name="Half", discount=50, end_time=now() + timedelta(days=1))
+
+    def setUp(self):
+        cache.clear()
+
+    def results(self, **params):
+        return self.client.get(reverse("ecommerce:product_list"), params).json()["results"]
+
+    def test_list_and_detail_carry_effective_price(self):
+        rows = {row["id"]: (row["active_discount"], row["effective_price"]) for row in self.results()}
+        self.assertEqual(rows, {
+            self.discounted.pk: (25.0, "75.00"),
+            self.plain.pk: (None, "80.00"),
+            self.halved.pk: (50.0, "45.00"),
+        })
+        url = reverse("ecommerce:product_detail", args=[self.discounted.pk])
+        data = self.client.get(url, {"fields": "id,effective_price,active_discount"}).json()
+        self.assertEqual(data, {"active_discount": 25.0, "effective_price": "75.00", "id": self.discounted.pk})
+
+    def test_filter_and_order_by_effective_price(self):
+        ids = [row["id"] for row in self.results(min_effective_price="50")]
+        self.assertEqual(ids, [self.plain.pk, self.discounted.pk])
+        self.assertEqual([row["id"] for row in self.results(max_effective_price="50")], [self.halved.pk])
+
+        # Sahifama-sahifa: cursor effective_price bo'yicha
+        url, ids = reverse("ecommerce:product_list") + "?ordering=effective_price&page_size=1", []
+        while url:
+            page = self.client.get(url).json()
+            ids += [row["id"] for row in page["results"]]
+            url = page["next"]
+        self.assertEqual(ids, [self.halved.pk, self.discounted.pk, self.plain.pk])
+        ids = [row["id"] for row in self.results(ordering="-effective_price")]
+        self.assertEqual(ids, [self.plain.pk, self.discounted.pk, self.halved.pk])
+
+    def test_new_deal_changes_etag(self):
+        url = reverse("ecommerce:product_detail", args=[self.plain.pk])
+        etag = self.client.get(url)["ETag"]
+        Deal.objects.create(product=self.plain, name="Flash", discount=5)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["effective_price"], "76.00")
+
+    def test_scheduled_deal_applies_from_start_time(self):
+        start = now() + timedelta(days=7)
+        deal = Deal.objects.create(product=self.plain, name="Next week", discount=50, start_time=start)
+        self.assertEqual([row["id"] for row in self.results(max_effective_price="50")], [self.halved.pk])
+        product = Product.objects.with_effective_price(at=start + timedelta(seconds=1)).get(pk=self.plain.pk)
+        self.assertEqual((product.active_discount, product.effective_price), (50.0, Decimal("40.00")))
+
+        # Deal vaqt bo'yicha boshlanadi: sweeper ETag'ni yangilaydi
+        url = reverse("ecommerce:product_detail", args=[self.plain.pk])
+        Deal.objects.announce_started()
+        etag = self.client.get(url)["ETag"]
+        self.assertFalse(Deal.objects.announce_started())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Deal.objects.filter(pk=deal.pk).update(start_time=now())
+        self.assertTrue(Deal.objects.announce_started())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.json()["effective_price"]), (200, "40.00"))
+
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.electronics = Category.objects.create(name="Electronics", slug="electronics")
+        self.phones = Category.objects.create(name="Phones", slug="phones", parent=self.electronics)
+        self.android = Category.objects.create(name="Android", slug="android", parent=self.phones)
+        self.home = Category.objects.create(name="Home", slug="home")
+
+    def counts(self):
+        return dict(Category.objects.values_list("slug", "product_count"))
+
+    def test_paths_and_depth(self):
+        self.android.refresh_from_db()
+        self.assertEqual(self.android.path, f"/{self.electronics.pk}/{self.phones.pk}/{self.android.pk}/")
+        self.assertEqual(self.android.depth, 2)
+        self.assertEqual(categories.ancestor_ids(self.android.path), [self.electronics.pk, self.phones.pk, self.android.pk])
+
+    def test_product_create_move_and_delete_update_counts(self):
+        product = create_products(self.android, 2, images_per_product=0)[0]
+        self.assertEqual(self.counts(), {"electronics": 2, "phones": 2, "android": 2, "home": 0})
+
+        product.category = self.home
+        product.save()
+        self.assertEqual(self.counts(), {"electronics": 1, "phones": 1, "android": 1, "home": 1})
+
+        product.name = "Renamed"
+        product.save(update_fields=["name"])
+        product.delete()
+        self.assertEqual(self.counts(), {"electronics": 1, "phones": 1, "android": 1, "home": 0})
+
+    def test_moving_a_category_moves_its_subtree(self):
+        create_products(self.android, 3, images_per_product=0)
+        self.phones.parent = self.home
+        self.phones.save()
+
+        self.android.refresh_from_db()
+        self.assertEqual(self.android.path, f"/{self.home.pk}/{self.phones.pk}/{self.android.pk}/")
+        self.assertEqual(self.android.depth, 2)
+        self.assertEqual(self.counts(), {"electronics": 0, "phones": 3, "android": 3, "home": 3})
+
+        # Eskirgan instance saqlansa ham path buzilmaydi
+        stale = Category.objects.get(pk=self.android.pk)
+        self.phones.parent = None
+        self.phones.save()
+        stale.name = "Droid"
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual(stale.path, f"/{self.phones.pk}/{self.android.pk}/")
+
+    def test_cannot_move_under_own_descendant(self):
+        self.electronics.parent = self.android
+        with self.assertRaises(ValidationError):
+            self.electronics.full_clean()
+        with self.assertRaises(ValidationError):
+            self.electronics.save()
+        self.electronics.refresh_from_db()
+        self.assertIsNone(self.electronics.parent_id)
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')  # settings faylini yuklash
-django.setup()
+    def test_category_filter_includes_subcategories(self):
+        android = create_products(self.android, 1, images_per_product=0)[0]
+        phone = create_products(self.phones, 1, images_per_product=0)[0]
+        create_products(self.home, 1, images_per_product=0)
+        for name in ("product_list", "async_product_list"):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(f"ecommerce:{name}"), {"category": [self.electronics.pk, self.phones.pk]})
+            self.assertEqual({row["id"] for row in response.json()["results"]}, {android.pk, phone.pk})
+            # Ildiz path'lari bir marta o'qiladi, keyin literal prefiks: path LIKE '/1/%'
+            path_reads = [query["sql"] for query in queries.captured_queries if query["sql"].startswith(
+                'SELECT "shop_category"."path"'
+            )]
+            self.assertEqual(len(path_reads), 1, name)
+            self.assertTrue(any(
+                f"LIKE '{self.electronics.path}%'" in query["sql"] for query in queries.captured_queries
+            ), name)
+            response = self.client.get(reverse(f"ecommerce:{name}"), {"category": self.android.pk})
+            self.assertEqual([row["id"] for row in response.json()["results"]], [android.pk])
+            response = self.client.get(reverse(f"ecommerce:{name}"), {"category": 0})
+            self.assertEqual(response.json()["results"], [])
 
-from shop.models import Product
+    def test_list_returns_tree_in_one_query(self):
+        create_products(self.android, 2, images_per_product=0)
+        with self.assertNumQueries(1):
+            data = self.client.get(reverse("ecommerce:category_list")).json()
+        self.assertEqual([node["name"] for node in data], ["Electronics", "Home"])
+        phones = data[0]["children"][0]
+        self.assertEqual((phones["name"], phones["product_count"]), ("Phones", 2))
+        self.assertEqual([node["name"] for node in phones["children"]], ["Android"])
+        self.assertEqual(data[1]["children"], [])
 
-for product in Product.objects.all():
-    print(f"ID: {product.id}, Name: {product.name}")
+    def test_rebuild_repairs_drift(self):
+        create_products(self.android, 2, images_per_product=0)
+        Category.objects.update(path="", depth=0, product_count=0)
+        out = StringIO()
+        call_command("rebuild_category_tree", stdout=out)
+        self.assertIn("4 category(ies) updated", out.getvalue())
+        self.assertEqual(self.counts(), {"electronics": 2, "phones": 2, "android": 2, "home": 0})
+        self.android.refresh_from_db()
+        self.assertEqual((self.android.path, self.android.depth), (f"/{self.electronics.pk}/{self.phones.pk}/{self.android.pk}/", 2))
@@ -1,5 +1,6 @@
 from django.urls import path
 
+from . import async_views
 from .views import (
     # Authentication
     RegisterAPIView, LoginAPIView, UserDetailView,
@@ -14,7 +15,7 @@ from .views import (
     BrandListView, BrandDetailView,
 
     # Product
-    ProductListView, ProductDetailView, ProductImageListView,
+    ProductListView, ProductSearchView, ProductDetailView, ProductImageListView, export_products,
 
     # Deal
     DealListView,
@@ -23,7 +24,13 @@ from .views import (
     CommentListView, CommentCreateView, CommentDeleteView,
 
     # Like
-    add_like,  delete_like, get_comments
+    add_like,  delete_like,
+
+    # Order
+    OrderListCreateView, OrderDetailView, pay_order, cancel_order,
+
+    # Cache
+    cache_stats
 )
 
 app_name = "ecommerce"
@@ -58,6 +65,8 @@ urlpatterns = [
     # PRODUCT
     # =========================
     path('products/', ProductListView.as_view(), name='product_list'),
+    path('products/search/', ProductSearchView.as_view(), name='product_search'),
+    path('products/export/', export_products, name='product_export'),
     path('products/<int:pk>/', ProductDetailView.as_view(), name='product_detail'),
 
     # =========================
@@ -68,7 +77,7 @@ urlpatterns = [
     # =========================
     # COMMENT
     # =========================
-    path('api/products/<int:product_id>/comments/', get_comments, name='add-comment'),
+    path('api/products/<int:product_id>/comments/', CommentListView.as_view(), name='add-comment'),
     path('products/<int:product_id>/comments/add/', CommentCreateView.as_view(), name='comment-add'),
     path('comments/<int:pk>/delete/', CommentDeleteView.as_view(), name='comment-delete'),
 
@@ -78,4 +87,25 @@ urlpatterns = [
     path('api/products/<int:product_id>/like/add/', add_like, name='add_like'),
     path('api/products/<int:product_id>/like/delete/', delete_like, name='delete_like'),
 
+    # =========================
+    # ORDER
+    # =========================
+    path('orders/', OrderListCreateView.as_view(), name='order_list'),
+    path('orders/<int:pk>/', OrderDetailView.as_view(), name='order_detail'),
+    path('orders/<int:pk>/pay/', pay_order, name='order_pay'),
+    path('orders/<int:pk>/cancel/', cancel_order, name='order_cancel'),
+
+    # =========================
+    # CACHE
+    # =========================
+    path('cache/stats/', cache_stats, name='cache_stats'),
+
+    # =========================
+    # ASYNC (ASGI)
+    # =========================
+    path('async/products/', async_views.product_list, name='async_product_list'),
+    path('async/products/<int:pk>/', async_views.product_detail, name='async_product_detail'),
+    path('async/products/<int:product_id>/comments/', async_views.comment_list, name='async_comment_list'),
+    path('async/deals/', async_views.deal_list, name='async_deal_list'),
+
 ]
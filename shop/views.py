@@ -1,18 +1,38 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth.hashers import make_password, check_password
+from django.db import transaction
+from django.db.models import F, Max, Prefetch, Value
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
 from rest_framework import generics, status, permissions
+from rest_framework.filters import OrderingFilter
 from rest_framework.parsers import MultiPartParser, FormParser
-from django.utils.timezone import now
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema_view
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework_simplejwt.tokens import RefreshToken
-from drf_spectacular.utils import extend_schema
-from .models import User, Category, Product, ProductImage, Deal, Feature, Brand, Comment, Like
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from .models import (
+    User, Category, Product, ProductImage, Deal, Feature, Brand, Comment, Like, Order, primary_image_prefetch
+)
+from .cache import CachedResponseMixin, bump_version, get_stats
+from .categories import build_tree
+from .conditional import ConditionalGetMixin
+from .db_router import reads_from_replica
+from . import likes, orders
+from .facets import facet_counts, filter_deals, filter_products
+from .pagination import CommentCursorPagination, ProductCursorPagination, SearchCursorPagination
+from .renderers import ORJSONRenderer
+from .search import search_products, with_rank_id
 from .serializers import (
-    RegisterSerializer, LoginSerializer, UserSerializer, CategorySerializer,
-    ProductSerializer, ProductImageSerializer, DealSerializer, FeatureSerializer,
-    BrandSerializer, CommentSerializer
+    RegisterSerializer, LoginSerializer, UserSerializer, CategorySerializer, CategoryTreeSerializer,
+    ProductSerializer, ProductListSerializer, ProductListRows, ProductImageSerializer, DealSerializer, FeatureSerializer,
+    BrandSerializer, CommentSerializer, OrderSerializer
 )
 
 
@@ -97,13 +117,25 @@ class UserDetailView(generics.RetrieveAPIView):
 @extend_schema_view(
     get=extend_schema(
         summary="List All Categories",
-        description="Retrieve all product categories.",
+        description="Retrieve the category tree: root categories with their subcategories nested under "
+                    "`children`; `product_count` covers the whole subtree.",
         tags=["Category API"]
     )
 )
-class CategoryListView(generics.ListAPIView):
-    queryset = Category.objects.all()
-    serializer_class = CategorySerializer
+@reads_from_replica
+class CategoryListView(ConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
+    """
+    The whole category tree, roots first, each node with its ``children``.
+    Nodes come from one query ordered by depth and are linked in Python.
+    """
+    queryset = Category.objects.order_by("depth", "name", "id")
+    serializer_class = CategoryTreeSerializer
+    pagination_class = None
+    cache_models = etag_models = (Category,)
+
+    def list(self, request, *args, **kwargs):
+        roots = build_tree(self.filter_queryset(self.get_queryset()))
+        return Response(self.get_serializer(roots, many=True).data)
 
 
 @extend_schema_view(
@@ -113,35 +145,181 @@ class CategoryListView(generics.ListAPIView):
         tags=["Category API"]
     )
 )
-class CategoryDetailView(generics.RetrieveAPIView):
+@reads_from_replica
+class CategoryDetailView(ConditionalGetMixin, CachedResponseMixin, generics.RetrieveAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    cache_models = etag_models = (Category,)
 
 
 # =====================
 # PRODUCT API
 # =====================
 
+class ProductRowsMixin:
+    """
+    List products through ``ProductListRows`` (``values()`` rows instead of
+    ``ProductListSerializer``) and render them with orjson. The serializer
+    still describes the schema.
+    """
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
+    def list(self, request, *args, **kwargs):
+        rows = ProductListRows(self.get_serializer_context())
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        # Cursor pagination pozitsiyani qatordagi ordering maydonlaridan oladi
+        ordering = self.paginator.get_ordering(request, queryset, self) if self.paginator else ()
+        queryset = rows.queryset(queryset, *(field.lstrip("-") for field in ordering))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(rows.to_representation(list(queryset)))
+        return self.get_paginated_response(rows.to_representation(page))
+
+
 @extend_schema_view(
     get=extend_schema(
         summary="List All Products",
-        description="Retrieve all products with related comments, images, features, and likes.",
+        description="Retrieve a compact, cursor-paginated product list with like and comment counts, "
+                    "filters and facet counts (products per category, brand and feature within the filter).",
+        parameters=[
+            OpenApiParameter("category", int, many=True, description="Category id"),
+            OpenApiParameter("brand", int, many=True, description="Brand id"),
+            OpenApiParameter("feature", str, many=True, description="Feature as name:value"),
+            OpenApiParameter("min_price", float),
+            OpenApiParameter("max_price", float),
+            OpenApiParameter("min_effective_price", float, description="Price after the best active deal"),
+            OpenApiParameter("max_effective_price", float),
+            OpenApiParameter("ordering", str, enum=["-id", "price", "-price", "effective_price", "-effective_price"]),
+        ],
         tags=["Product API"]
     )
 )
-class ProductListView(generics.ListAPIView):
-    queryset = Product.objects.prefetch_related("comments", "images", "features", "likes").all().order_by('-id')
-    serializer_class = ProductSerializer
+@reads_from_replica
+class ProductListView(ProductRowsMixin, ConditionalGetMixin, generics.ListAPIView):
+    serializer_class = ProductListSerializer
+    pagination_class = ProductCursorPagination
+    filter_backends = [OrderingFilter]
+    ordering_fields = ["id", "price", "effective_price"]
+    ordering = ["-id"]
+    # Product versiyasi o'chirishlarni, updated_at rasm/stock o'zgarishlarini, Like/Comment versiyalari
+    # counter'larni, Deal versiyasi effective_price o'zgarishlarini qamraydi
+    etag_models = (Product, Category, Feature, Deal, Like, Comment)
+
+    def get_etag_parts(self, request, *args, **kwargs):
+        # Last-Modified berilmaydi: deal'lar va o'chirilgan mahsulotlar updated_at'ni o'zgartirmaydi, ETag esa versiyalarni ham hisobga oladi
+        last_updated = self.get_filtered_queryset().aggregate(Max("updated_at"))["updated_at__max"]
+        return [last_updated, *super().get_etag_parts(request, *args, **kwargs)]
+
+    def get_filtered_queryset(self):
+        # ETag, sahifa va facet'lar uchun bitta: kategoriya path'lari bir marta o'qiladi
+        if not hasattr(self, "_filtered_queryset"):
+            self._filtered_queryset = filter_products(Product.objects.with_effective_price(), self.request.query_params)
+        return self._filtered_queryset.all()
+
+    def get_queryset(self):
+        return self.get_filtered_queryset().with_is_liked(self.request.user).prefetch_related(
+            primary_image_prefetch()
+        ).order_by('-id')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data["facets"] = facet_counts(self.get_filtered_queryset())
+        return response
+
+
+@extend_schema(
+    summary="Search Products",
+    description="Full-text search over product name, description, brand and category, ranked by relevance.",
+    parameters=[OpenApiParameter("q", str, description="Search text")],
+    tags=["Product API"]
+)
+@reads_from_replica
+class ProductSearchView(ProductRowsMixin, generics.ListAPIView):
+    serializer_class = ProductListSerializer
+    pagination_class = SearchCursorPagination
+
+    def get_queryset(self):
+        text = self.request.query_params.get("q", "").strip()
+        queryset = Product.objects.with_is_liked(self.request.user).with_effective_price().prefetch_related(
+            primary_image_prefetch()
+        )
+        if not text:
+            return with_rank_id(queryset.annotate(rank=Value(0))).none()
+        return search_products(queryset, text)
 
 
 @extend_schema(
     summary="Retrieve a Product",
     description="Get details of a specific product.",
+    parameters=[
+        OpenApiParameter("fields", str, description="Comma-separated fields to return, e.g. id,name,price"),
+        OpenApiParameter("expand", str, description="Relations to nest: category, brand, comments"),
+    ],
     tags=["Product API"]
 )
-class ProductDetailView(generics.RetrieveAPIView):
-    queryset = Product.objects.all()
+@reads_from_replica
+class ProductDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     serializer_class = ProductSerializer
+    # Brand/Category ?expand= bilan ichiga joylanadi: nomi o'zgarsa ETag ham o'zgaradi
+    etag_models = (Category, Brand, Feature, Deal)
+
+    def get_etag_parts(self, request, *args, **kwargs):
+        # Ro'yxatdagi kabi faqat ETag: effective_price deal'lar bilan o'zgaradi, updated_at esa yo'q
+        # Counter'lar updated_at'ni o'zgartirmaydi: ular ham shu qatordan o'qiladi
+        row = Product.objects.filter(pk=kwargs["pk"]).values_list("updated_at", "likes_count", "comments_count").first()
+        if row is None:
+            return None
+        return [*row, *super().get_etag_parts(request, *args, **kwargs)]
+
+    def get_queryset(self):
+        # ?fields= / ?expand= faqat kerakli ustun va bog'lanishlarni yuklaydi
+        return ProductSerializer.optimize_queryset(Product.objects.all(), self.request)
+
+
+@extend_schema(
+    summary="Export Products",
+    description="Stream the whole catalog as newline-delimited JSON, one product per line, "
+                "ordered by updated_at. Use updated_since for incremental syncs.",
+    parameters=[OpenApiParameter("updated_since", str, description="ISO 8601 datetime")],
+    tags=["Product API"]
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def export_products(request):
+    queryset = Product.objects.select_related("category", "brand").prefetch_related(
+        Prefetch("images", queryset=ProductImage.objects.order_by("id")), "features"
+    ).order_by("updated_at", "id")
+
+    updated_since = request.query_params.get("updated_since")
+    if updated_since:
+        since = parse_datetime(updated_since)
+        if since is None:
+            return Response({"updated_since": "Invalid datetime."}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = queryset.filter(updated_at__gte=since)
+
+    def rows():
+        # iterator() + chunk_size: xotira katalog hajmiga bog'liq emas
+        for product in queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+            yield json.dumps({
+                "id": product.id,
+                "sku": product.sku,
+                "name": product.name,
+                "description": product.description,
+                "price": product.price,
+                "stock": product.stock,
+                "category": product.category_id,
+                "category_name": product.category.name,
+                "brand": product.brand_id,
+                "brand_name": product.brand.name if product.brand else None,
+                "features": [{"name": f.name, "value": f.value} for f in product.features.all()],
+                "images": [request.build_absolute_uri(image.image.url) for image in product.images.all()],
+                "likes_count": product.likes_count,
+                "comments_count": product.comments_count,
+                "created_at": product.created_at,
+                "updated_at": product.updated_at,
+            }, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+    return StreamingHttpResponse(rows(), content_type="application/x-ndjson")
 
 
 # =====================
@@ -153,6 +331,7 @@ class ProductDetailView(generics.RetrieveAPIView):
     description="Retrieve all images associated with products.",
     tags=["Product API"]
 )
+@reads_from_replica
 class ProductImageListView(generics.ListAPIView):
     queryset = ProductImage.objects.all()
     serializer_class = ProductImageSerializer
@@ -167,29 +346,19 @@ class ProductImageListView(generics.ListAPIView):
     description="Retrieve all discount deals with related products.",
     tags=["Discount API"]
 )
+@reads_from_replica
 class DealListView(generics.ListAPIView):
     serializer_class = DealSerializer
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
 
     def get_queryset(self):
-        queryset = Deal.objects.select_related("product")
-
-        # Avtomatik yangilash
-        Deal.objects.filter(is_active=True, end_time__lt=now()).update(is_active=False)
-
-        # Endi faqat faollari olish
-        queryset = queryset.filter(is_active=True, end_time__gt=now()) | queryset.filter(is_active=True,
-                                                                                         end_time__isnull=True)  # noqa
-
-        # 🔥 Query parameter: discount filter
-        discount_min = self.request.query_params.get("min_discount")
-        discount_max = self.request.query_params.get("max_discount")
-
-        if discount_min:
-            queryset = queryset.filter(discount__gte=float(discount_min))
-        if discount_max:
-            queryset = queryset.filter(discount__lte=float(discount_max))
+        # Muddati o'tganlarini expire_deals komandasi o'chiradi, bu yerda faqat vaqt bo'yicha filter
+        queryset = Deal.objects.active().select_related("product").prefetch_related(
+            primary_image_prefetch("product__images")
+        ).order_by("-id")
 
-        return queryset
+        # 🔥 Query parameter: discount filter (noto'g'ri qiymat - 400)
+        return filter_deals(queryset, self.request.query_params)
 
 
 # =====================
@@ -201,9 +370,11 @@ class DealListView(generics.ListAPIView):
     description="Retrieve all features associated with products.",
     tags=["Feature API"]
 )
-class FeatureListView(generics.ListAPIView):
-    queryset = Feature.objects.all()
+@reads_from_replica
+class FeatureListView(ConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
+    queryset = Feature.objects.order_by("id")
     serializer_class = FeatureSerializer
+    cache_models = etag_models = (Feature,)
 
 
 @extend_schema(
@@ -211,9 +382,11 @@ class FeatureListView(generics.ListAPIView):
     description="Get details of a specific product feature.",
     tags=["Feature API"]
 )
-class FeatureDetailView(generics.RetrieveAPIView):
+@reads_from_replica
+class FeatureDetailView(ConditionalGetMixin, CachedResponseMixin, generics.RetrieveAPIView):
     queryset = Feature.objects.all()
     serializer_class = FeatureSerializer
+    cache_models = etag_models = (Feature,)
 
 
 # =====================
@@ -225,9 +398,11 @@ class FeatureDetailView(generics.RetrieveAPIView):
     description="Retrieve all available brands.",
     tags=["Brand API"]
 )
-class BrandListView(generics.ListAPIView):
-    queryset = Brand.objects.all()
+@reads_from_replica
+class BrandListView(ConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
+    queryset = Brand.objects.order_by("id")
     serializer_class = BrandSerializer
+    cache_models = etag_models = (Brand,)
 
 
 @extend_schema(
@@ -235,37 +410,44 @@ class BrandListView(generics.ListAPIView):
     description="Get details of a specific brand.",
     tags=["Brand API"]
 )
-class BrandDetailView(generics.RetrieveAPIView):
+@reads_from_replica
+class BrandDetailView(ConditionalGetMixin, CachedResponseMixin, generics.RetrieveAPIView):
     queryset = Brand.objects.all()
     serializer_class = BrandSerializer
+    cache_models = etag_models = (Brand,)
 
 
 # =====================
-# COMMENT API
+# CACHE API
 # =====================
 
 @extend_schema(
-    summary="List All Comments",
-    description="Add a new comment to a product.",
-    tags=["Comment API"]
+    summary="Cache Statistics",
+    description="Hit/miss counters of the cached catalog endpoints.",
+    tags=["Cache API"]
 )
 @api_view(['GET'])
-def get_comments(request, product_id):
-    comments = Comment.objects.filter(product_id=product_id)
-    serializer = CommentSerializer(comments, many=True)
-    return Response({"count": len(comments), "results": serializer.data})
+@permission_classes([permissions.IsAdminUser])
+def cache_stats(request):
+    return Response(get_stats())
 
 
+# =====================
+# COMMENT API
+# =====================
+
 @extend_schema(
-    description="Add a new comment to a product.",
+    summary="List Product Comments",
+    description="Cursor-paginated comment feed of a product, newest first.",
     tags=["Comment API"]
 )
 class CommentListView(generics.ListAPIView):
     serializer_class = CommentSerializer
+    pagination_class = CommentCursorPagination
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
 
     def get_queryset(self):
-        product_id = self.kwargs.get('pk')
-        return Comment.objects.filter(product_id=product_id)
+        return Comment.objects.filter(product_id=self.kwargs['product_id'])
 
 
 @extend_schema(
@@ -280,7 +462,12 @@ class CommentCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         product_id = self.kwargs.get('product_id')
         product = get_object_or_404(Product, id=product_id)
-        serializer.save(user=self.request.user, product=product)
+        with transaction.atomic():
+            serializer.save(user=self.request.user, product=product)
+            Product.objects.filter(pk=product.pk).update(
+                comments_count=F("comments_count") + 1
+            )
+            bump_version(Comment)
 
 
 @extend_schema(
@@ -297,7 +484,12 @@ class CommentDeleteView(generics.DestroyAPIView):
         comment = self.get_object()
         if comment.user != request.user:
             return Response({'detail': 'You can only delete your own comment!'}, status=status.HTTP_403_FORBIDDEN)
-        comment.delete()
+        with transaction.atomic():
+            comment.delete()
+            Product.objects.filter(pk=comment.product_id, comments_count__gt=0).update(
+                comments_count=F("comments_count") - 1
+            )
+            bump_version(Comment)
         return Response({'detail': 'Comment deleted'}, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -305,6 +497,24 @@ class CommentDeleteView(generics.DestroyAPIView):
 # LIKE API
 # =====================
 
+def buffered_like(request, product_id, liked):
+    """
+    ``add_like``/``delete_like`` with ``LIKE_BUFFER`` on: the intent goes to
+    the like buffer (``shop.likes``) and the response carries the optimistic
+    counter.
+    """
+    changed, likes_count = likes.record(product_id, request.user.pk, liked)
+    if likes_count is None:
+        raise Http404("No Product matches the given query.")
+    if liked:
+        if changed:
+            return Response({"message": "Liked!", "likes_count": likes_count}, status=201)
+        return Response({"message": "Already liked", "likes_count": likes_count}, status=400)
+    if changed:
+        return Response({"message": "Like removed!", "likes_count": likes_count}, status=200)
+    return Response({"message": "You haven't liked this product yet"}, status=400)
+
+
 @extend_schema(
     tags=["Like Api"],
     summary="Add Like to a Product",
@@ -315,13 +525,24 @@ class CommentDeleteView(generics.DestroyAPIView):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def add_like(request, product_id):
+    if settings.LIKE_BUFFER:
+        return buffered_like(request, product_id, liked=True)
     product = get_object_or_404(Product, id=product_id)
-    like, created = Like.objects.get_or_create(product=product, user=request.user)
+
+    with transaction.atomic():
+        like, created = Like.objects.get_or_create(product=product, user=request.user)
+        if created:
+            # Like va counter bitta tranzaksiyada; counter updated_at'ga tegmaydi, ETag Like versiyasidan
+            Product.objects.filter(pk=product.pk).update(
+                likes_count=F("likes_count") + 1
+            )
+            bump_version(Like)
+            product.refresh_from_db(fields=["likes_count"])
 
     if created:
-        return Response({"message": "Liked!", "likes_count": product.likes_count()}, status=201)
+        return Response({"message": "Liked!", "likes_count": product.likes_count}, status=201)
 
-    return Response({"message": "Already liked", "likes_count": product.likes_count()}, status=400)
+    return Response({"message": "Already liked", "likes_count": product.likes_count}, status=400)
 
 
 @extend_schema(
@@ -333,11 +554,95 @@ def add_like(request, product_id):
 @api_view(['DELETE'])
 @permission_classes([permissions.IsAuthenticated])
 def delete_like(request, product_id):
+    if settings.LIKE_BUFFER:
+        return buffered_like(request, product_id, liked=False)
     product = get_object_or_404(Product, id=product_id)
-    like = Like.objects.filter(product=product, user=request.user)
 
-    if like.exists():
-        like.delete()
-        return Response({"message": "Like removed!", "likes_count": product.likes_count()}, status=200)
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(product=product, user=request.user).delete()
+        if deleted:
+            Product.objects.filter(pk=product.pk, likes_count__gt=0).update(
+                likes_count=F("likes_count") - 1
+            )
+            bump_version(Like)
+            product.refresh_from_db(fields=["likes_count"])
+
+    if deleted:
+        return Response({"message": "Like removed!", "likes_count": product.likes_count}, status=200)
 
     return Response({"message": "You haven't liked this product yet"}, status=400)
+
+
+# =====================
+# ORDER API
+# =====================
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="List My Orders",
+        description="Orders of the current user, newest first.",
+        tags=["Order API"],
+    ),
+    post=extend_schema(
+        summary="Place an Order",
+        description=(
+            "Reserve the stock of the items and create a `reserved` order. The reservation is released "
+            "unless the order is paid within `ORDER_RESERVATION_SECONDS`. Fails without reserving anything "
+            "when a product is out of stock."
+        ),
+        tags=["Order API"],
+    ),
+)
+class OrderListCreateView(generics.ListCreateAPIView):
+    serializer_class = OrderSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Order.objects.filter(user=self.request.user).prefetch_related("items").order_by("-created_at", "-id")
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+@extend_schema(
+    summary="Get Order Details",
+    tags=["Order API"]
+)
+class OrderDetailView(generics.RetrieveAPIView):
+    serializer_class = OrderSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Order.objects.filter(user=self.request.user).prefetch_related("items")
+
+
+@extend_schema(
+    tags=["Order API"],
+    summary="Pay an Order",
+    description="Confirm a reserved order. Fails once the reservation has expired or the order was cancelled."
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def pay_order(request, pk):
+    order = get_object_or_404(Order, pk=pk, user=request.user)
+    if not orders.pay(order):
+        order.refresh_from_db(fields=["status"])
+        return Response({"detail": f"Order is {order.status}, it cannot be paid."}, status=status.HTTP_409_CONFLICT)
+    order.refresh_from_db(fields=["status"])
+    return Response(OrderSerializer(order).data)
+
+
+@extend_schema(
+    tags=["Order API"],
+    summary="Cancel an Order",
+    description="Cancel a reserved order and release its stock."
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def cancel_order(request, pk):
+    order = get_object_or_404(Order, pk=pk, user=request.user)
+    if not orders.release([order.pk], Order.CANCELLED):
+        order.refresh_from_db(fields=["status"])
+        return Response({"detail": f"Order is {order.status}, it cannot be cancelled."}, status=status.HTTP_409_CONFLICT)
+    order.refresh_from_db(fields=["status"])
+    return Response(OrderSerializer(order).data)